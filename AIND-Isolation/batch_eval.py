@@ -0,0 +1,150 @@
+"""Vectorized evaluation of all the children of an Isolation position.
+
+At the last ply of a search, every child of a node differs from the node only
+by the move of the player to move (the mover). `child_features` computes the
+mobility features of all the children at once with NumPy, from the knight
+adjacency matrix A of the board: with b the vector of blank cells of the node,
+d = b A counts the blank neighbours of every cell, and the same counts in the
+child where the mover moved to cell m are d - A[m]. The mobility of a player
+in every child is then a lookup in d corrected by one row of A, and its
+one-ply lookahead (the total mobility after each of its moves) is a
+matrix-vector product.
+
+The batch score functions mirror the heuristics of game_agent.py and
+sample_players.py: `score(game, moves, player)` returns the list of the
+heuristic values, to `player`, of the positions reached by each of `moves`.
+
+Cells are indexed as in `isolation.BitBoard` (row + column * height).
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from isolation.bitboard import move_table
+from isolation.symmetry import symmetric
+
+# Adjacency matrices are shared by every board with the same dimensions
+_ADJACENCY = {}
+
+Features = namedtuple("Features", [
+    "mover_moves", "other_moves", "mover_lookahead", "other_lookahead",
+    "distance", "width", "height"])
+Features.__doc__ = """Mobility features of the children of a position.
+
+Every field except the board size is an array with one entry per child:
+
+mover_moves, other_moves : legal moves of the mover and of its opponent
+mover_lookahead, other_lookahead : sum, over the legal moves of the player,
+    of the legal moves it would have after making that move
+distance : Manhattan distance between the two players
+"""
+
+
+def adjacency(width, height):
+    """Return the knight adjacency matrix of a board as a float array. """
+    matrix = _ADJACENCY.get((width, height))
+    if matrix is None:
+        masks = move_table(width, height).masks
+        matrix = np.zeros((width * height, width * height))
+        for idx, mask in enumerate(masks):
+            for j in range(width * height):
+                if mask >> j & 1:
+                    matrix[idx, j] = 1.
+        matrix.setflags(write=False)
+        _ADJACENCY[(width, height)] = matrix
+    return matrix
+
+
+def child_features(game, moves):
+    """Return the `Features` of the positions reached by each of `moves`
+    (legal moves of the active player of `game`).
+    """
+    w, h = game.width, game.height
+    adj = adjacency(w, h)
+
+    blank = np.zeros(w * h)
+    blank[[r + c * h for r, c in game.get_blank_spaces()]] = 1.
+    cells = np.array([r + c * h for r, c in moves])
+    r, c = game.get_player_location(game.inactive_player)
+    other = r + c * h
+
+    # a child only differs from the node by the cell the mover moved to, so
+    # the degree of cell j in child k is degree[j] - near[k, j]
+    degree = blank.dot(adj)
+    near = adj[cells]
+    mover_moves = degree[cells]
+    link = adj[other, cells]
+    other_reach = adj[other] * blank
+
+    distance = np.array([abs(r - row) + abs(c - col) for row, col in moves])
+    return Features(
+        mover_moves=mover_moves,
+        other_moves=degree[other] - link,
+        mover_lookahead=near.dot(blank * degree) - mover_moves,
+        other_lookahead=(other_reach.dot(degree) - link * mover_moves -
+                         near.dot(other_reach)),
+        distance=distance, width=w, height=h)
+
+
+def _perspective(features, own_is_mover):
+    if own_is_mover:
+        return features.mover_moves, features.other_moves
+    return features.other_moves, features.mover_moves
+
+
+def _terminal(features, own_is_mover, scores):
+    # the opponent of the mover is to move in every child: it loses if it is
+    # blocked, whatever the value of the heuristic
+    lost = features.other_moves == 0
+    scores[lost] = float("inf") if own_is_mover else float("-inf")
+    return scores.tolist()
+
+
+@symmetric
+def improved_score(game, moves, player):
+    """Batch version of `sample_players.improved_score`. """
+    features = child_features(game, moves)
+    is_mover = game.active_player == player
+    own, opp = _perspective(features, is_mover)
+    return _terminal(features, is_mover, own - opp)
+
+
+@symmetric
+def open_move_score(game, moves, player):
+    """Batch version of `sample_players.open_move_score`. """
+    features = child_features(game, moves)
+    is_mover = game.active_player == player
+    own, _ = _perspective(features, is_mover)
+    return _terminal(features, is_mover, own.copy())
+
+
+@symmetric
+def custom_score(game, moves, player):
+    """Batch version of `game_agent.custom_score`. """
+    features = child_features(game, moves)
+    is_mover = game.active_player == player
+    own, opp = _perspective(features, is_mover)
+    half = (features.width + features.height) / 2.
+    return _terminal(features, is_mover,
+                     own - 1.6 * opp - features.distance / half)
+
+
+@symmetric
+def custom_score_5(game, moves, player):
+    """Batch version of `game_agent.custom_score_5`.
+
+    The scalar heuristic plays each move of a player with `apply_move()`,
+    which moves the player to move. For the player to move in a child (the
+    opponent of the mover) this is its one-ply lookahead; for the mover, the
+    opponent takes each of the mover's cells in turn, leaving the mover one
+    move fewer from where it stands.
+    """
+    features = child_features(game, moves)
+    is_mover = game.active_player == player
+    own, opp = _perspective(features, is_mover)
+    mover_ahead = features.mover_moves * (features.mover_moves - 1)
+    if is_mover:
+        own_ahead, opp_ahead = mover_ahead, features.other_lookahead
+    else:
+        own_ahead, opp_ahead = features.other_lookahead, mover_ahead
+    return _terminal(features, is_mover, (own + own_ahead) - (opp + opp_ahead))
@@ -0,0 +1,213 @@
+"""Measure the search throughput of the Isolation agents.
+
+Every agent searches the same set of random positions for one full turn, and
+the script reports how much work it completes per second: nodes visited for
+the alpha-beta agents (their `nodes` search counter, see
+`game_agent.MoveStats`) and playouts for the Monte Carlo agents. Each measurement is repeated on the
+reference `isolation.Board` and on `isolation.BitBoard`.
+
+The script also times fixed-depth alpha-beta searches of the same positions
+with scalar leaf evaluation and with batch evaluation (see batch_eval.py),
+and counts the evaluations per second of the heuristics, which read the
+mobility of both players from `Board.eval_context()`, against versions that
+query `is_loser`, `is_winner` and `get_legal_moves` separately.
+"""
+import argparse
+import random
+import timeit
+
+from collections import namedtuple
+
+from isolation import Board, BitBoard
+import batch_eval
+from sample_players import improved_score, open_move_score, center_score
+from game_agent import AlphaBetaPlayer, PVSPlayer, custom_score, custom_score_5
+from competition_agent import CustomPlayer
+
+TIME_LIMIT = 150  # number of milliseconds per turn
+SEARCH_DEPTH = 5  # depth of the searches timed with and without batch scoring
+
+# A benchmarked agent: a factory for the player, the unit of work it reports
+# and a function returning the work done by the player in its last turn
+Contender = namedtuple("Contender", ["name", "make_player", "unit", "work"])
+
+CONTENDERS = [
+    Contender("AB_Improved", lambda: AlphaBetaPlayer(score_fn=improved_score),
+              "nodes", lambda player: player.nodes),
+    Contender("PVS_Improved", lambda: PVSPlayer(score_fn=improved_score),
+              "nodes", lambda player: player.nodes),
+    Contender("MCTS_Random", lambda: CustomPlayer(),
+              "playouts", lambda player: player.playouts),
+    Contender("MCTS_Guided", lambda: CustomPlayer(rollout="guided"),
+              "playouts", lambda player: player.playouts),
+]
+
+# Scalar heuristics and their batch versions
+BATCH_SCORES = [
+    ("improved_score", improved_score, batch_eval.improved_score),
+    ("custom_score", custom_score, batch_eval.custom_score),
+    ("custom_score_5", custom_score_5, batch_eval.custom_score_5),
+]
+
+
+def legacy_improved_score(game, player):
+    """`improved_score` generating the legal moves once per query. """
+    if game.is_loser(player):
+        return float("-inf")
+
+    if game.is_winner(player):
+        return float("inf")
+
+    own_moves = len(game.get_legal_moves(player))
+    opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
+    return float(own_moves - opp_moves)
+
+
+def legacy_custom_score(game, player):
+    """`custom_score` generating the legal moves once per query. """
+    if game.is_loser(player):
+        return float("-inf")
+
+    if game.is_winner(player):
+        return float("inf")
+
+    opp = game.get_opponent(player)
+    my_moves = len(game.get_legal_moves(player))
+    opp_moves = len(game.get_legal_moves(opp))
+
+    w, h = game.width / 2., game.height / 2.
+    y_p, x_p = game.get_player_location(player)
+    y_o, x_o = game.get_player_location(opp)
+    dist_players = abs(x_p - x_o) + abs(y_p - y_o)
+    return float(my_moves - 1.6 * opp_moves - dist_players/(w+h))
+
+
+EVALUATIONS = [
+    ("legacy_improved", legacy_improved_score),
+    ("improved_score", improved_score),
+    ("legacy_custom", legacy_custom_score),
+    ("custom_score", custom_score),
+    ("open_move_score", open_move_score),
+    ("center_score", center_score),
+]
+
+
+def random_positions(count, plies, rng, width=7, height=7):
+    """Return `count` lists of random moves from the empty board, each with
+    between plies[0] and plies[1] moves and at least two legal replies.
+    """
+    positions = []
+    while len(positions) < count:
+        game = BitBoard("Player1", "Player2", width, height)
+        moves = []
+        for _ in range(rng.randint(*plies)):
+            legal_moves = sorted(game.get_legal_moves())
+            if not legal_moves:
+                break
+            moves.append(rng.choice(legal_moves))
+            game.apply_move(moves[-1])
+        if len(game.get_legal_moves()) > 1:
+            positions.append(moves)
+    return positions
+
+
+def setup(board_cls, player, moves):
+    """Return a board with `moves` applied, on which `player` is to move. """
+    if len(moves) % 2:
+        game = board_cls("Opponent", player)
+    else:
+        game = board_cls(player, "Opponent")
+    for move in moves:
+        game.apply_move(move)
+    return game
+
+
+def throughput(contender, board_cls, positions, time_limit=TIME_LIMIT):
+    """Search every position for one turn with a fresh player and return
+    the work done per second.
+    """
+    work = 0
+    elapsed = 0.
+    for moves in positions:
+        player = contender.make_player()
+        game = setup(board_cls, player, moves)
+        start = timeit.default_timer()
+
+        def time_left():
+            return time_limit - 1000 * (timeit.default_timer() - start)
+
+        player.get_move(game, time_left)
+        elapsed += timeit.default_timer() - start
+        work += contender.work(player)
+    return work / elapsed
+
+
+def search_time(board_cls, positions, score_fn, batch_fn=None,
+                depth=SEARCH_DEPTH):
+    """Return the mean time (in milliseconds) of a fixed-depth alpha-beta
+    search of every position.
+    """
+    elapsed = 0.
+    for moves in positions:
+        player = AlphaBetaPlayer(score_fn=score_fn, batch_fn=batch_fn)
+        player.time_left = lambda: float("inf")
+        game = setup(board_cls, player, moves)
+        start = timeit.default_timer()
+        player.alphabeta(game, depth)
+        elapsed += timeit.default_timer() - start
+    return 1000 * elapsed / len(positions)
+
+
+def evaluations(board_cls, positions, score_fn, repeat=200):
+    """Return the number of evaluations of `score_fn` per second over all
+    the positions, for both players.
+    """
+    games = [setup(board_cls, "Player", moves) for moves in positions]
+    start = timeit.default_timer()
+    for _ in range(repeat):
+        for game in games:
+            score_fn(game, "Player")
+            score_fn(game, "Opponent")
+    return 2 * repeat * len(games) / (timeit.default_timer() - start)
+
+
+def main(count=20, plies=(2, 20), seed=0):
+    rng = random.Random(seed)
+    positions = random_positions(count, plies, rng)
+
+    print("{:^16}{:^10}{:>16}{:>16}".format("Agent", "Unit", "Board/s", "BitBoard/s"))
+    print("-" * 58)
+    for contender in CONTENDERS:
+        rates = [throughput(contender, cls, positions)
+                 for cls in (Board, BitBoard)]
+        print("{:^16}{:^10}{:16.0f}{:16.0f}".format(
+            contender.name, contender.unit, *rates))
+
+    print()
+    print("Depth {} alpha-beta search (ms per position)".format(SEARCH_DEPTH))
+    print("{:^16}{:^10}{:>16}{:>16}".format("Score", "Leaves", "Board", "BitBoard"))
+    print("-" * 58)
+    for name, score_fn, batch_fn in BATCH_SCORES:
+        for mode, fn in (("scalar", None), ("batch", batch_fn)):
+            times = [search_time(cls, positions, score_fn, fn)
+                     for cls in (Board, BitBoard)]
+            print("{:^16}{:^10}{:16.2f}{:16.2f}".format(name, mode, *times))
+
+    print()
+    print("{:^26}{:>16}{:>16}".format("Heuristic", "Board evals/s",
+                                      "BitBoard evals/s"))
+    print("-" * 58)
+    for name, score_fn in EVALUATIONS:
+        rates = [evaluations(cls, positions, score_fn)
+                 for cls in (Board, BitBoard)]
+        print("{:^26}{:16.0f}{:16.0f}".format(name, *rates))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--positions", type=int, default=20,
+                        help="number of random positions to search")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed for the random positions")
+    args = parser.parse_args()
+    main(count=args.positions, seed=args.seed)
@@ -4,6 +4,7 @@ champions) in a tournament.
 
          COMPLETING AND SUBMITTING A COMPETITION AGENT IS OPTIONAL
 """
+import math
 import random
 
 
@@ -33,16 +34,70 @@ def custom_score(game, player):
     float
         The heuristic value of the current game state to the specified player.
     """
-    raise NotImplementedError
+    if game.is_loser(player):
+        return float("-inf")
+
+    if game.is_winner(player):
+        return float("inf")
+
+    own_moves = len(game.get_legal_moves(player))
+    opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
+    return float(own_moves - 1.5 * opp_moves)
+
+
+class Node:
+    """A node of the Monte Carlo search tree.
+
+    Nodes do not link back to their parents, so the tree has no reference
+    cycles and a discarded subtree is freed immediately rather than by a
+    (slow, unpredictable) garbage collection pass during a later turn.
+
+    Parameters
+    ----------
+    move : (int, int)
+        The move that leads from the parent node to this node (None for the
+        root).
+
+    player : object
+        The player who made `move`; `wins` counts the playouts through this
+        node won by that player.
+
+    untried : list<(int, int)>
+        The legal moves from this node that have no child node yet.
+    """
+    __slots__ = ("move", "player", "children", "untried", "visits", "wins")
+
+    def __init__(self, move, player, untried):
+        self.move = move
+        self.player = player
+        self.children = []
+        self.untried = untried
+        self.visits = 0
+        self.wins = 0.
+
+    def select(self, exploration):
+        """Return the child maximizing the UCT (UCB1) value. """
+        log_n = math.log(self.visits)
+        return max(self.children, key=lambda c: c.wins / c.visits +
+                   exploration * math.sqrt(log_n / c.visits))
+
+    def child(self, move):
+        """Return the child node reached by `move`, or None. """
+        for c in self.children:
+            if c.move == move:
+                return c
+        return None
 
 
 class CustomPlayer:
     """Game-playing agent to use in the optional player vs player Isolation
     competition.
 
-    You must at least implement the get_move() method and a search function
-    to complete this class, but you may use any of the techniques discussed
-    in lecture or elsewhere on the web -- opening books, MCTS, etc.
+    The agent uses Monte Carlo Tree Search: every iteration descends the tree
+    by UCT selection, expands one untried move, plays the game out to the end
+    and credits the winner along the path. Iterations run until `time_left()`
+    falls below the timer threshold, and the most visited root move is
+    played. The subtree below the opponent's reply is kept for the next turn.
 
     **************************************************************************
           THIS CLASS IS OPTIONAL -- IT IS ONLY USED IN THE ISOLATION PvP
@@ -58,13 +113,43 @@ class CustomPlayer:
         Time remaining (in milliseconds) when search is aborted.  Note that
         the PvP competition uses more accurate timers that are not cross-
         platform compatible, so a limit of 1ms (vs 10ms for the other classes)
-        is generally sufficient.
+        is generally sufficient for node-by-node searches. MCTS allocates tree
+        nodes in every iteration, and a garbage collection pass between two
+        time checks can take several milliseconds, so it defaults to 10ms.
+
+    exploration : float (optional)
+        The exploration constant of the UCT formula.
+
+    rollout : string (optional)
+        The playout policy: "random" plays uniformly random moves, "guided"
+        plays the move preferred by `custom_score` except for a fraction
+        `epsilon` of random moves.
+
+    epsilon : float (optional)
+        The fraction of random moves in guided playouts.
     """
 
-    def __init__(self, data=None, timeout=1.):
+    def __init__(self, data=None, timeout=10., exploration=math.sqrt(2),
+                 rollout="random", epsilon=0.2):
         self.score = custom_score
         self.time_left = None
         self.TIMER_THRESHOLD = timeout
+        self.exploration = exploration
+        self.epsilon = epsilon
+        # random choices of the agent (reseeded by seeded games)
+        self.rng = random.Random()
+        if rollout == "random":
+            self.rollout = self.random_rollout
+        elif rollout == "guided":
+            self.rollout = self.guided_rollout
+        else:
+            raise ValueError("Unknown rollout policy: {}".format(rollout))
+
+        # search tree kept between turns, the number of moves played on the
+        # board at its root, and the number of playouts in the last turn
+        self.tree = None
+        self.tree_move_count = None
+        self.playouts = 0
 
     def get_move(self, game, time_left):
         """Search for the best move from the available legal moves and return a
@@ -93,5 +178,127 @@ class CustomPlayer:
             Board coordinates corresponding to a legal move; may return
             (-1, -1) if there are no available legal moves.
         """
-        # OPTIONAL: Finish this function!
-        raise NotImplementedError
+        self.time_left = time_left
+        self.playouts = 0
+
+        legal_moves = game.get_legal_moves()
+        if not legal_moves:
+            return (-1, -1)
+        if len(legal_moves) == 1:
+            return legal_moves[0]
+
+        root = self.reuse_tree(game)
+        while self.time_left() > self.TIMER_THRESHOLD:
+            self.search(game, root)
+            self.playouts += 1
+
+        if not root.children:
+            return legal_moves[0]
+        best = max(root.children, key=lambda c: c.visits)
+
+        # keep the subtree of the chosen move; it becomes the new root once
+        # the opponent's reply is known
+        self.tree = best
+        self.tree_move_count = game.move_count + 1
+        return best.move
+
+    def new_game(self):
+        """Discard the search tree of the previous game. """
+        self.tree = None
+        self.tree_move_count = None
+
+    def reuse_tree(self, game):
+        """Return the node of the stored tree matching the current position,
+        or a new root node.
+        """
+        node, self.tree = self.tree, None
+        if node is not None and self.tree_move_count + 1 == game.move_count:
+            opp = game.get_opponent(self)
+            node = node.child(game.get_player_location(opp))
+            if node is not None:
+                return node
+        return Node(None, game.inactive_player, game.get_legal_moves())
+
+    def search(self, game, root):
+        """Run one iteration of MCTS (selection, expansion, playout and
+        backpropagation) from `root`, the node of the current position.
+        The board is restored to its original state before returning.
+        """
+        node = root
+        path = [root]
+
+        # selection
+        while not node.untried and node.children:
+            node = node.select(self.exploration)
+            game.apply_move(node.move)
+            path.append(node)
+
+        # expansion
+        if node.untried:
+            untried = node.untried
+            idx = self.rng.randrange(len(untried))
+            move = untried[idx]
+            untried[idx] = untried[-1]
+            untried.pop()
+            player = game.active_player
+            game.apply_move(move)
+            node = Node(move, player, game.get_legal_moves())
+            path[-1].children.append(node)
+            path.append(node)
+
+        # playout
+        loser, played = self.rollout(game)
+        for _ in range(len(path) - 1 + played):
+            game.undo_move()
+
+        # backpropagation
+        for node in path:
+            node.visits += 1
+            if node.player != loser:
+                node.wins += 1
+
+    def random_rollout(self, game):
+        """Play uniformly random moves until the player to move is stuck.
+
+        Returns
+        -------
+        (object, int)
+            The losing player and the number of moves applied to the board.
+        """
+        played = 0
+        rand = self.rng.random
+        moves = game.get_legal_moves(shuffle=False)
+        while moves:
+            game.apply_move(moves[int(rand() * len(moves))])
+            played += 1
+            moves = game.get_legal_moves(shuffle=False)
+        return game.active_player, played
+
+    def guided_rollout(self, game):
+        """Play the move preferred by `self.score` for the player to move
+        (or a random move with probability `epsilon`) until the player to
+        move is stuck.
+
+        Returns
+        -------
+        (object, int)
+            The losing player and the number of moves applied to the board.
+        """
+        played = 0
+        moves = game.get_legal_moves(shuffle=False)
+        while moves:
+            if len(moves) > 1 and self.rng.random() >= self.epsilon:
+                player = game.active_player
+                best, best_v = moves[0], float("-inf")
+                for m in moves:
+                    game.apply_move(m)
+                    v = self.score(game, player)
+                    game.undo_move()
+                    if v > best_v:
+                        best, best_v = m, v
+            else:
+                best = moves[self.rng.randrange(len(moves))]
+            game.apply_move(best)
+            played += 1
+            moves = game.get_legal_moves(shuffle=False)
+        return game.active_player, played
@@ -0,0 +1,199 @@
+"""Exact endgame play for Isolation once the players are partitioned.
+
+When no blank cell can be reached by both players, the players can no longer
+interfere with each other and the game reduces to two independent longest
+path problems: the player to move wins if and only if its longest knight path
+through its own region is strictly longer than the opponent's. The best move
+is then the first move of the longest path from the player's location, which
+`EndgameSolver` finds by exhaustive search with memoization.
+
+Cells are encoded as bits using the `isolation.BitBoard` layout (bit
+`row + column * height`), so regions and paths are plain integer masks.
+"""
+from isolation.bitboard import BitBoard, move_table
+
+
+class EndgameTimeout(Exception):
+    """Raised when the solver runs out of time before finishing. """
+    pass
+
+
+def _popcount(mask):
+    return bin(mask).count("1")
+
+
+def free_cells(game):
+    """Return the mask of blank cells of a board. """
+    if isinstance(game, BitBoard):
+        return ~game._blocked & game._table.full
+    h = game.height
+    mask = 0
+    for r, c in game.get_blank_spaces():
+        mask |= 1 << (r + c * h)
+    return mask
+
+
+def region(masks, idx, free):
+    """Return the mask of cells in `free` that a knight starting on cell
+    `idx` can reach through cells in `free` (excluding `idx` itself).
+    """
+    seen = 0
+    frontier = masks[idx] & free
+    while frontier:
+        seen |= frontier
+        reach = 0
+        while frontier:
+            bit = frontier & -frontier
+            frontier ^= bit
+            reach |= masks[bit.bit_length() - 1]
+        frontier = reach & free & ~seen
+    return seen
+
+
+def partition(game):
+    """Test whether the players of a game are separated.
+
+    Returns
+    -------
+    (int, int) or None
+        The masks of the cells reachable by the active and by the inactive
+        player if no cell is reachable by both, or None if the regions
+        overlap or either player has not been placed yet.
+    """
+    active = game.get_player_location(game.active_player)
+    inactive = game.get_player_location(game.inactive_player)
+    if active is None or inactive is None:
+        return None
+    h = game.height
+    masks = move_table(game.width, h).masks
+    free = free_cells(game)
+    own = region(masks, active[0] + active[1] * h, free)
+    opp = region(masks, inactive[0] + inactive[1] * h, free)
+    if own & opp:
+        return None
+    return own, opp
+
+
+class EndgameSolver:
+    """Longest knight path solver with a memo of solved (cell, free cells)
+    subproblems that is kept between calls.
+
+    Parameters
+    ----------
+    max_entries : int (optional)
+        The memo is cleared when it grows beyond this many entries.
+
+    check_every : int (optional)
+        The number of subproblems solved between two calls to `time_left`.
+    """
+
+    def __init__(self, max_entries=2**20, check_every=256):
+        self.max_entries = max_entries
+        self.check_every = check_every
+        self.memo = {}
+        self._masks = None
+        self._colors = None
+        self._time_left = None
+        self._threshold = 0.
+        self._count = 0
+
+    def _prepare(self, width, height, time_left, threshold):
+        table = move_table(width, height)
+        if self._masks is not table.masks:
+            self.memo = {}
+            self._masks = table.masks
+            # knights alternate between the two colors of the board
+            self._colors = sum(1 << idx for idx, (r, c) in enumerate(table.moves)
+                               if (r + c) % 2)
+        elif len(self.memo) > self.max_entries:
+            self.memo = {}
+        self._time_left = time_left
+        self._threshold = threshold
+
+    def longest_path(self, idx, free):
+        """Return the number of moves in the longest knight path from cell
+        `idx` through the cells in `free` (which must not contain `idx`).
+        """
+        key = (idx, free)
+        length = self.memo.get(key)
+        if length is not None:
+            return length
+
+        self._count += 1
+        if self._time_left is not None and self._count % self.check_every == 0:
+            if self._time_left() < self._threshold:
+                raise EndgameTimeout()
+
+        # a path alternates colors, starting with the color opposite to idx
+        if self._colors >> idx & 1:
+            other, same = free & ~self._colors, free & self._colors
+        else:
+            other, same = free & self._colors, free & ~self._colors
+        bound = min(2 * _popcount(other), 2 * _popcount(same) + 1)
+
+        length = 0
+        targets = self._masks[idx] & free
+        while targets and length < bound:
+            bit = targets & -targets
+            targets ^= bit
+            length = max(length, 1 + self.longest_path(bit.bit_length() - 1,
+                                                       free ^ bit))
+        self.memo[key] = length
+        return length
+
+    def best_move(self, game, time_left=None, threshold=0.):
+        """Return the first move of the longest path of the active player
+        and the length of that path.
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            The current game state; the active player must have been placed.
+
+        time_left : callable (optional)
+            A function returning the milliseconds left in the current turn;
+            the solver raises EndgameTimeout when it drops below `threshold`.
+
+        Returns
+        -------
+        ((int, int), int)
+            The best move ((-1, -1) if there are no legal moves) and the
+            number of moves the active player can still make.
+        """
+        self._prepare(game.width, game.height, time_left, threshold)
+        r, c = game.get_player_location(game.active_player)
+        h = game.height
+        idx = r + c * h
+        free = free_cells(game)
+        # only the cells of the player's own region can be on its path
+        free &= region(self._masks, idx, free)
+
+        best, length = (-1, -1), 0
+        targets = self._masks[idx] & free
+        while targets:
+            bit = targets & -targets
+            targets ^= bit
+            j = bit.bit_length() - 1
+            l = 1 + self.longest_path(j, free ^ bit)
+            if l > length:
+                best, length = (j % h, j // h), l
+        return best, length
+
+    def solve(self, game, time_left=None, threshold=0.):
+        """Solve a partitioned game exactly.
+
+        Returns
+        -------
+        ((int, int), bool) or None
+            The best move of the active player and whether the active player
+            wins with best play, or None if the players are not partitioned.
+        """
+        regions = partition(game)
+        if regions is None:
+            return None
+        move, own = self.best_move(game, time_left, threshold)
+        r, c = game.get_player_location(game.inactive_player)
+        h = game.height
+        idx = r + c * h
+        opp = self.longest_path(idx, regions[1])
+        return move, own > opp
@@ -0,0 +1,326 @@
+"""Fit linear evaluation functions for Isolation on self-play records.
+
+The weights of the `custom_score` family are hand-picked. This pipeline
+extracts a vector of FEATURES from every position of a self-play file (see
+selfplay.py), from the point of view of the player to move, fits weights
+predicting the outcome of the game with least squares or logistic
+regression, and returns a `LinearScore`: a heuristic `score(game, player)`
+usable as the `score_fn` of any agent.
+
+Features (own is the evaluated player, opp its opponent):
+
+    own_moves, opp_moves : legal moves of each player
+    own_second, opp_second : second-order mobility, the sum over the legal
+        moves of the player of the moves it would have after that move
+    own_center, opp_center : Manhattan distance of each player to the center
+    distance : Manhattan distance between the players
+    partitioned : 1 if no blank cell is reachable by both players
+    region_diff : difference of the number of cells reachable by each player
+        once they are partitioned (0 otherwise)
+
+Positions where a player has not been placed yet are skipped when fitting and
+scored by the difference in mobility.
+
+Usage:
+
+    python fit_eval.py selfplay.bin weights.json --method logistic
+"""
+import argparse
+import json
+
+import numpy as np
+
+from isolation.bitboard import DIRECTIONS, move_table
+from endgame import free_cells, region
+
+FEATURES = ("own_moves", "opp_moves", "own_second", "opp_second",
+            "own_center", "opp_center", "distance", "partitioned",
+            "region_diff")
+
+# Knight move shifts are shared by every board with the same dimensions
+_SHIFTS = {}
+
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0F0F0F0F0F0F0F0F)
+_H01 = np.uint64(0x0101010101010101)
+
+
+def _popcount(x):
+    """Count the bits set in every element of a uint64 array. """
+    x = x - ((x >> np.uint64(1)) & _M1)
+    x = (x & _M2) + ((x >> np.uint64(2)) & _M2)
+    x = (x + (x >> np.uint64(4))) & _M4
+    return ((x * _H01) >> np.uint64(56)).astype(np.int64)
+
+
+def _shifts(width, height):
+    """Return, for every knight move, the offset of the target cell index
+    and the mask of the cells the move stays on the board from.
+    """
+    shifts = _SHIFTS.get((width, height))
+    if shifts is None:
+        shifts = []
+        for dr, dc in DIRECTIONS:
+            source = 0
+            for r in range(height):
+                for c in range(width):
+                    if 0 <= r + dr < height and 0 <= c + dc < width:
+                        source |= 1 << (r + c * height)
+            shifts.append((dr + dc * height, np.uint64(source)))
+        _SHIFTS[(width, height)] = shifts
+    return shifts
+
+
+def _spread(cells, shifts):
+    """Return the masks of the cells a knight reaches from `cells`. """
+    reach = np.zeros_like(cells)
+    for offset, source in shifts:
+        if offset > 0:
+            reach |= (cells & source) << np.uint64(offset)
+        else:
+            reach |= (cells & source) >> np.uint64(-offset)
+    return reach
+
+
+def _regions(loc_bits, free, shifts):
+    """Return the masks of the cells in `free` reachable from `loc_bits`. """
+    seen = _spread(loc_bits, shifts) & free
+    while True:
+        grown = seen | (_spread(seen, shifts) & free)
+        if np.array_equal(grown, seen):
+            return seen
+        seen = grown
+
+
+def feature_matrix(records, width=7, height=7):
+    """Return the features of the records of a self-play file, from the point
+    of view of the player to move, and the outcomes of the games for that
+    player.
+
+    Returns
+    -------
+    (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        An (n, len(FEATURES)) float array, the n outcomes (+1 or -1) and the
+        indices of the records used (positions with both players placed).
+    """
+    used = np.nonzero((records["player_1"] >= 0) &
+                      (records["player_2"] >= 0))[0]
+    records = records[used]
+    to_move = records["ply"] % 2 == 0
+    own = np.where(to_move, records["player_1"], records["player_2"]).astype(np.int64)
+    opp = np.where(to_move, records["player_2"], records["player_1"]).astype(np.int64)
+
+    table = move_table(width, height)
+    masks = np.array(table.masks, dtype=np.uint64)
+    full = np.uint64(table.full)
+    free = ~records["blocked"].astype(np.uint64) & full
+    one = np.uint64(1)
+    shifts = _shifts(width, height)
+
+    def mobility(loc):
+        reach = masks[loc] & free
+        second = np.zeros(len(loc), dtype=np.int64)
+        for offset, source in shifts:
+            target = loc + offset
+            valid = ((source >> loc.astype(np.uint64)) & one).astype(bool)
+            target = np.where(valid, target, 0)
+            valid &= ((free >> target.astype(np.uint64)) & one).astype(bool)
+            second += np.where(valid, _popcount(masks[target] & free), 0)
+        return _popcount(reach), second
+
+    own_moves, own_second = mobility(own)
+    opp_moves, opp_second = mobility(opp)
+
+    center_r, center_c = (height - 1) / 2., (width - 1) / 2.
+    own_r, own_c = own % height, own // height
+    opp_r, opp_c = opp % height, opp // height
+
+    own_region = _regions(one << own.astype(np.uint64), free, shifts)
+    opp_region = _regions(one << opp.astype(np.uint64), free, shifts)
+    partitioned = (own_region & opp_region) == 0
+    region_diff = np.where(partitioned, _popcount(own_region) -
+                           _popcount(opp_region), 0)
+
+    X = np.column_stack([
+        own_moves, opp_moves, own_second, opp_second,
+        np.abs(own_r - center_r) + np.abs(own_c - center_c),
+        np.abs(opp_r - center_r) + np.abs(opp_c - center_c),
+        np.abs(own_r - opp_r) + np.abs(own_c - opp_c),
+        partitioned, region_diff]).astype(float)
+    return X, records["outcome"].astype(float), used
+
+
+def features(game, player):
+    """Return the FEATURES of a position (with both players placed) for
+    `player`, as a list.
+    """
+    ctx = game.eval_context(player)
+    h = game.height
+    table = move_table(game.width, h)
+    masks = table.masks
+    free = free_cells(game)
+    own = ctx.own_loc[0] + ctx.own_loc[1] * h
+    opp = ctx.opp_loc[0] + ctx.opp_loc[1] * h
+
+    def second(idx):
+        total = 0
+        for _, (r, c) in table.targets[idx]:
+            nb = r + c * h
+            if free >> nb & 1:
+                total += bin(masks[nb] & free).count("1")
+        return total
+
+    center_r, center_c = (h - 1) / 2., (game.width - 1) / 2.
+    # the regions overlap iff the opponent can move into the player's one
+    own_region = region(masks, own, free)
+    partitioned = not masks[opp] & own_region
+    region_diff = 0
+    if partitioned:
+        region_diff = (bin(own_region).count("1") -
+                       bin(region(masks, opp, free)).count("1"))
+    (own_r, own_c), (opp_r, opp_c) = ctx.own_loc, ctx.opp_loc
+    return [ctx.own_moves, ctx.opp_moves, second(own), second(opp),
+            abs(own_r - center_r) + abs(own_c - center_c),
+            abs(opp_r - center_r) + abs(opp_c - center_c),
+            abs(own_r - opp_r) + abs(own_c - opp_c),
+            float(partitioned), region_diff]
+
+
+class LinearScore:
+    """Heuristic scoring positions with a weighted sum of FEATURES.
+
+    The expensive features, second-order mobility and the regions (for
+    `partitioned` and `region_diff`), are only computed if one of them has a
+    non-zero weight.
+
+    Parameters
+    ----------
+    weights : dict
+        Maps feature names to weights; missing features weigh 0.
+
+    bias : float (optional)
+        The intercept of the fit, i.e. the value of having the move. It is
+        kept for reference but not added to the scores, which are compared
+        between positions with the same player to move.
+    """
+    # the center features measure distances to the true center of the board
+    # (see `isolation.symmetry.symmetric()`)
+    symmetric = True
+
+    def __init__(self, weights, bias=0.):
+        unknown = set(weights) - set(FEATURES)
+        if unknown:
+            raise ValueError("Unknown features: {}".format(sorted(unknown)))
+        self.weights = dict((name, float(weights.get(name, 0.)))
+                            for name in FEATURES)
+        self.bias = float(bias)
+        w = [self.weights[name] for name in FEATURES]
+        self._vector = w
+        self._simple = not any(w[2:4]) and not any(w[7:])
+
+    def __call__(self, game, player):
+        ctx = game.eval_context(player)
+        if ctx.utility:
+            return ctx.utility
+        if ctx.own_loc is None or ctx.opp_loc is None:
+            return float(ctx.own_moves - ctx.opp_moves)
+        w = self._vector
+        if self._simple:
+            (own_r, own_c), (opp_r, opp_c) = ctx.own_loc, ctx.opp_loc
+            center_r = (game.height - 1) / 2.
+            center_c = (game.width - 1) / 2.
+            return (w[0] * ctx.own_moves + w[1] * ctx.opp_moves +
+                    w[4] * (abs(own_r - center_r) + abs(own_c - center_c)) +
+                    w[5] * (abs(opp_r - center_r) + abs(opp_c - center_c)) +
+                    w[6] * (abs(own_r - opp_r) + abs(own_c - opp_c)))
+        return sum(wi * fi for wi, fi in zip(w, features(game, player)))
+
+    def save(self, path):
+        """Write the weights to a JSON file. """
+        with open(path, "w") as f:
+            json.dump({"weights": self.weights, "bias": self.bias}, f,
+                      indent=2, sort_keys=True)
+
+    @classmethod
+    def load(cls, path):
+        """Read weights written by `save()`. """
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data["weights"], data.get("bias", 0.))
+
+
+def fit_least_squares(X, y):
+    """Return the (weights, bias) minimizing the squared error of X w + b
+    as a predictor of the outcomes y.
+    """
+    A = np.column_stack([X, np.ones(len(X))])
+    coef = np.linalg.lstsq(A, y, rcond=None)[0]
+    return coef[:-1], coef[-1]
+
+
+def fit_logistic(X, y, l2=1e-3, iterations=50):
+    """Return the (weights, bias) of an L2-regularized logistic regression
+    of the outcomes y (+1 or -1) on X, fitted with Newton's method.
+    """
+    A = np.column_stack([X, np.ones(len(X))])
+    target = (y > 0).astype(float)
+    coef = np.zeros(A.shape[1])
+    penalty = l2 * len(A) * np.eye(A.shape[1])
+    penalty[-1, -1] = 0.
+    for _ in range(iterations):
+        p = 1. / (1. + np.exp(-A.dot(coef)))
+        gradient = A.T.dot(p - target) + penalty.dot(coef)
+        hessian = (A * (p * (1. - p))[:, None]).T.dot(A) + penalty
+        step = np.linalg.solve(hessian, gradient)
+        coef -= step
+        if np.abs(step).max() < 1e-8:
+            break
+    return coef[:-1], coef[-1]
+
+
+METHODS = {"lstsq": fit_least_squares, "logistic": fit_logistic}
+
+
+def fit(records, width=7, height=7, method="logistic", holdout=0.1):
+    """Fit a `LinearScore` on self-play records, holding out one game in
+    every round(1 / holdout) (none if `holdout` is 0) to measure accuracy.
+
+    Returns
+    -------
+    (LinearScore, float)
+        The fitted heuristic and the fraction of held out positions whose
+        outcome has the sign of the (biased) linear prediction.
+    """
+    X, y, used = feature_matrix(records, width, height)
+    games = records["game"][used]
+    test = np.zeros(len(games), dtype=bool)
+    if holdout > 0:
+        period = max(int(round(1. / holdout)), 2)
+        test = games % period == period - 1
+    weights, bias = METHODS[method](X[~test], y[~test])
+    accuracy = float("nan")
+    if test.any():
+        predicted = X[test].dot(weights) + bias
+        accuracy = float(np.mean(np.sign(predicted) == y[test]))
+    return LinearScore(dict(zip(FEATURES, weights)), bias), accuracy
+
+
+if __name__ == "__main__":
+    import selfplay
+
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("data", help="self-play file written by selfplay.py")
+    parser.add_argument("path", help="output JSON file of weights")
+    parser.add_argument("--method", choices=sorted(METHODS),
+                        default="logistic")
+    args = parser.parse_args()
+
+    data = selfplay.load(args.data)
+    score, accuracy = fit(data.records, data.width, data.height, args.method)
+    score.save(args.path)
+    for name in FEATURES:
+        print("{:>12}: {:+.4f}".format(name, score.weights[name]))
+    print("{:>12}: {:+.4f}".format("bias", score.bias))
+    print("held out accuracy: {:.3f}".format(accuracy))
@@ -3,6 +3,11 @@ test your agent's strength against a set of known agents using tournament.py
 and include the results in your report.
 """
 import random
+from collections import namedtuple
+
+from endgame import EndgameSolver, EndgameTimeout, partition
+from isolation.symmetry import (canonical_hash, inverse_move, is_symmetric,
+                                symmetric, transform_move)
 
 
 class SearchTimeout(Exception):
@@ -10,6 +15,147 @@ class SearchTimeout(Exception):
     pass
 
 
+MoveStats = namedtuple("MoveStats", [
+    "move_count", "source", "depth", "nodes", "leaves", "cutoffs",
+    "iteration_ms", "time_left"])
+MoveStats.__doc__ = """Search statistics of one call to `get_move()`.
+
+move_count : number of moves played on the board before the move
+source : how the move was chosen: "book", "endgame", "search",
+    "partial" if it was improved by an iteration that did not finish, or
+    "helper" if it comes from a helper process of `lazy_smp.LazySMPPlayer`
+depth : depth of the deepest completed iteration (-1 if none completed)
+nodes : positions visited, including leaves and transposition table hits
+leaves : positions evaluated with the heuristic
+cutoffs : beta (and alpha) cutoffs
+iteration_ms : tuple of the duration of each completed iteration
+time_left : milliseconds left on the turn timer when the move was returned
+"""
+
+# XORed into the key of a position when the searching player is not the one
+# to move (see `AlphaBetaPlayer.position_key()`)
+OPPONENT_TO_MOVE = 0x9E3779B97F4A7C15
+
+
+class TimeManager:
+    """Decide when iterative deepening should stop starting iterations.
+
+    The cost of the next iteration is predicted as the duration of the last
+    one times the effective branching factor: the ratio of the durations of
+    the last two iterations, or the number of legal moves at the root while
+    the iterations are too short to time reliably. An iteration is started
+    only if its predicted cost fits in what is left of the budget of the
+    turn, so that iterations which cannot finish are skipped rather than
+    aborted. When a prediction falls short, the search is still aborted at
+    the margin and the best root move of the unfinished iteration is kept
+    (see `AlphaBetaPlayer.root_move`).
+
+    The budget of a turn is the time above the abort margin, scaled by the
+    share of the game phase: OPENING_SHARE while more than OPENING of the
+    cells are blank, and all of it afterwards.
+
+    Parameters
+    ----------
+    max_branching : float (optional)
+        Upper bound of the effective branching factor estimate.
+    """
+    MIN_MS = 0.5    # iterations shorter than this are too noisy to time
+    OPENING = 0.75  # fraction of blank cells above which the game is opening
+    OPENING_SHARE = 1.
+
+    def __init__(self, max_branching=8.):
+        self.max_branching = max_branching
+        self.iterations = []
+        self.branching = max_branching
+        self.deadline = 0.
+
+    def new_turn(self, game, time_left, margin):
+        """Forget the iterations of the previous turn and set the budget of
+        the turn on `game`, with `time_left` milliseconds left and an abort
+        margin of `margin`.
+        """
+        self.iterations = []
+        moves = len(game.get_legal_moves(shuffle=False))
+        self.branching = min(max(moves, 1), self.max_branching)
+        share = 1.
+        if len(game.get_blank_spaces()) > (self.OPENING * game.width *
+                                           game.height):
+            share = self.OPENING_SHARE
+        # time left on the timer when the budget is spent
+        self.deadline = time_left - share * (time_left - margin)
+
+    def record(self, elapsed):
+        """Record the duration (in milliseconds) of a completed iteration. """
+        self.iterations.append(elapsed)
+
+    def predict(self):
+        """Return the predicted duration of the next iteration. """
+        if not self.iterations:
+            return 0.
+        last = self.iterations[-1]
+        branching = self.branching
+        if len(self.iterations) > 1 and self.iterations[-2] >= self.MIN_MS:
+            branching = min(max(last / self.iterations[-2], 1.),
+                            self.max_branching)
+        return last * branching
+
+    def should_deepen(self, time_left):
+        """Return True if the next iteration should be started with
+        `time_left` milliseconds left.
+        """
+        return self.predict() <= time_left - self.deadline
+
+
+class TranspositionTable:
+    """Bounded table of search results keyed by the Zobrist hash of a
+    position (see `AlphaBetaPlayer.position_key()`).
+
+    Every slot holds a single entry `(key, depth, flag, value, move, age)`,
+    where `depth` is the remaining search depth below the stored position and
+    `flag` tells whether `value` is exact or a lower/upper bound. A new entry
+    replaces the occupant of its slot if the occupant was stored during an
+    earlier search (see `new_search()`) or was searched less deeply.
+
+    Parameters
+    ----------
+    size : int (optional)
+        The number of slots in the table.
+    """
+    EXACT, LOWER, UPPER = 0, 1, 2
+
+    def __init__(self, size=2**16):
+        self.size = size
+        self.age = 0
+        self._slots = [None] * size
+
+    def new_search(self):
+        """Mark the entries stored so far as stale, so that they are replaced
+        first by the results of the next search.
+        """
+        self.age += 1
+
+    def get(self, key):
+        """Return the entry stored for the position with hash `key`, or None.
+        """
+        entry = self._slots[key % self.size]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key, depth, flag, value, move):
+        """Store a search result unless the slot holds a more valuable entry.
+        """
+        idx = key % self.size
+        entry = self._slots[idx]
+        if entry is None or entry[5] != self.age or entry[1] <= depth:
+            self._slots[idx] = (key, depth, flag, value, move, self.age)
+
+    def clear(self):
+        """Remove all entries from the table. """
+        self._slots = [None] * self.size
+
+
+@symmetric
 def custom_score(game, player):
     """Calculate the heuristic value of a game state from the point of view
     of the given player.
@@ -34,39 +180,34 @@ def custom_score(game, player):
     float
         The heuristic value of the current game state to the specified player.
     """
-    if game.is_loser(player):
-        return float("-inf")
+    ctx = game.eval_context(player)
+    if ctx.utility:
+        return ctx.utility
 
-    if game.is_winner(player):
-        return float("inf")
-
-    opp = game.get_opponent(player)
-    my_moves = len(game.get_legal_moves(player))
-    opp_moves = len(game.get_legal_moves(opp))
+    my_moves = ctx.own_moves
+    opp_moves = ctx.opp_moves
 
     w, h = game.width / 2., game.height / 2.
-    y_p, x_p = game.get_player_location(player)
-    y_o, x_o = game.get_player_location(opp)
+    y_p, x_p = ctx.own_loc
+    y_o, x_o = ctx.opp_loc
     dist_players = abs(x_p - x_o) + abs(y_p - y_o)
 
     # prefer the move closer to the opponent - aggressive
     return float(my_moves - 1.6 * opp_moves - dist_players/(w+h))
 
 
+@symmetric
 def custom_score_2(game, player):
-    if game.is_loser(player):
-        return float("-inf")
+    ctx = game.eval_context(player)
+    if ctx.utility:
+        return ctx.utility
 
-    if game.is_winner(player):
-        return float("inf")
-
-    opp = game.get_opponent(player)
-    my_moves = len(game.get_legal_moves(player))
-    opp_moves = len(game.get_legal_moves(opp))
+    my_moves = ctx.own_moves
+    opp_moves = ctx.opp_moves
 
     w, h = game.width / 2., game.height / 2.
-    y_p, x_p = game.get_player_location(player)
-    y_o, x_o = game.get_player_location(opp)
+    y_p, x_p = ctx.own_loc
+    y_o, x_o = ctx.opp_loc
     dist_players = abs(x_p - x_o) + abs(y_p - y_o)
 
     # prefer the move farther from opponent - defensive
@@ -74,38 +215,33 @@ def custom_score_2(game, player):
 
 
 def custom_score_3(game, player):
-    if game.is_loser(player):
-        return float("-inf")
+    ctx = game.eval_context(player)
+    if ctx.utility:
+        return ctx.utility
 
-    if game.is_winner(player):
-        return float("inf")
-
-    opp = game.get_opponent(player)
-    my_moves = len(game.get_legal_moves(player))
-    opp_moves = len(game.get_legal_moves(opp))
+    my_moves = ctx.own_moves
+    opp_moves = ctx.opp_moves
 
     w, h = game.width / 2., game.height / 2.
-    y_p, x_p = game.get_player_location(player)
-    y_o, x_o = game.get_player_location(opp)
+    y_p, x_p = ctx.own_loc
+    y_o, x_o = ctx.opp_loc
     dist_center = abs(h - y_p) + abs(w - x_p)
 
     # prefer the move closer to the center
     return float(1.6 * my_moves - opp_moves - dist_center/(w+h))
 
 
+@symmetric
 def custom_score_4(game, player):
-    if game.is_loser(player):
-        return float("-inf")
+    ctx = game.eval_context(player)
+    if ctx.utility:
+        return ctx.utility
 
-    if game.is_winner(player):
-        return float("inf")
-
-    opp = game.get_opponent(player)
-    my_moves = len(game.get_legal_moves(player))
-    opp_moves = len(game.get_legal_moves(opp))
+    my_moves = ctx.own_moves
+    opp_moves = ctx.opp_moves
 
     w, h = game.width, game.height
-    y_p, x_p = game.get_player_location(player)
+    y_p, x_p = ctx.own_loc
 
     # penalize moves closer to the edge (-1 for proximity with each edge)
     if y_p == 0 or y_p == h-1:
@@ -118,48 +254,47 @@ def custom_score_4(game, player):
 
 
 # lookahead
+@symmetric
 def custom_score_5(game, player):
-    if game.is_loser(player):
-        return float("-inf")
-
-    if game.is_winner(player):
-        return float("inf")
+    ctx = game.eval_context(player)
+    if ctx.utility:
+        return ctx.utility
 
     # pdb.set_trace()
     opp = game.get_opponent(player)
 
-    my_moves = game.get_legal_moves(player)
-    my_moves_len = len(my_moves)
+    my_moves = game.get_legal_moves(player, shuffle=False)
+    my_moves_len = ctx.own_moves
 
-    opp_moves = game.get_legal_moves(opp)
-    opp_moves_len = len(opp_moves)
+    opp_moves = game.get_legal_moves(opp, shuffle=False)
+    opp_moves_len = ctx.opp_moves
 
     # pdb.set_trace()
     for m in my_moves:
-        _g = game.forecast_move(m)
-        my_moves_len += len(_g.get_legal_moves(player))
+        game.apply_move(m)
+        my_moves_len += len(game.get_legal_moves(player, shuffle=False))
+        game.undo_move()
 
     for m in opp_moves:
-        _g = game.forecast_move(m)
-        opp_moves_len += len(_g.get_legal_moves(opp))
+        game.apply_move(m)
+        opp_moves_len += len(game.get_legal_moves(opp, shuffle=False))
+        game.undo_move()
 
     return float(my_moves_len - opp_moves_len)
 
 
+@symmetric
 def custom_score_6(game, player):
-    if game.is_loser(player):
-        return float("-inf")
+    ctx = game.eval_context(player)
+    if ctx.utility:
+        return ctx.utility
 
-    if game.is_winner(player):
-        return float("inf")
-
-    opp = game.get_opponent(player)
-    my_moves = len(game.get_legal_moves(player))
-    opp_moves = len(game.get_legal_moves(opp))
+    my_moves = ctx.own_moves
+    opp_moves = ctx.opp_moves
 
     # w, h = game.width / 2., game.height / 2.
-    y_p, x_p = game.get_player_location(player)
-    y_o, x_o = game.get_player_location(opp)
+    y_p, x_p = ctx.own_loc
+    y_o, x_o = ctx.opp_loc
 
     dist_players = abs(x_p - x_o) + abs(y_p - y_o)
     if my_moves >= opp_moves:
@@ -201,10 +336,26 @@ class MinimaxPlayer(IsolationPlayer):
     """Game-playing agent that chooses a move using depth-limited minimax
     search. You must finish and test this player to make sure it properly uses
     minimax to return a good move before the search time limit expires.
+
+    Parameters
+    ----------
+    book : `opening_book.OpeningBook` (optional)
+        Precomputed opening moves consulted before searching.
     """
 
+    def __init__(self, search_depth=3, score_fn=custom_score, timeout=10.,
+                 book=None):
+        IsolationPlayer.__init__(self, search_depth, score_fn, timeout)
+        self.book = book
+        # random choices of the agent (reseeded by seeded games)
+        self.rng = random.Random()
+
     # book of opening moves
     def opening_book(self, game):
+        if self.book is not None:
+            move = self.book.lookup(game)
+            if move is not None:
+                return move
         moves = game.move_count
         if moves == 0:
             # provides ~5% by itself
@@ -301,9 +452,15 @@ class MinimaxPlayer(IsolationPlayer):
         if self.time_left() < self.TIMER_THRESHOLD:
             raise SearchTimeout()
 
+        # children are searched in-place: apply the move, recurse and undo it
+        # (also when the search is aborted by a timeout)
         v = float("-inf")
         for m in game.get_legal_moves():
-            new_v = self.min_value(game.forecast_move(m), 0, depth)
+            game.apply_move(m)
+            try:
+                new_v = self.min_value(game, 0, depth)
+            finally:
+                game.undo_move()
             if new_v > v:
                 best_move = m
                 v = new_v
@@ -311,7 +468,7 @@ class MinimaxPlayer(IsolationPlayer):
         # graceful losing - no forfeiting
         if (v == float("-inf")) & (len(game.get_legal_moves()) > 0):
             moves = game.get_legal_moves()
-            best_move = moves[random.randint(0, len(moves)-1)]
+            best_move = moves[self.rng.randint(0, len(moves)-1)]
 
         return best_move
 
@@ -326,7 +483,11 @@ class MinimaxPlayer(IsolationPlayer):
 
         v = float("-inf")
         for m in game.get_legal_moves():
-            v = max(v, self.min_value(game.forecast_move(m), depth, d_limit))
+            game.apply_move(m)
+            try:
+                v = max(v, self.min_value(game, depth, d_limit))
+            finally:
+                game.undo_move()
         return v
 
     # min value
@@ -340,7 +501,11 @@ class MinimaxPlayer(IsolationPlayer):
 
         v = float("inf")
         for m in game.get_legal_moves():
-            v = min(v, self.max_value(game.forecast_move(m), depth, d_limit))
+            game.apply_move(m)
+            try:
+                v = min(v, self.max_value(game, depth, d_limit))
+            finally:
+                game.undo_move()
         return v
 
 
@@ -348,16 +513,69 @@ class AlphaBetaPlayer(IsolationPlayer):
     """Game-playing agent that chooses a move using iterative deepening minimax
     search with alpha-beta pruning. You must finish and test this player to
     make sure it returns a good move before the search time limit expires.
-    """
 
-    # def __init__(self, search_depth=3, score_fn=custom_score, timeout=10.):
-    #     IsolationPlayer.__init__(self, search_depth, score_fn, timeout)
-    #     self.depths = []
-    #     self.legal_moves = []
-    #     self.utility = {}
+    The search stops at `timeout` milliseconds before the end of the turn
+    (the margin absorbs the time to unwind the search and return), and no
+    iteration is started unless `TimeManager` expects it to finish within the
+    budget of the turn.
+
+    Parameters
+    ----------
+    tt_size : int (optional)
+        The number of slots of the transposition table.
+
+    book : `opening_book.OpeningBook` (optional)
+        Precomputed opening moves consulted before searching.
+
+    batch_fn : callable (optional)
+        A batch version of `score_fn` (see batch_eval.py), called as
+        `batch_fn(game, moves, player)` to score all the children of a node
+        at once when they are the leaves of the search.
+    """
+    CANONICAL_PLIES = 6   # see position_key()
+
+    def __init__(self, search_depth=3, score_fn=custom_score, timeout=20.,
+                 tt_size=2**16, book=None, batch_fn=None):
+        IsolationPlayer.__init__(self, search_depth, score_fn, timeout)
+        self.book = book
+        self.batch_score = batch_fn
+        # random choices of the agent (reseeded by seeded games)
+        self.rng = random.Random()
+
+        # per-move search statistics (see MoveStats) and the counters of the
+        # current search
+        self.stats = []
+        self.nodes = self.leaves = self.cutoffs = 0
+
+        # positions are only keyed by their canonical hash if the heuristics
+        # value symmetric positions alike
+        self.canonical_plies = (self.CANONICAL_PLIES
+                                if is_symmetric(score_fn, batch_fn) else 0)
+
+        # iteration planning, and the best root move of the current iteration
+        # (kept if the iteration does not finish)
+        self.timer = TimeManager()
+        self.root_move = None
+
+        # search results are kept between iterations and turns
+        self.tt = TranspositionTable(tt_size)
+
+        # move ordering: best root move of the previous iteration, the two
+        # most recent cutoff moves per ply, and the history score of each
+        # move for either side (0 for this player, 1 for the opponent)
+        self.pv_move = None
+        self.killers = {}
+        self.history = ({}, {})
+
+        # exact solver for positions where the players are partitioned
+        self.endgame = EndgameSolver()
 
     # book of opening moves
     def opening_book(self, game):
+        if self.book is not None:
+            move = self.book.lookup(game)
+            if move is not None:
+                return move
         moves = game.move_count
         # central move first
         if moves == 0:
@@ -396,42 +614,106 @@ class AlphaBetaPlayer(IsolationPlayer):
             Board coordinates corresponding to a legal move; may return
             (-1, -1) if there are no available legal moves.
         """
-        self.time_left = time_left
-        self.TIMER_THRESHOLD = 35
-        depth_limit = 0
+        return self.choose_move(game, time_left)
 
-        # Initialize the best move so that this function returns something
-        # in case the search fails due to timeout
-        best_move = (-1, -1)
+    def choose_move(self, game, time_left):
+        """Choose a move from the opening book, the endgame solver or with
+        iterative deepening (see `get_move()`).
+        """
+        self.time_left = time_left
+        self.tt.new_search()
+        self.new_ordering()
+        self.nodes = self.leaves = self.cutoffs = 0
+        iteration_ms = []
 
         # opening book moves
         opening = self.opening_book(game)
         if opening:
-            # self.depths.append(depth_limit)
-            # self.legal_moves.append(len(game.get_legal_moves()))
+            self.record_stats(game, "book", -1, iteration_ms)
             return opening
 
-        # main cycle
-        try:
-            while depth_limit < len(game.get_blank_spaces()):
-                best_move = self.alphabeta(game, depth_limit)
-                depth_limit += 1
-            # best_moves.append[best_move]
-        except SearchTimeout:
-            pass
+        # perfect play once the players are walled off from each other
+        endgame_move = self.endgame_move(game)
+        if endgame_move is not None:
+            self.record_stats(game, "endgame", -1, iteration_ms)
+            return endgame_move
+
+        best_move, source, depth = self.deepen(game, iteration_ms)
 
         # graceful forfeit
         legal_moves = game.get_legal_moves()
         if (best_move not in legal_moves) & (len(legal_moves) > 0):
-            best_move = legal_moves[random.randint(0, len(legal_moves) - 1)]
+            best_move = legal_moves[self.rng.randint(0, len(legal_moves) - 1)]
 
-        # # save for analysis purposes
-        # self.depths.append(depth_limit)
-        # self.legal_moves.append(len(game.get_legal_moves()))
+        # save for analysis purposes
+        self.record_stats(game, source, depth, iteration_ms)
 
         # Return the best move from the last completed search iteration
         return best_move
 
+    def deepen(self, game, iteration_ms):
+        """Search `game` with iterative deepening while the next iteration is
+        expected to fit in the time left, appending the duration of each
+        completed iteration to `iteration_ms`.
+
+        Returns
+        -------
+        ((int, int), str, int)
+            The best move, its `MoveStats` source ("search" or "partial") and
+            the depth of the deepest completed iteration (-1 if none).
+        """
+        # Initialize the best move so that this function returns something
+        # in case the search fails due to timeout
+        best_move = (-1, -1)
+        depth_limit = 0
+        source = "search"
+        self.timer.new_turn(game, self.time_left(), self.TIMER_THRESHOLD)
+        try:
+            while depth_limit < len(game.get_blank_spaces()):
+                if not self.timer.should_deepen(self.time_left()):
+                    break
+                start = self.time_left()
+                self.root_move = None
+                best_move = self.alphabeta(game, depth_limit)
+                iteration_ms.append(start - self.time_left())
+                self.timer.record(iteration_ms[-1])
+                self.pv_move = best_move
+                depth_limit += 1
+        except SearchTimeout:
+            # the unfinished iteration searched the previous best move first,
+            # so any move it preferred is better at the new depth
+            if self.root_move is not None and self.root_move != best_move:
+                best_move = self.root_move
+                source = "partial"
+
+        return best_move, source, depth_limit - 1
+
+    def record_stats(self, game, source, depth, iteration_ms):
+        """Append the `MoveStats` of the current move to `self.stats`. """
+        self.stats.append(MoveStats(
+            game.move_count, source, depth, self.nodes, self.leaves,
+            self.cutoffs, tuple(iteration_ms), self.time_left()))
+
+    def endgame_move(self, game):
+        """Return the first move of the longest path available to the player
+        if the players are partitioned, or None otherwise.
+
+        The solver may use half of the remaining search time. If it does not
+        finish, None is returned (its memo keeps the solved subproblems for
+        the next turn) and the regular search runs with the remaining time.
+        """
+        if partition(game) is None:
+            return None
+        budget = (self.time_left() - self.TIMER_THRESHOLD) / 2
+        try:
+            move, _ = self.endgame.best_move(
+                game, self.time_left, self.TIMER_THRESHOLD + budget)
+        except EndgameTimeout:
+            return None
+        if move == (-1, -1):
+            return None
+        return move
+
     def alphabeta(self, game, depth, alpha=float("-inf"), beta=float("inf")):
         """Implement depth-limited minimax search with alpha-beta pruning as
         described in the lectures.
@@ -488,55 +770,357 @@ class AlphaBetaPlayer(IsolationPlayer):
 
         return best_move
 
+    def position_key(self, game):
+        """Return the transposition table key of a position and the symmetry
+        mapping the position onto the image the key stands for.
+
+        If the heuristics of the player are declared symmetric (see
+        `isolation.symmetry.symmetric()`), positions with fewer than
+        CANONICAL_PLIES moves played are keyed by their canonical hash, so
+        that all the reflections and rotations of a position share one
+        entry; other positions, and later ones, which are rarely symmetric,
+        by their own hash.
+
+        Values are stored from the point of view of the searching player, so
+        the key records whether that player is to move as well as the hash:
+        since the hash records which seat is to move, the same position
+        searched from the other seat (e.g. by an agent reused in the next
+        game of a tournament) gets a different key.
+        """
+        if game.move_count < self.canonical_plies:
+            key, sym = canonical_hash(game)
+        else:
+            key, sym = game.hash(), 0
+        if game.active_player is not self:
+            key ^= OPPONENT_TO_MOVE
+        return key, sym
+
+    def probe(self, game, alpha, beta, remaining):
+        """Look up the current position in the transposition table.
+
+        Returns
+        -------
+        ((float, (int, int)) or None, (int, int), (int, int) or None)
+            The stored (value, move) pair if it settles the search of this
+            node within the (alpha, beta) window, or None, followed by the
+            position key and symmetry (see `position_key()`) and the stored
+            best move (if any) to search first.
+        """
+        key = self.position_key(game)
+        entry = self.tt.get(key[0])
+        if entry is None:
+            return None, key, None
+        _, depth, flag, value, move, _ = entry
+        if key[1] and move is not None and move != (-1, -1):
+            move = inverse_move(move, key[1], game.width, game.height)
+        if depth >= remaining and (
+                flag == TranspositionTable.EXACT or
+                (flag == TranspositionTable.LOWER and value >= beta) or
+                (flag == TranspositionTable.UPPER and value <= alpha)):
+            return (value, move), key, move
+        return None, key, move
+
+    def new_game(self):
+        """Forget the search results and move ordering data of the previous
+        games, so that a game does not depend on the games played before it.
+        """
+        self.tt.clear()
+        self.pv_move = None
+        self.killers = {}
+        self.history = ({}, {})
+
+    def new_ordering(self):
+        """Reset the move ordering data at the start of a new turn. Killer
+        moves are discarded, and history scores are halved so that recent
+        cutoffs dominate.
+        """
+        self.pv_move = None
+        self.killers = {}
+        for table in self.history:
+            for m in table:
+                table[m] //= 2
+
+    def ordered_moves(self, game, ply, side, hash_move):
+        """Return the legal moves of the active player in the order they
+        should be searched: the hash (or principal variation) move first,
+        then the killer moves for this ply, then the remaining moves by
+        decreasing history score.
+        """
+        moves = game.get_legal_moves(shuffle=False)
+        if len(moves) < 2:
+            return moves
+        history = self.history[side]
+        killers = self.killers.get(ply, ())
+
+        def rank(m):
+            if m == hash_move:
+                return 3, 0
+            if m in killers:
+                return 2, 0
+            return 1, history.get(m, 0)
+        moves.sort(key=rank, reverse=True)
+        return moves
+
+    def record_cutoff(self, move, ply, side, remaining):
+        """Update the killer moves and history scores after `move` caused a
+        cutoff with `remaining` plies left to search.
+        """
+        self.cutoffs += 1
+        killers = self.killers.get(ply)
+        if killers is None:
+            self.killers[ply] = [move, None]
+        elif killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        history = self.history[side]
+        history[move] = history.get(move, 0) + remaining * remaining
+
+    def leaf_scores(self, game, moves, depth, d_limit):
+        """Return the scores of the children reached by `moves` computed by
+        the batch score function if the children are leaves of the search
+        (at depth `depth` of a search to `d_limit`), or None otherwise.
+        """
+        if self.batch_score is None or depth < d_limit or not moves:
+            return None
+        self.nodes += len(moves)
+        self.leaves += len(moves)
+        return self.batch_score(game, moves, self)
+
+    def save(self, game, key, alpha, beta, remaining, value, move):
+        """Store a search result in the transposition table, classifying it
+        as a bound with respect to the original (alpha, beta) window.
+        """
+        if value <= alpha:
+            flag = TranspositionTable.UPPER
+        elif value >= beta:
+            flag = TranspositionTable.LOWER
+        else:
+            flag = TranspositionTable.EXACT
+        hash_key, sym = key
+        if sym and move != (-1, -1):
+            move = transform_move(move, sym, game.width, game.height)
+        self.tt.store(hash_key, remaining, flag, value, move)
+
     # min value
     def min_ab(self, game, alpha, beta, depth, d_limit):
         if self.time_left() < self.TIMER_THRESHOLD:
             raise SearchTimeout()
+        self.nodes += 1
+
+        hit, key, hash_move = self.probe(game, alpha, beta, d_limit - depth)
+        if hit is not None:
+            return hit
 
         if depth >= d_limit:
-            return self.score(game, self), (-1, -1)
+            self.leaves += 1
+            v = self.score(game, self)
+            self.tt.store(key[0], 0, TranspositionTable.EXACT, v, (-1, -1))
+            return v, (-1, -1)
+        alpha_0, beta_0 = alpha, beta
+        ply = depth
         depth += 1
 
         v = float("inf")
         move = (-1, -1)
 
-        for m in game.get_legal_moves():
-            _g = game.forecast_move(m)
-            _v, _ = self.max_ab(_g, alpha, beta, depth, d_limit)
+        moves = self.ordered_moves(game, ply, 1, hash_move)
+        leaves = self.leaf_scores(game, moves, depth, d_limit)
+
+        for i, m in enumerate(moves):
+            if leaves is not None:
+                _v = leaves[i]
+            else:
+                game.apply_move(m)
+                try:
+                    _v, _ = self.max_ab(game, alpha, beta, depth, d_limit)
+                finally:
+                    game.undo_move()
             if _v < v:
                 v = _v
                 move = m
 
             if v <= alpha:
-                return v, move
+                self.record_cutoff(m, ply, 1, d_limit - ply)
+                break
             beta = min(beta, v)
+
+        self.save(game, key, alpha_0, beta_0, d_limit - depth + 1, v, move)
         return v, move
 
     # max value
     def max_ab(self, game, alpha, beta, depth, d_limit):
         if self.time_left() < self.TIMER_THRESHOLD:
             raise SearchTimeout()
+        self.nodes += 1
+
+        hit, key, hash_move = self.probe(game, alpha, beta, d_limit - depth)
+        if hit is not None:
+            return hit
 
         if depth >= d_limit:
-            return self.score(game, self), (-1, -1)
+            self.leaves += 1
+            v = self.score(game, self)
+            self.tt.store(key[0], 0, TranspositionTable.EXACT, v, (-1, -1))
+            return v, (-1, -1)
+        alpha_0, beta_0 = alpha, beta
+        ply = depth
         depth += 1
 
+        # the best move of the previous iteration is searched first at the root
+        if ply == 0 and self.pv_move is not None:
+            hash_move = self.pv_move
+
         v = float("-inf")
         move = (-1, -1)
 
-        for m in game.get_legal_moves():
-            _g = game.forecast_move(m)
-            _v, _m = self.min_ab(_g, alpha, beta, depth, d_limit)
+        moves = self.ordered_moves(game, ply, 0, hash_move)
+        leaves = self.leaf_scores(game, moves, depth, d_limit)
+
+        for i, m in enumerate(moves):
+            if leaves is not None:
+                _v = leaves[i]
+            else:
+                game.apply_move(m)
+                try:
+                    _v, _m = self.min_ab(game, alpha, beta, depth, d_limit)
+                finally:
+                    game.undo_move()
             if _v > v:
                 v = _v
                 move = m
+                if ply == 0 and v > alpha_0:
+                    self.root_move = m
 
             if v >= beta:
-                return v, move
+                self.record_cutoff(m, ply, 0, d_limit - ply)
+                break
             alpha = max(alpha, v)
+
+        self.save(game, key, alpha_0, beta_0, d_limit - depth + 1, v, move)
         return v, move
 
 
+class PVSPlayer(AlphaBetaPlayer):
+    """Game-playing agent that chooses a move using iterative deepening
+    negamax search with principal variation search (PVS, a.k.a. NegaScout).
+
+    After the first (best ordered) child of a node, the remaining children
+    are searched with a null window around alpha just to prove that they are
+    no better, and only re-searched with the full window when they are.
+    Each iteration first searches an aspiration window of +/- ASPIRATION
+    around the score of the previous iteration, falling back to the full
+    window if the root value falls outside it.
+
+    Values are negamax scores, i.e., `score_fn` from the point of view of the
+    player to move; the transposition table stores them the same way.
+    """
+    ASPIRATION = 1.
+    NULL_WINDOW = 1e-6
+
+    def __init__(self, search_depth=3, score_fn=custom_score, timeout=20.,
+                 tt_size=2**16, book=None, batch_fn=None):
+        AlphaBetaPlayer.__init__(self, search_depth, score_fn, timeout,
+                                 tt_size, book, batch_fn)
+        self.pv_score = None
+
+    def new_ordering(self):
+        AlphaBetaPlayer.new_ordering(self)
+        self.pv_score = None
+
+    def alphabeta(self, game, depth, alpha=float("-inf"), beta=float("inf")):
+        """Search the game tree to the given depth and return the best move,
+        searching an aspiration window around the previous iteration's score
+        first when the full (alpha, beta) window is requested.
+        """
+        if self.time_left() < self.TIMER_THRESHOLD:
+            raise SearchTimeout()
+
+        prev = self.pv_score
+        if (prev is not None and abs(prev) != float("inf") and
+                alpha == float("-inf") and beta == float("inf")):
+            lo, hi = prev - self.ASPIRATION, prev + self.ASPIRATION
+            v, move = self.negamax(game, lo, hi, 0, depth)
+            if lo < v < hi:
+                self.pv_score = v
+                return move
+
+        v, move = self.negamax(game, alpha, beta, 0, depth)
+        self.pv_score = v
+        return move
+
+    def negamax(self, game, alpha, beta, depth, d_limit):
+        """Return the negamax (value, move) pair of the current position,
+        searching `d_limit - depth` more plies with principal variation
+        search inside the (alpha, beta) window.
+        """
+        if self.time_left() < self.TIMER_THRESHOLD:
+            raise SearchTimeout()
+        self.nodes += 1
+
+        hit, key, hash_move = self.probe(game, alpha, beta, d_limit - depth)
+        if hit is not None:
+            return hit
+
+        side = 0 if game.active_player == self else 1
+        if depth >= d_limit:
+            self.leaves += 1
+            v = self.score(game, self)
+            if side:
+                v = -v
+            self.tt.store(key[0], 0, TranspositionTable.EXACT, v, (-1, -1))
+            return v, (-1, -1)
+        alpha_0 = alpha
+        ply = depth
+        depth += 1
+
+        if ply == 0 and self.pv_move is not None:
+            hash_move = self.pv_move
+
+        v = float("-inf")
+        move = (-1, -1)
+
+        moves = self.ordered_moves(game, ply, side, hash_move)
+        leaves = self.leaf_scores(game, moves, depth, d_limit)
+
+        for i, m in enumerate(moves):
+            if leaves is not None:
+                # batch scores are from this player's point of view
+                _v = -leaves[i] if side else leaves[i]
+            else:
+                game.apply_move(m)
+                try:
+                    _v = self.search_child(game, alpha, beta, v, depth,
+                                           d_limit)
+                finally:
+                    game.undo_move()
+            if _v > v:
+                v = _v
+                move = m
+                if ply == 0 and v > alpha_0:
+                    self.root_move = m
+
+            if v >= beta:
+                self.record_cutoff(m, ply, side, d_limit - ply)
+                break
+            alpha = max(alpha, v)
+
+        self.save(game, key, alpha_0, beta, d_limit - depth + 1, v, move)
+        return v, move
+
+    def search_child(self, game, alpha, beta, v, depth, d_limit):
+        """Return the negamax value, to the parent, of the child position
+        `game`, given the best value `v` found so far among its siblings.
+        """
+        if v == float("-inf") or alpha == float("-inf"):
+            return -self.negamax(game, -beta, -alpha, depth, d_limit)[0]
+        # null window: only prove the move is no better than alpha
+        _v = -self.negamax(game, -alpha - self.NULL_WINDOW, -alpha,
+                           depth, d_limit)[0]
+        if alpha < _v < beta:
+            _v = -self.negamax(game, -beta, -alpha, depth, d_limit)[0]
+        return _v
+
+
 # used for testing
 if __name__ == "__main__":
     from isolation import Board
@@ -0,0 +1,310 @@
+"""
+This file contains the `BitBoard` class, a drop-in replacement for
+`isolation.Board` that packs the blocked cells into a single integer and
+generates knight moves from precomputed per-square masks.
+
+Cells use the same linear index as `Board` (idx = row + column * height), so
+bit `idx` of the blocked mask corresponds to `Board._board_state[idx]`.
+"""
+import random
+
+from .isolation import Board, EvalContext, _utility
+from .zobrist import zobrist_keys
+
+DIRECTIONS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
+              (1, -2), (1, 2), (2, -1), (2, 1)]
+
+# Move tables are shared by every board with the same dimensions
+_TABLES = {}
+
+
+def _count(mask):
+    return bin(mask).count("1")
+
+
+class MoveTable(object):
+    """Precomputed knight-move data for a board of the given size.
+
+    Attributes
+    ----------
+    masks : tuple<int>
+        masks[idx] has a bit set for every cell a knight can reach from idx.
+
+    targets : tuple<tuple<(int, (int, int))>>
+        targets[idx] lists the (bit, move) pairs encoded in masks[idx].
+
+    moves : tuple<(int, int)>
+        moves[idx] is the (row, column) coordinate pair of cell idx.
+
+    full : int
+        A mask with one bit set for every cell on the board.
+    """
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.full = (1 << (width * height)) - 1
+        self.moves = tuple((idx % height, idx // height)
+                           for idx in range(width * height))
+
+        masks = []
+        targets = []
+        for r, c in self.moves:
+            pairs = []
+            for dr, dc in DIRECTIONS:
+                if 0 <= r + dr < height and 0 <= c + dc < width:
+                    idx = (r + dr) + (c + dc) * height
+                    pairs.append((1 << idx, (r + dr, c + dc)))
+            masks.append(sum(bit for bit, _ in pairs))
+            targets.append(tuple(pairs))
+        self.masks = tuple(masks)
+        self.targets = tuple(targets)
+
+        # cache of legal move tuples keyed by (square, open target mask); at
+        # most 2**8 entries per square, filled on first use
+        self._cache = [{} for _ in range(width * height)]
+
+    def moves_from(self, idx, free):
+        """Return the tuple of moves from cell `idx` whose bits are set in
+        `free` (which must already be restricted to masks[idx]).
+        """
+        cache = self._cache[idx]
+        moves = cache.get(free)
+        if moves is None:
+            moves = tuple(m for bit, m in self.targets[idx] if free & bit)
+            cache[free] = moves
+        return moves
+
+
+def move_table(width, height):
+    """Return the shared `MoveTable` for a board of the given size. """
+    table = _TABLES.get((width, height))
+    if table is None:
+        table = _TABLES[(width, height)] = MoveTable(width, height)
+    return table
+
+
+class BitBoard(Board):
+    """Implement the `Board` model for the game Isolation using integer
+    bitmasks for the blocked cells.
+
+    The public API is identical to `isolation.Board`; see that class for
+    parameter descriptions.
+    """
+
+    def __init__(self, player_1, player_2, width=7, height=7, seed=None):
+        self.width = width
+        self.height = height
+        self.move_count = 0
+        self._player_1 = player_1
+        self._player_2 = player_2
+        self._active_player = player_1
+        self._inactive_player = player_2
+        self.seed = seed
+        self._rng = random if seed is None else random.Random(seed)
+
+        self._table = move_table(width, height)
+        self._blocked = 0
+        # cell index of each player (player 1 first), and the index into
+        # _locs of the player holding initiative
+        self._locs = [Board.NOT_MOVED, Board.NOT_MOVED]
+        self._initiative = 0
+        self._move_stack = []
+        self._zobrist = zobrist_keys(width, height)
+        self._hash = 0
+
+    @classmethod
+    def from_state(cls, player_1, player_2, blocked, locs, move_count,
+                   width=7, height=7):
+        """Return a board in a given state, without move history: moves can
+        be applied and undone, but not the moves before it.
+
+        Parameters
+        ----------
+        blocked : int
+            The mask of the blocked cells (bit row + column * height), the
+            locations of the players included.
+
+        locs : (int, int)
+            The cell index of player 1 and of player 2 (`Board.NOT_MOVED`
+            for a player not placed yet).
+
+        move_count : int
+            The number of moves played; player 1 is to move if it is even.
+        """
+        game = cls(player_1, player_2, width, height)
+        game._blocked = blocked
+        game._locs = list(locs)
+        game._initiative = move_count % 2
+        game.move_count = move_count
+        if move_count % 2:
+            game._active_player, game._inactive_player = player_2, player_1
+
+        keys = game._zobrist
+        h = keys.side if move_count % 2 else 0
+        for idx in range(width * height):
+            if blocked >> idx & 1:
+                h ^= keys.blocked[idx]
+        for slot, loc in enumerate(game._locs):
+            if loc is not Board.NOT_MOVED:
+                h ^= keys.player[slot][loc]
+        game._hash = h
+        return game
+
+    @property
+    def _board_state(self):
+        """The equivalent `Board._board_state` list, for compatibility with
+        code that inspects the state directly.
+        """
+        blocked = self._blocked
+        state = [int(blocked >> idx & 1)
+                 for idx in range(self.width * self.height)]
+        return state + [self._initiative, self._locs[1], self._locs[0]]
+
+    def copy(self):
+        """ Return a deep copy of the current board. """
+        new_board = type(self).__new__(type(self))
+        new_board.width = self.width
+        new_board.height = self.height
+        new_board.move_count = self.move_count
+        new_board.seed = self.seed
+        new_board._rng = self._rng
+        new_board._player_1 = self._player_1
+        new_board._player_2 = self._player_2
+        new_board._active_player = self._active_player
+        new_board._inactive_player = self._inactive_player
+        new_board._table = self._table
+        new_board._blocked = self._blocked
+        new_board._locs = self._locs[:]
+        new_board._initiative = self._initiative
+        new_board._move_stack = self._move_stack[:]
+        new_board._zobrist = self._zobrist
+        new_board._hash = self._hash
+        return new_board
+
+    def move_is_legal(self, move):
+        """Test whether a move is legal in the current game state. """
+        r, c = move
+        return (0 <= r < self.height and 0 <= c < self.width and
+                not self._blocked >> (r + c * self.height) & 1)
+
+    def get_blank_spaces(self):
+        """Return a list of the locations that are still available on the board.
+        """
+        blocked = self._blocked
+        moves = self._table.moves
+        return [moves[idx] for idx in range(self.width * self.height)
+                if not blocked >> idx & 1]
+
+    def get_player_location(self, player):
+        """Find the current location of the specified player on the board. """
+        if player == self._player_1:
+            idx = self._locs[0]
+        elif player == self._player_2:
+            idx = self._locs[1]
+        else:
+            raise RuntimeError(
+                "Invalid player in get_player_location: {}".format(player))
+        if idx is Board.NOT_MOVED:
+            return Board.NOT_MOVED
+        return self._table.moves[idx]
+
+    def get_legal_moves(self, player=None, shuffle=True):
+        """Return the list of all legal moves for the specified player. """
+        if player is None:
+            idx = self._locs[self._initiative]
+        elif player == self._player_1:
+            idx = self._locs[0]
+        elif player == self._player_2:
+            idx = self._locs[1]
+        else:
+            raise RuntimeError(
+                "Invalid player in get_legal_moves: {}".format(player))
+
+        if idx is Board.NOT_MOVED:
+            return self.get_blank_spaces()
+
+        table = self._table
+        moves = list(table.moves_from(idx, table.masks[idx] & ~self._blocked))
+        if shuffle:
+            self._rng.shuffle(moves)
+        return moves
+
+    def eval_context(self, player):
+        """Return the `EvalContext` of the current state for the specified
+        player (see `Board.eval_context`), counting moves with bit masks.
+        """
+        if player == self._player_1:
+            own, opp = self._locs
+        elif player == self._player_2:
+            opp, own = self._locs
+        else:
+            raise RuntimeError(
+                "Invalid player in eval_context: {}".format(player))
+        table = self._table
+        free = ~self._blocked & table.full
+        own_moves = _count(free if own is Board.NOT_MOVED
+                           else table.masks[own] & free)
+        opp_moves = _count(free if opp is Board.NOT_MOVED
+                           else table.masks[opp] & free)
+        moves = table.moves
+        return EvalContext(
+            own_moves, opp_moves,
+            Board.NOT_MOVED if own is Board.NOT_MOVED else moves[own],
+            Board.NOT_MOVED if opp is Board.NOT_MOVED else moves[opp],
+            _utility(player == self._active_player, own_moves, opp_moves))
+
+    def _has_moves(self):
+        """Return True if the active player has at least one legal move. """
+        idx = self._locs[self._initiative]
+        if idx is Board.NOT_MOVED:
+            return self._blocked != self._table.full
+        return bool(self._table.masks[idx] & ~self._blocked)
+
+    def apply_move(self, move):
+        """Move the active player to a specified location. """
+        idx = move[0] + move[1] * self.height
+        prev_loc = self._locs[self._initiative]
+        self._move_stack.append((idx, prev_loc))
+        self._hash ^= self._zobrist.toggle(self._initiative, idx, prev_loc)
+        self._blocked |= 1 << idx
+        self._locs[self._initiative] = idx
+        self._initiative ^= 1
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        self.move_count += 1
+
+    def undo_move(self):
+        """Revert the most recent move applied to the board (see
+        `Board.undo_move`).
+        """
+        if not self._move_stack:
+            raise RuntimeError("There are no moves to undo on this board.")
+        idx, prev_loc = self._move_stack.pop()
+        self._initiative ^= 1
+        self._hash ^= self._zobrist.toggle(self._initiative, idx, prev_loc)
+        self._locs[self._initiative] = prev_loc
+        self._blocked ^= 1 << idx
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        self.move_count -= 1
+        return self._table.moves[idx]
+
+    def is_winner(self, player):
+        """ Test whether the specified player has won the game. """
+        return player == self._inactive_player and not self._has_moves()
+
+    def is_loser(self, player):
+        """ Test whether the specified player has lost the game. """
+        return player == self._active_player and not self._has_moves()
+
+    def utility(self, player):
+        """Returns the utility of the current game state from the perspective
+        of the specified player (see `Board.utility`).
+        """
+        if not self._has_moves():
+
+            if player == self._inactive_player:
+                return float("inf")
+
+            if player == self._active_player:
+                return float("-inf")
+
+        return 0.
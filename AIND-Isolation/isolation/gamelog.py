@@ -0,0 +1,251 @@
+"""
+Binary game logs for Isolation matches.
+
+A game log is an append-only file of finished games. It starts with a file
+header (the magic bytes b"ISGL" and the format version, padded to 8 bytes),
+followed by one block per game: a fixed-width game header and one fixed-width
+record per ply, from the empty board. All fields are little endian.
+
+Game header (`GAME`, 88 bytes):
+
+    magic : 4 bytes, b"GAME"
+    width, height : uint8 board size
+    winner : uint8, 1 or 2
+    termination : uint8 index of the reason the game ended in TERMINATIONS
+    plies : uint16 number of ply records of the game
+    opening : uint16 number of plies applied before play started (e.g. a
+        tournament opening); they are not timed
+    time_limit : float32 milliseconds per turn
+    seed : uint64 seed of the game
+    player_1, player_2 : 32 bytes each, agent names (UTF-8, NUL padded)
+
+Ply record (`PLY`, 8 bytes):
+
+    row, col : int8 move
+    time_used : float32 milliseconds taken by the turn (NaN for the opening)
+
+Games are written with a single `write()` on a file opened in append mode,
+so several processes can log to the same file without interleaving their
+games. `GameLogReader` maps a log into memory and rebuilds the `Board` of any
+game at any ply from its moves, without running the agents.
+"""
+import json
+import mmap
+import os
+import struct
+from collections import namedtuple
+
+from .isolation import Board
+
+MAGIC = b"ISGL"
+VERSION = 1
+TERMINATIONS = ("illegal move", "timeout", "forfeit")
+
+_FILE = struct.Struct("<4sB3x")
+GAME = struct.Struct("<4sBBBBHHfQ32s32s")
+PLY = struct.Struct("<bb2xf")
+_GAME_MAGIC = b"GAME"
+
+GameHeader = namedtuple("GameHeader", ["width", "height", "winner",
+                                       "termination", "plies", "opening",
+                                       "time_limit", "seed", "player_1",
+                                       "player_2"])
+GameHeader.__doc__ = """Header of a logged game (see the module docstring);
+`winner` is 1 or 2 and `termination` is the string returned by `Board.play`.
+"""
+
+
+def _name(player):
+    name = player if isinstance(player, str) else type(player).__name__
+    return name.encode("utf-8")[:32]
+
+
+def encode_game(header, moves, times):
+    """Return the bytes of a game block: a `GameHeader` and the moves of the
+    game with the milliseconds each one took.
+    """
+    parts = [GAME.pack(_GAME_MAGIC, header.width, header.height,
+                       header.winner, TERMINATIONS.index(header.termination),
+                       len(moves), header.opening, header.time_limit,
+                       header.seed, _name(header.player_1),
+                       _name(header.player_2))]
+    for (row, col), time_used in zip(moves, times):
+        parts.append(PLY.pack(row, col, time_used))
+    return b"".join(parts)
+
+
+class GameLog:
+    """Append-only writer of a game log.
+
+    Parameters
+    ----------
+    path : str
+        The log file; created with its file header if it does not exist.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "ab") as f:
+            if f.tell() == 0:
+                f.write(_FILE.pack(MAGIC, VERSION))
+
+    def write(self, header, moves, times):
+        """Append a finished game (see `encode_game()`). """
+        data = encode_game(header, moves, times)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+    def recorder(self, seed=0, names=None):
+        """Return a `GameRecorder` appending the next game played to the
+        log; `names` are the names of player 1 and player 2 (by default,
+        the class names of the players).
+        """
+        return GameRecorder(self, seed, names)
+
+
+class GameRecorder:
+    """Records one game played with `Board.play(recorder=...)` and appends
+    it to a `GameLog` when it ends.
+    """
+
+    def __init__(self, log, seed=0, names=None):
+        self.log = log
+        self.seed = seed
+        self.names = names
+        self.moves = []
+        self.times = []
+
+    def start(self, game, time_limit):
+        # the moves applied before play, replayed from the undo stack
+        board = game.copy()
+        opening = []
+        while board.move_count:
+            opening.append(board.undo_move())
+        self.game = game
+        self.time_limit = time_limit
+        self.players = (game._player_1, game._player_2)
+        self.opening = len(opening)
+        self.moves = opening[::-1]
+        self.times = [float("nan")] * len(opening)
+
+    def move(self, move, time_used):
+        self.moves.append(move)
+        self.times.append(time_used)
+
+    def finish(self, winner, termination):
+        names = self.names or self.players
+        header = GameHeader(self.game.width, self.game.height,
+                            1 if winner is self.players[0] else 2,
+                            termination, len(self.moves), self.opening,
+                            self.time_limit, self.seed, names[0], names[1])
+        self.log.write(header, self.moves, self.times)
+
+
+class GameLogReader:
+    """Memory-mapped reader of a game log.
+
+    The file is indexed when the reader is created: a game appended later is
+    not visible until a new reader is created.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        data = self._map
+        if len(data) < _FILE.size or _FILE.unpack_from(data) != (MAGIC, VERSION):
+            raise ValueError("{} is not a game log".format(path))
+
+        self._offsets = []
+        offset = _FILE.size
+        while offset < len(data):
+            if offset + GAME.size > len(data):
+                raise ValueError("{} is truncated".format(path))
+            fields = GAME.unpack_from(data, offset)
+            if fields[0] != _GAME_MAGIC:
+                raise ValueError("{} is corrupt at byte {}".format(path, offset))
+            self._offsets.append(offset)
+            offset += GAME.size + fields[5] * PLY.size
+        if offset > len(data):
+            raise ValueError("{} is truncated".format(path))
+
+    def close(self):
+        self._map.close()
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def header(self, index):
+        """Return the `GameHeader` of game `index`. """
+        fields = GAME.unpack_from(self._map, self._offsets[index])
+        (_, width, height, winner, termination, plies, opening, time_limit,
+         seed, player_1, player_2) = fields
+        return GameHeader(width, height, winner, TERMINATIONS[termination],
+                          plies, opening, time_limit, seed,
+                          player_1.rstrip(b"\0").decode("utf-8"),
+                          player_2.rstrip(b"\0").decode("utf-8"))
+
+    def plies(self, index):
+        """Return the (move, time_used) pairs of game `index`. """
+        offset = self._offsets[index]
+        count = GAME.unpack_from(self._map, offset)[5]
+        offset += GAME.size
+        return [((row, col), time_used) for row, col, time_used in
+                (PLY.unpack_from(self._map, offset + i * PLY.size)
+                 for i in range(count))]
+
+    def moves(self, index):
+        """Return the moves of game `index`, from the empty board. """
+        return [move for move, _ in self.plies(index)]
+
+    def board(self, index, ply=None, board_cls=Board):
+        """Return the board of game `index` after `ply` moves (after the
+        last move by default), with the agent names as players.
+        """
+        header = self.header(index)
+        moves = self.moves(index)
+        if ply is None:
+            ply = len(moves)
+        if not 0 <= ply <= len(moves):
+            raise IndexError("Game {} has {} plies".format(index, len(moves)))
+        names = header.player_1, header.player_2
+        if names[0] == names[1]:
+            # the players of a board must be distinct
+            names = names[0] + " (1)", names[1] + " (2)"
+        game = board_cls(names[0], names[1], header.width, header.height)
+        for move in moves[:ply]:
+            game.apply_move(move)
+        return game
+
+    def isoviz(self, index):
+        """Return game `index` as the JSON accepted by isoviz/display.html.
+        """
+        header = self.header(index)
+        return json.dumps({"player1": header.player_1,
+                           "player2": header.player_2,
+                           "moves": [list(move) for move in self.moves(index)]})
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="List the games of a log, "
+                                     "or export one for isoviz/display.html")
+    parser.add_argument("path")
+    parser.add_argument("--isoviz", type=int, metavar="GAME",
+                        help="print game GAME as isoviz JSON")
+    args = parser.parse_args()
+
+    reader = GameLogReader(args.path)
+    if args.isoviz is not None:
+        print(reader.isoviz(args.isoviz))
+    else:
+        for i in range(len(reader)):
+            h = reader.header(i)
+            times = [t for _, t in reader.plies(i)[h.opening:]]
+            print("{:>6} {:>14} {:>14} winner {} {:>4} plies {:<12} "
+                  "{:7.1f} ms/ply".format(i, h.player_1, h.player_2, h.winner,
+                                          h.plies, h.termination,
+                                          sum(times) / max(len(times), 1)))
@@ -9,10 +9,41 @@ be available to project reviewers.
 """
 import random
 import timeit
+from collections import namedtuple
 from copy import copy
 
+from .zobrist import zobrist_keys
+
 TIME_LIMIT_MILLIS = 150
 
+EvalContext = namedtuple("EvalContext", ["own_moves", "opp_moves", "own_loc",
+                                         "opp_loc", "utility"])
+EvalContext.__doc__ = """Quantities shared by heuristic evaluation functions,
+computed once per position from the point of view of one player (see
+`Board.eval_context`).
+
+own_moves, opp_moves : number of legal moves of the player and its opponent
+own_loc, opp_loc : locations of the player and its opponent (or None)
+utility : `Board.utility` of the position for the player (+/-inf if the
+    game is over, 0 otherwise)
+"""
+
+
+def turn_seed(seed, ply):
+    """Return the seed of the random choices made on turn `ply` of a game
+    seeded with `seed` (see `Board.play`).
+    """
+    return (seed << 16) + ply
+
+
+def _utility(active, own_moves, opp_moves):
+    """Return the utility of a state for a player, given whether the player
+    is active and the number of legal moves of the player and its opponent.
+    """
+    if active:
+        return float("-inf") if own_moves == 0 else 0.
+    return float("inf") if opp_moves == 0 else 0.
+
 
 class Board(object):
     """Implement a model for the game Isolation assuming each player moves like
@@ -37,7 +68,7 @@ class Board(object):
     BLANK = 0
     NOT_MOVED = None
 
-    def __init__(self, player_1, player_2, width=7, height=7):
+    def __init__(self, player_1, player_2, width=7, height=7, seed=None):
         self.width = width
         self.height = height
         self.move_count = 0
@@ -46,14 +77,32 @@ class Board(object):
         self._active_player = player_1
         self._inactive_player = player_2
 
+        # Source of the move order of get_legal_moves(), shared with the
+        # copies of the board: the global generator unless a seed is given
+        self.seed = seed
+        self._rng = random if seed is None else random.Random(seed)
+
         # The last 3 entries of the board state includes initiative (0 for
         # player 1, 1 for player 2) player 2 last move, and player 1 last move
         self._board_state = [Board.BLANK] * (width * height + 3)
         self._board_state[-1] = Board.NOT_MOVED
         self._board_state[-2] = Board.NOT_MOVED
 
+        # Each applied move pushes (cell index, previous location of the
+        # moving player) so that undo_move() can restore the prior state
+        self._move_stack = []
+
+        # Zobrist hash of the current state, updated incrementally by
+        # apply_move() and undo_move()
+        self._zobrist = zobrist_keys(width, height)
+        self._hash = 0
+
     def hash(self):
-        return str(self._board_state).__hash__()
+        """Return a 64-bit Zobrist hash of the current state, including the
+        blocked cells, the player locations and the initiative. Equal states
+        reached by different move orders have equal hashes.
+        """
+        return self._hash
 
     @property
     def active_player(self):
@@ -93,10 +142,14 @@ class Board(object):
     def copy(self):
         """ Return a deep copy of the current board. """
         new_board = Board(self._player_1, self._player_2, width=self.width, height=self.height)
+        new_board.seed = self.seed
+        new_board._rng = self._rng
         new_board.move_count = self.move_count
         new_board._active_player = self._active_player
         new_board._inactive_player = self._inactive_player
         new_board._board_state = copy(self._board_state)
+        new_board._move_stack = copy(self._move_stack)
+        new_board._hash = self._hash
         return new_board
 
     def forecast_move(self, move):
@@ -171,7 +224,7 @@ class Board(object):
         h = idx % self.height
         return (h, w)
 
-    def get_legal_moves(self, player=None):
+    def get_legal_moves(self, player=None, shuffle=True):
         """Return the list of all legal moves for the specified player.
 
         Parameters
@@ -180,6 +233,11 @@ class Board(object):
             An object registered as a player in the current game. If None,
             return the legal moves for the active player on the board.
 
+        shuffle : bool (optional)
+            If False, return the moves in a fixed order instead of shuffling
+            them; search agents that order moves themselves use this to get
+            deterministic results.
+
         Returns
         -------
         list<(int, int)>
@@ -188,7 +246,7 @@ class Board(object):
         """
         if player is None:
             player = self.active_player
-        return self.__get_moves(self.get_player_location(player))
+        return self.__get_moves(self.get_player_location(player), shuffle)
 
     def apply_move(self, move):
         """Move the active player to a specified location.
@@ -201,12 +259,38 @@ class Board(object):
         """
         idx = move[0] + move[1] * self.height
         last_move_idx = int(self.active_player == self._player_2) + 1
+        prev_loc = self._board_state[-last_move_idx]
+        self._move_stack.append((idx, prev_loc))
+        self._hash ^= self._zobrist.toggle(last_move_idx - 1, idx, prev_loc)
         self._board_state[-last_move_idx] = idx
         self._board_state[idx] = 1
         self._board_state[-3] ^= 1
         self._active_player, self._inactive_player = self._inactive_player, self._active_player
         self.move_count += 1
 
+    def undo_move(self):
+        """Revert the most recent move applied to the board, restoring the
+        previous location of the player who made it and returning initiative
+        to that player. Together with apply_move() this allows searching the
+        game tree in-place without copying the board at every node.
+
+        Returns
+        -------
+        (int, int)
+            The coordinate pair (row, column) of the move that was undone.
+        """
+        if not self._move_stack:
+            raise RuntimeError("There are no moves to undo on this board.")
+        idx, prev_loc = self._move_stack.pop()
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        last_move_idx = int(self.active_player == self._player_2) + 1
+        self._hash ^= self._zobrist.toggle(last_move_idx - 1, idx, prev_loc)
+        self._board_state[-last_move_idx] = prev_loc
+        self._board_state[idx] = Board.BLANK
+        self._board_state[-3] ^= 1
+        self.move_count -= 1
+        return (idx % self.height, idx // self.height)
+
     def is_winner(self, player):
         """ Test whether the specified player has won the game. """
         return player == self._inactive_player and not self.get_legal_moves(self._active_player)
@@ -247,7 +331,31 @@ class Board(object):
 
         return 0.
 
-    def __get_moves(self, loc):
+    def eval_context(self, player):
+        """Return the `EvalContext` of the current state for the specified
+        player, generating the legal moves of each player only once.
+
+        Parameters
+        ----------
+        player : object
+            An object registered as a player in the current game.
+
+        Returns
+        -------
+        EvalContext
+            The mobility and location of both players, and the utility of
+            the state for the player.
+        """
+        opp = self.get_opponent(player)
+        own_loc = self.get_player_location(player)
+        opp_loc = self.get_player_location(opp)
+        own_moves = len(self.__get_moves(own_loc, shuffle=False))
+        opp_moves = len(self.__get_moves(opp_loc, shuffle=False))
+        return EvalContext(own_moves, opp_moves, own_loc, opp_loc,
+                           _utility(player == self._active_player,
+                                    own_moves, opp_moves))
+
+    def __get_moves(self, loc, shuffle=True):
         """Generate the list of possible moves for an L-shaped motion (like a
         knight in chess).
         """
@@ -259,7 +367,8 @@ class Board(object):
                       (1, -2), (1, 2), (2, -1), (2, 1)]
         valid_moves = [(r + dr, c + dc) for dr, dc in directions
                        if self.move_is_legal((r + dr, c + dc))]
-        random.shuffle(valid_moves)
+        if shuffle:
+            self._rng.shuffle(valid_moves)
         return valid_moves
 
     def print_board(self):
@@ -271,8 +380,9 @@ class Board(object):
         the location of each player and indicating which cells have been
         blocked, and which remain open.
         """
-        p1_loc = self._board_state[-1]
-        p2_loc = self._board_state[-2]
+        state = self._board_state
+        p1_loc = state[-1]
+        p2_loc = state[-2]
 
         col_margin = len(str(self.height - 1)) + 1
         prefix = "{:<" + "{}".format(col_margin) + "}"
@@ -282,7 +392,7 @@ class Board(object):
             out += prefix.format(i) + ' | '
             for j in range(self.width):
                 idx = i + j * self.height
-                if not self._board_state[idx]:
+                if not state[idx]:
                     out += ' '
                 elif p1_loc == idx:
                     out += symbols[0]
@@ -295,7 +405,7 @@ class Board(object):
 
         return out
 
-    def play(self, time_limit=TIME_LIMIT_MILLIS):
+    def play(self, time_limit=TIME_LIMIT_MILLIS, clock=None, recorder=None):
         """Execute a match between the players by alternately soliciting them
         to select a move and applying it in the game.
 
@@ -305,6 +415,33 @@ class Board(object):
             The maximum number of milliseconds to allow before timeout
             during each turn.
 
+        clock : callable (optional)
+            A function returning the current time in seconds, used to time
+            each turn (and by the `time_left` function passed to the agents).
+            Defaults to the wall clock; pass `isolation.timing.CLOCKS["cpu"]`
+            to charge agents only for the CPU time they use.
+
+        recorder : object (optional)
+            Receives the game as it is played (e.g. a
+            `isolation.gamelog.GameRecorder`): `recorder.start(board,
+            time_limit)` before the first turn, `recorder.move(move,
+            time_used)` after every move applied (with the milliseconds the
+            turn took), and `recorder.finish(winner, termination)` at the end.
+
+        A player with a `ponder` method may think on its opponent's time:
+        after each of its moves, between the timed turns, `ponder(board)`
+        receives a copy of the board with the opponent to move, and the
+        method must return without waiting for the opponent's move; at the
+        end of the game, `ponder(None)` is called. Nothing it does is
+        charged to either turn.
+
+        If the board has a `seed`, its random generator is reseeded before
+        every turn from the seed and the number of moves played (see
+        `turn_seed()`), and so is the `rng` attribute of the player to move
+        if it has one, so that the random choices of a turn do not depend on
+        the turns before it: replaying a game with the same seed and
+        opening repeats them as long as the agents search the same nodes.
+
         Returns
         ----------
         (player, list<[(int, int),]>, str)
@@ -314,10 +451,20 @@ class Board(object):
         """
         move_history = []
 
-        time_millis = lambda: 1000 * timeit.default_timer()
+        if clock is None:
+            clock = timeit.default_timer
+        time_millis = lambda: 1000 * clock()
+
+        if recorder is not None:
+            recorder.start(self, time_limit)
 
         while True:
 
+            if self.seed is not None:
+                self._rng.seed(turn_seed(self.seed, self.move_count))
+                if hasattr(self._active_player, "rng"):
+                    self._active_player.rng.seed(self._rng.getrandbits(64))
+
             legal_player_moves = self.get_legal_moves()
             game_copy = self.copy()
 
@@ -330,13 +477,27 @@ class Board(object):
                 curr_move = Board.NOT_MOVED
 
             if move_end < 0:
-                return self._inactive_player, move_history, "timeout"
-
-            if curr_move not in legal_player_moves:
+                termination = "timeout"
+            elif curr_move not in legal_player_moves:
                 if len(legal_player_moves) > 0:
-                    return self._inactive_player, move_history, "forfeit"
-                return self._inactive_player, move_history, "illegal move"
+                    termination = "forfeit"
+                else:
+                    termination = "illegal move"
+            else:
+                termination = None
+
+            if termination is not None:
+                if recorder is not None:
+                    recorder.finish(self._inactive_player, termination)
+                for player in (self._player_1, self._player_2):
+                    if hasattr(player, "ponder"):
+                        player.ponder(None)
+                return self._inactive_player, move_history, termination
 
             move_history.append(list(curr_move))
 
             self.apply_move(curr_move)
+            if recorder is not None:
+                recorder.move(curr_move, time_limit - move_end)
+            if hasattr(self._inactive_player, "ponder"):
+                self._inactive_player.ponder(self.copy())
@@ -0,0 +1,178 @@
+"""
+Board symmetries for the game Isolation.
+
+Knight moves are preserved by every reflection and rotation of the board that
+maps the board onto itself: the 8 symmetries of the square for square boards,
+and the 4 symmetries of the rectangle (identity, two reflections and the half
+turn) otherwise. Positions related by a symmetry have the same game value, so
+caches can store a single entry per equivalence class, keyed by the smallest
+Zobrist hash over all symmetric images of the position.
+
+Symmetries are represented as permutations of the cell indices
+(idx = row + column * height) and numbered from 0 (the identity).
+"""
+from .zobrist import zobrist_keys
+
+# Permutation tables are shared by every board with the same dimensions
+_TABLES = {}
+
+
+def _maps(width, height):
+    w, h = width - 1, height - 1
+    maps = [lambda r, c: (r, c),
+            lambda r, c: (h - r, c),
+            lambda r, c: (r, w - c),
+            lambda r, c: (h - r, w - c)]
+    if width == height:
+        maps += [lambda r, c: (c, r),
+                 lambda r, c: (c, h - r),
+                 lambda r, c: (w - c, r),
+                 lambda r, c: (w - c, h - r)]
+    return maps
+
+
+def symmetries(width, height):
+    """Return the symmetries of a board of the given size.
+
+    Returns
+    -------
+    (tuple<tuple<int>>, tuple<tuple<int>>)
+        forward[k][idx] is the image of cell idx under symmetry k, and
+        inverse[k][idx] is the cell whose image is idx.
+    """
+    tables = _TABLES.get((width, height))
+    if tables is None:
+        forward = []
+        inverse = []
+        for f in _maps(width, height):
+            perm = [0] * (width * height)
+            for idx in range(width * height):
+                r, c = f(idx % height, idx // height)
+                perm[idx] = r + c * height
+            inv = [0] * len(perm)
+            for idx, image in enumerate(perm):
+                inv[image] = idx
+            forward.append(tuple(perm))
+            inverse.append(tuple(inv))
+        tables = _TABLES[(width, height)] = (tuple(forward), tuple(inverse))
+    return tables
+
+
+def _scan(game):
+    """Return the indices of the blocked cells of a board and the cell index
+    of player 1 and of player 2 (None if the player has not moved yet).
+    """
+    h = game.height
+    blank = set(r + c * h for r, c in game.get_blank_spaces())
+    blocked = [idx for idx in range(game.width * h) if idx not in blank]
+
+    # player 1 holds the initiative after an even number of moves
+    if game.move_count % 2:
+        players = game.inactive_player, game.active_player
+    else:
+        players = game.active_player, game.inactive_player
+    locs = []
+    for player in players:
+        loc = game.get_player_location(player)
+        locs.append(None if loc is None else loc[0] + loc[1] * h)
+    return blocked, locs[0], locs[1]
+
+
+def _image_keys(width, height):
+    """Return, for every symmetry k, the Zobrist keys of the image cells:
+    (blocked, player 1, player 2) with blocked[idx] the key of cell
+    forward[k][idx].
+    """
+    tables = _TABLES.get((width, height, "keys"))
+    if tables is None:
+        keys = zobrist_keys(width, height)
+        forward, _ = symmetries(width, height)
+        tables = tuple(
+            tuple(tuple(table[image] for image in perm)
+                  for table in (keys.blocked,) + keys.player)
+            for perm in forward)
+        _TABLES[(width, height, "keys")] = tables
+    return tables
+
+
+def image_hashes(game):
+    """Return the Zobrist hash of every symmetric image of a board. Entry 0
+    (the identity) equals `game.hash()`.
+
+    The cells blocked by the players are read from the move stack of the
+    board when it holds the whole game, so the cost grows with the number of
+    moves played rather than with the size of the board.
+    """
+    count = game.move_count
+    side = zobrist_keys(game.width, game.height).side if count % 2 else 0
+    if len(game._move_stack) == count:
+        blocked = [idx for idx, _ in game._move_stack]
+        # player 1 made the moves of even index
+        loc_1 = blocked[count - 1 - (count - 1) % 2] if count else None
+        loc_2 = blocked[count - 1 - count % 2] if count > 1 else None
+    else:
+        # boards set up without their move history
+        blocked, loc_1, loc_2 = _scan(game)
+
+    hashes = []
+    for blocked_keys, keys_1, keys_2 in _image_keys(game.width, game.height):
+        h = side
+        for idx in blocked:
+            h ^= blocked_keys[idx]
+        if loc_1 is not None:
+            h ^= keys_1[loc_1]
+        if loc_2 is not None:
+            h ^= keys_2[loc_2]
+        hashes.append(h)
+    return hashes
+
+
+def canonical_hash(game):
+    """Return the canonical key of a board and the symmetry mapping the
+    board onto its canonical image.
+
+    Returns
+    -------
+    (int, int)
+        The smallest Zobrist hash over all symmetric images of the board,
+        and the index of a symmetry producing it.
+    """
+    hashes = image_hashes(game)
+    key = min(hashes)
+    return key, hashes.index(key)
+
+
+def transform_move(move, sym, width, height):
+    """Return the image of a move (row, column) under symmetry `sym`. """
+    forward, _ = symmetries(width, height)
+    idx = forward[sym][move[0] + move[1] * height]
+    return (idx % height, idx // height)
+
+
+def inverse_move(move, sym, width, height):
+    """Return the move whose image under symmetry `sym` is `move`. """
+    _, inverse = symmetries(width, height)
+    idx = inverse[sym][move[0] + move[1] * height]
+    return (idx % height, idx // height)
+
+
+def symmetric(score_fn):
+    """Declare that the heuristic `score_fn` gives a position and its
+    symmetric images the same value, and return it.
+
+    Heuristics that measure distances to a point or line the symmetries do
+    not fix (e.g. `sample_players.center_score`, whose center is off by half
+    a cell) must not be declared: agents only share search results between
+    symmetric positions for declared heuristics (see
+    `game_agent.AlphaBetaPlayer.position_key()`).
+    """
+    score_fn.symmetric = True
+    return score_fn
+
+
+def is_symmetric(*score_fns):
+    """Return True if every heuristic given (None excepted) is declared
+    symmetric.
+    """
+    return all(getattr(fn, "symmetric", False)
+               for fn in score_fns if fn is not None)
@@ -0,0 +1,83 @@
+"""
+Clocks used to time the turns of an Isolation match.
+
+`Board.play()` measures each turn with a clock that returns seconds. The
+default wall clock charges an agent for the elapsed real time, which includes
+time spent waiting for the CPU when many games run in parallel; the CPU clock
+only charges the agent for the CPU time used by the thread that plays the
+game.
+"""
+import math
+import time
+import timeit
+from collections import namedtuple
+
+CLOCKS = {
+    "wall": timeit.default_timer,
+    # per-thread CPU time needs Python 3.7; fall back to the process CPU time
+    "cpu": getattr(time, "thread_time", time.process_time),
+}
+
+ClockStats = namedtuple("ClockStats", ["name", "overhead", "resolution",
+                                       "jitter", "worst"])
+ClockStats.__doc__ = """Calibration results of a clock (in milliseconds).
+
+overhead : mean cost of reading the clock once
+resolution : smallest nonzero difference between two readings
+jitter : standard deviation of the measured duration of a fixed workload
+worst : largest excess of a measured duration over the median duration
+"""
+
+
+def get_clock(name):
+    """Return the clock registered under `name` ("wall" or "cpu"). """
+    try:
+        return CLOCKS[name]
+    except KeyError:
+        raise ValueError("Unknown clock {!r}; expected one of {}".format(
+            name, sorted(CLOCKS)))
+
+
+def _workload(n):
+    total = 0
+    for i in range(n):
+        total += i * i
+    return total
+
+
+def calibrate(name, samples=200, work=2000):
+    """Measure the overhead, resolution and jitter of a clock.
+
+    Parameters
+    ----------
+    name : str
+        The name of the clock to calibrate (see `CLOCKS`).
+
+    samples : int (optional)
+        The number of times the fixed workload is timed.
+
+    work : int (optional)
+        The number of loop iterations in the fixed workload (about 0.1 ms).
+
+    Returns
+    -------
+    ClockStats
+        The calibration results, in milliseconds.
+    """
+    clock = get_clock(name)
+
+    reads = [clock() for _ in range(10 * samples)]
+    overhead = 1000 * (reads[-1] - reads[0]) / (len(reads) - 1)
+    deltas = [b - a for a, b in zip(reads, reads[1:]) if b > a]
+    resolution = 1000 * min(deltas) if deltas else float("nan")
+
+    durations = []
+    for _ in range(samples):
+        start = clock()
+        _workload(work)
+        durations.append(1000 * (clock() - start))
+    durations.sort()
+    median = durations[len(durations) // 2]
+    mean = sum(durations) / len(durations)
+    jitter = math.sqrt(sum((d - mean)**2 for d in durations) / len(durations))
+    return ClockStats(name, overhead, resolution, jitter, durations[-1] - median)
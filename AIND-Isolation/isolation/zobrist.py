@@ -0,0 +1,56 @@
+"""
+Zobrist hashing keys for the game Isolation.
+
+The hash of a position is the XOR of one random key for every blocked cell,
+one key for the location of each player and a key for the initiative. Keys
+are drawn from a fixed seed so that hashes are stable across processes and
+sessions (e.g., for opening books stored on disk).
+"""
+import random
+
+SEED = 0x15071A7
+
+# Keys are shared by every board with the same dimensions
+_KEYS = {}
+
+
+class ZobristKeys(object):
+    """Random 64-bit keys for a board of the given size.
+
+    Attributes
+    ----------
+    blocked : tuple<int>
+        blocked[idx] is XORed into the hash when cell idx becomes blocked.
+
+    player : (tuple<int>, tuple<int>)
+        player[k][idx] is XORed into the hash while player k (0 for player 1,
+        1 for player 2) is located on cell idx.
+
+    side : int
+        XORed into the hash after every move, when the initiative changes.
+    """
+    def __init__(self, width, height):
+        rng = random.Random(SEED ^ (width << 16) ^ height)
+        size = width * height
+        self.blocked = tuple(rng.getrandbits(64) for _ in range(size))
+        self.player = (tuple(rng.getrandbits(64) for _ in range(size)),
+                       tuple(rng.getrandbits(64) for _ in range(size)))
+        self.side = rng.getrandbits(64)
+
+    def toggle(self, slot, idx, prev_idx):
+        """Return the value to XOR into a hash when player `slot` moves from
+        `prev_idx` (or None) to `idx`, or when that move is undone.
+        """
+        player = self.player[slot]
+        key = self.blocked[idx] ^ player[idx] ^ self.side
+        if prev_idx is not None:
+            key ^= player[prev_idx]
+        return key
+
+
+def zobrist_keys(width, height):
+    """Return the shared `ZobristKeys` for a board of the given size. """
+    keys = _KEYS.get((width, height))
+    if keys is None:
+        keys = _KEYS[(width, height)] = ZobristKeys(width, height)
+    return keys
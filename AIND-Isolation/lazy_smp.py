@@ -0,0 +1,373 @@
+"""Lazy SMP: parallel alpha-beta search in several processes.
+
+`LazySMPPlayer` starts helper processes that search the same root position
+as the player, with iterative deepening and the same heuristic, and share a
+transposition table in shared memory. The processes do not split the tree
+between them: they race through it, and each one skips the subtrees already
+searched to a sufficient depth by the others thanks to the shared table.
+The helpers differ from the main search by their move order (randomized
+history scores) and, for every other helper, by starting one ply deeper, so
+they explore different subtrees first.
+
+The main process runs the regular `AlphaBetaPlayer` search, stops the helpers
+when it is done, and returns the move of the deepest iteration completed by
+any of the processes.
+
+The shared table is lockless: a torn entry, written by a process while
+another one reads it, fails its checksum and is treated as missing.
+
+The helpers time their search with the clock timing the player's turns (see
+`isolation.timing`). Under the wall clock they run alongside the main search
+for the same real time; under the CPU clock, the CPU time they use is charged
+to the turn, so that the processes together use no more CPU time than an
+agent searching alone.
+
+With `pondering=True`, the helpers also think on the opponent's time: when
+`Board.play()` calls `ponder()` after the player's move, they search the
+positions after the opponent's replies, each helper ranking its share of them
+from the likeliest (the ones leaving the player the lowest heuristic value),
+until the player's next turn, which then finds the position actually reached
+in the shared table. The main process does no search work between the turns.
+"""
+import ctypes
+import gc
+import multiprocessing
+import os
+import random
+import struct
+from multiprocessing.sharedctypes import RawArray, RawValue
+
+import game_agent
+from game_agent import AlphaBetaPlayer, TranspositionTable, custom_score
+from isolation import get_clock
+
+_FLOAT = struct.Struct("<d")
+_WORD = struct.Struct("<Q")
+_USED = 1 << 63     # set in the data word of every stored entry
+_NO_MOVE = 0xFFFF
+
+
+def _encode_move(move):
+    """Pack a move (or None) in 16 bits, with 0xFF for the -1 coordinates. """
+    if move is None:
+        return _NO_MOVE
+    return (move[0] & 0xFF) << 8 | move[1] & 0xFF
+
+
+def _decode_move(code):
+    if code == _NO_MOVE:
+        return None
+    row, col = code >> 8, code & 0xFF
+    return (-1 if row == 0xFF else row, -1 if col == 0xFF else col)
+
+
+class SharedTranspositionTable:
+    """`game_agent.TranspositionTable` stored in shared memory, so that the
+    processes created after it (with `multiprocessing`) read and write the
+    same entries.
+
+    Every slot holds three 64-bit words: the check word (the position key
+    XOR the two others), the data word (depth, flag, move and age packed in
+    bit fields) and the bits of the float value. An entry is returned only
+    if its words are consistent with the requested key.
+
+    Parameters
+    ----------
+    size : int (optional)
+        The number of slots in the table.
+    """
+    EXACT, LOWER, UPPER = (TranspositionTable.EXACT, TranspositionTable.LOWER,
+                           TranspositionTable.UPPER)
+
+    def __init__(self, size=2**16):
+        self.size = size
+        self._raw = RawArray(ctypes.c_uint64, 3 * size)
+        self._age = RawValue(ctypes.c_uint32, 0)
+        self._words = memoryview(self._raw).cast("B").cast("Q")
+
+    def __getstate__(self):
+        # the shared arrays are passed to the processes when they are started
+        return self.size, self._raw, self._age
+
+    def __setstate__(self, state):
+        self.size, self._raw, self._age = state
+        self._words = memoryview(self._raw).cast("B").cast("Q")
+
+    @property
+    def age(self):
+        return self._age.value
+
+    def new_search(self):
+        """Mark the entries stored so far as stale, so that they are replaced
+        first by the results of the next search.
+        """
+        self._age.value = (self._age.value + 1) & 0xFFFF
+
+    def get(self, key):
+        """Return the entry stored for the position with hash `key`, or None.
+        """
+        base = 3 * (key % self.size)
+        words = self._words
+        check, data, bits = words[base], words[base + 1], words[base + 2]
+        if not data & _USED or check ^ data ^ bits != key:
+            return None
+        value = _FLOAT.unpack(_WORD.pack(bits))[0]
+        return (key, data & 0xFFFF, data >> 16 & 0x3, value,
+                _decode_move(data >> 18 & 0xFFFF), data >> 34 & 0xFFFF)
+
+    def store(self, key, depth, flag, value, move):
+        """Store a search result unless the slot holds a more valuable entry.
+        """
+        base = 3 * (key % self.size)
+        words = self._words
+        age = self._age.value
+        old = words[base + 1]
+        if (old & _USED and old >> 34 & 0xFFFF == age and
+                old & 0xFFFF > depth):
+            return
+        data = (_USED | age << 34 | _encode_move(move) << 18 | flag << 16 |
+                depth)
+        bits = _WORD.unpack(_FLOAT.pack(value))[0]
+        words[base] = key ^ data ^ bits
+        words[base + 1] = data
+        words[base + 2] = bits
+
+    def clear(self):
+        """Remove all entries from the table. """
+        ctypes.memset(self._raw, 0, ctypes.sizeof(self._raw))
+
+
+def replay_moves(game):
+    """Return the moves leading to `game` (from its undo stack). """
+    board = game.copy()
+    moves = []
+    while board.move_count:
+        moves.append(board.undo_move())
+    return moves[::-1]
+
+
+def _pack_result(search_id, depth, move):
+    return (search_id & 0xFFFFFFFF) << 32 | depth << 16 | _encode_move(move)
+
+
+def _unpack_result(word):
+    return word >> 32, word >> 16 & 0xFFFF, _decode_move(word & 0xFFFF)
+
+
+def _helper(index, conn, tt, active, results, spent, score_fn, batch_fn,
+            timeout):
+    """Main loop of helper process `index`: search the positions received
+    on `conn` while `active` holds the id of their search, and publish the
+    best move of every completed iteration in `results[index]` and the time
+    spent on the search so far (in seconds of the clock of the job) in
+    `spent[index]`.
+
+    A job searches either the position reached by its moves or, when pondering,
+    the position after each of the opponent replies it lists, one iteration
+    of each in turn, likeliest replies first.
+    """
+    # the helpers create no reference cycles, and must not stall on them
+    gc.disable()
+    rng = random.Random(index)
+    player = AlphaBetaPlayer(score_fn=score_fn, timeout=timeout, tt_size=1,
+                             batch_fn=batch_fn)
+    player.tt = tt
+    while True:
+        job = conn.recv()
+        if job is None:
+            return
+        (search_id, moves, board_cls, width, height, budget, clock_name,
+         replies) = job
+        clock = get_clock(clock_name)
+        start = clock()
+
+        def time_left():
+            if active.value != search_id:
+                return float("-inf")
+            elapsed = clock() - start
+            spent[index] = elapsed
+            return budget - 1000. * elapsed
+
+        player.time_left = time_left
+        games = []
+        for line in ([moves] if replies is None else
+                     [moves + [reply] for reply in replies]):
+            if len(line) % 2:
+                game = board_cls("Opponent", player, width, height)
+            else:
+                game = board_cls(player, "Opponent", width, height)
+            for move in line:
+                game.apply_move(move)
+            games.append(game)
+        if replies is not None:
+            # likeliest replies first (leaving the player the lowest value)
+            games.sort(key=lambda game: player.score(game, player))
+
+        # random tie-breaks in the move order
+        player.new_ordering()
+        for table in player.history:
+            for r in range(height):
+                for c in range(width):
+                    table[(r, c)] = table.get((r, c), 0) + rng.random()
+
+        depth = 1 + index % 2 if replies is None else 1
+        blank = len(games[0].get_blank_spaces())
+        try:
+            while depth < blank:
+                for game in games:
+                    move = player.alphabeta(game, depth)
+                    if replies is None:
+                        results[index] = _pack_result(search_id, depth, move)
+                        player.pv_move = move
+                depth += 1
+        except game_agent.SearchTimeout:
+            pass
+
+
+class LazySMPPlayer(AlphaBetaPlayer):
+    """`AlphaBetaPlayer` searching with helper processes (Lazy SMP).
+
+    The helpers are started on the first search and run until `close()` is
+    called or the main process exits. Processes of a `multiprocessing.Pool`
+    (e.g. in `tournament.py --workers`) cannot start processes, so a player
+    moving in one searches alone, still using the shared table.
+
+    Parameters
+    ----------
+    helpers : int (optional)
+        The number of helper processes; by default, one per extra CPU core.
+
+    pondering : bool (optional)
+        Whether the helpers search the likely replies of the opponent while
+        it is thinking (see `ponder()`).
+
+    clock : str (optional)
+        The name of the clock timing the turns of the player ("wall" or
+        "cpu", see `isolation.timing`); `tournament.py` sets it to the clock
+        of the tournament.
+    """
+
+    def __init__(self, search_depth=3, score_fn=custom_score, timeout=20.,
+                 tt_size=2**16, book=None, batch_fn=None, helpers=None,
+                 pondering=False, clock="wall"):
+        AlphaBetaPlayer.__init__(self, search_depth, score_fn, timeout,
+                                 tt_size, book, batch_fn)
+        self.tt = SharedTranspositionTable(tt_size)
+        if helpers is None:
+            helpers = max((os.cpu_count() or 1) - 1, 0)
+        self.helpers = helpers
+        self.pondering = pondering
+        self.clock = clock
+        self._processes = []
+        self._conns = []
+        # id of the search the helpers run (0 to stop them)
+        self._active = RawValue(ctypes.c_uint32, 0)
+        self._results = RawArray(ctypes.c_uint64, max(helpers, 1))
+        self._spent = RawArray(ctypes.c_double, max(helpers, 1))
+        self._search_id = 0
+
+    def start(self):
+        """Start the helper processes, if they are not running yet. """
+        if self._processes or multiprocessing.current_process().daemon:
+            return
+        for index in range(self.helpers):
+            recv_conn, send_conn = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(
+                target=_helper,
+                args=(index, recv_conn, self.tt, self._active, self._results,
+                      self._spent, self.score, self.batch_score,
+                      self.TIMER_THRESHOLD))
+            process.daemon = True
+            process.start()
+            self._processes.append(process)
+            self._conns.append(send_conn)
+
+    def close(self, wait=False):
+        """Stop the helper processes; with `wait`, once they have finished
+        the jobs they have received (the search of a position runs until its
+        last iteration, so this is only for positions near the end of a game).
+        """
+        if not wait:
+            self._active.value = 0
+        for conn in self._conns:
+            conn.send(None)
+        for process in self._processes:
+            process.join()
+        self._processes = []
+        self._conns = []
+
+    def _next_search(self):
+        """Start a new helper search id and return it. """
+        self._search_id = self._search_id % 0xFFFFFFFF + 1
+        self._active.value = self._search_id
+        return self._search_id
+
+    def ponder(self, game):
+        """Search the likely replies of the opponent to move in `game` in the
+        helper processes until the next call to `get_move()` or `ponder()`,
+        or stop pondering if `game` is None (at the end of a game).
+
+        `Board.play()` calls this method with a copy of the board after every
+        move of the player, between the timed turns; it only sends the
+        replies to the helpers, which rank them (see `_helper()`), so that no
+        turn pays for work done here.
+        """
+        self._active.value = 0
+        if game is None or not self.pondering:
+            return
+        self.start()
+        replies = game.get_legal_moves(shuffle=False)
+        if not self._conns or not replies:
+            return
+
+        search_id = self._next_search()
+        moves = replay_moves(game)
+        count = min(len(self._conns), len(replies))
+        for index, conn in enumerate(self._conns[:count]):
+            conn.send((search_id, moves, type(game), game.width, game.height,
+                       float("inf"), self.clock, replies[index::count]))
+
+    def choose_move(self, game, time_left):
+        # stop pondering, even if the move comes from the book
+        self._active.value = 0
+        return AlphaBetaPlayer.choose_move(self, game, time_left)
+
+    def deepen(self, game, iteration_ms):
+        """Search `game` in this process and in the helpers, and return the
+        best move of the deepest iteration completed by any of them (see
+        `AlphaBetaPlayer.deepen()`). Moves found by a helper have the source
+        "helper".
+        """
+        self.start()
+        search_id = self._next_search()
+        turn_left = self.time_left
+        count = len(self._conns)
+        if count:
+            for index in range(count):
+                self._spent[index] = 0.
+            job = (search_id, replay_moves(game), type(game), game.width,
+                   game.height, turn_left(), self.clock, None)
+            for conn in self._conns:
+                conn.send(job)
+            if self.clock == "cpu":
+                # the turn clock only counts the CPU time of this process
+                spent = self._spent
+
+                def time_left():
+                    return turn_left() - 1000. * sum(spent[:count])
+
+                self.time_left = time_left
+        try:
+            best_move, source, depth = AlphaBetaPlayer.deepen(
+                self, game, iteration_ms)
+        finally:
+            self._active.value = 0
+            self.time_left = turn_left
+
+        for word in self._results[:len(self._conns)]:
+            result_id, helper_depth, move = _unpack_result(word)
+            if (result_id == search_id and
+                    helper_depth > depth and move is not None and
+                    game.move_is_legal(move)):
+                best_move, source, depth = move, "helper", helper_depth
+        return best_move, source, depth
@@ -0,0 +1,233 @@
+"""Build and read opening books for Isolation.
+
+The builder enumerates every position of the first few plies of the game,
+keeping a single representative of the positions related by a symmetry of the
+board (see `isolation.symmetry`), searches each of them for a fixed amount of
+time with an alpha-beta agent, and writes the best moves to a compact binary
+file. Players given the loaded `OpeningBook` play their first moves with a
+dictionary lookup instead of a search.
+
+File format (little endian): a header with the magic bytes b"ISOB", the format
+version, the board width and height and the number of plies covered (one byte
+each) and the number of entries (uint32), followed by the sorted canonical
+position keys (uint64 each) and the best move of each position as a cell
+index of the canonical image of the position (uint8 each).
+
+Usage:
+
+    python opening_book.py --plies 4 --time 1000 --workers 4 opening_book.bin
+"""
+import argparse
+import multiprocessing
+import struct
+import timeit
+
+from isolation import BitBoard
+from isolation.symmetry import canonical_hash, symmetries
+from game_agent import AlphaBetaPlayer, custom_score
+
+MAGIC = b"ISOB"
+VERSION = 1
+_HEADER = struct.Struct("<4sBBBBI")
+
+
+class OpeningBook:
+    """Best moves of the opening positions of a board, keyed by canonical
+    position hash.
+
+    Parameters
+    ----------
+    width, height : int
+        The size of the board the book was built for.
+
+    plies : int
+        The book covers positions with fewer than `plies` moves played.
+
+    entries : dict
+        Maps the canonical hash of a position (see
+        `isolation.symmetry.canonical_hash`) to the cell index of the best
+        move in the canonical image of the position.
+    """
+
+    def __init__(self, width, height, plies, entries=None):
+        self.width = width
+        self.height = height
+        self.plies = plies
+        self.entries = dict(entries or {})
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, game):
+        """Return the book move of the active player, or None if the position
+        is not in the book.
+        """
+        if (game.move_count >= self.plies or
+                game.width != self.width or game.height != self.height):
+            return None
+        key, sym = canonical_hash(game)
+        cell = self.entries.get(key)
+        if cell is None:
+            return None
+        # map the move back from the canonical image to the actual board
+        _, inverse = symmetries(self.width, self.height)
+        idx = inverse[sym][cell]
+        move = (idx % self.height, idx // self.height)
+        # guard against hash collisions and books for other boards
+        if move not in game.get_legal_moves(shuffle=False):
+            return None
+        return move
+
+    def add(self, game, move):
+        """Record `move` as the best move of the active player of `game`. """
+        key, sym = canonical_hash(game)
+        forward, _ = symmetries(self.width, self.height)
+        self.entries[key] = forward[sym][move[0] + move[1] * self.height]
+
+    def save(self, path):
+        """Write the book to a file. """
+        keys = sorted(self.entries)
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, self.width, self.height,
+                                 self.plies, len(keys)))
+            f.write(struct.pack("<{}Q".format(len(keys)), *keys))
+            f.write(struct.pack("<{}B".format(len(keys)),
+                                *(self.entries[k] for k in keys)))
+
+    @classmethod
+    def load(cls, path):
+        """Read a book written by `save()`. """
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) < _HEADER.size:
+            raise ValueError("{} is not an opening book".format(path))
+        magic, version, width, height, plies, count = _HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{} is not an opening book".format(path))
+        if len(data) != _HEADER.size + 9 * count:
+            raise ValueError("{} is truncated".format(path))
+        keys = struct.unpack_from("<{}Q".format(count), data, _HEADER.size)
+        cells = struct.unpack_from("<{}B".format(count), data,
+                                   _HEADER.size + 8 * count)
+        return cls(width, height, plies, zip(keys, cells))
+
+
+class BookSearcher(AlphaBetaPlayer):
+    """Alpha-beta agent that searches every position, including the first
+    move that `AlphaBetaPlayer` plays from its built-in book.
+    """
+    def opening_book(self, game):
+        return False
+
+
+def placement_score(score_fn):
+    """Wrap a heuristic that expects both players on the board, scoring the
+    positions where a player has not been placed yet by the difference in
+    mobility of the players instead.
+    """
+    def score(game, player):
+        opponent = game.get_opponent(player)
+        if (game.get_player_location(player) is None or
+                game.get_player_location(opponent) is None):
+            return game.utility(player) or float(
+                len(game.get_legal_moves(player, shuffle=False)) -
+                len(game.get_legal_moves(opponent, shuffle=False)))
+        return score_fn(game, player)
+    score.symmetric = getattr(score_fn, "symmetric", False)
+    return score
+
+
+def replay(moves, width=7, height=7, player=None):
+    """Return a board with `moves` applied, on which `player` is to move. """
+    if len(moves) % 2:
+        game = BitBoard("Opponent", player, width, height)
+    else:
+        game = BitBoard(player, "Opponent", width, height)
+    for move in moves:
+        game.apply_move(move)
+    return game
+
+
+def opening_positions(plies, width=7, height=7):
+    """Return the moves leading to one representative of every class of
+    symmetric positions with fewer than `plies` moves played that is not
+    over yet.
+    """
+    positions = []
+    layer = [[]]
+    for ply in range(plies):
+        positions.extend(layer)
+        if ply == plies - 1:
+            break
+        children = {}
+        for moves in layer:
+            game = replay(moves, width, height)
+            for move in game.get_legal_moves(shuffle=False):
+                game.apply_move(move)
+                if game.get_legal_moves(shuffle=False):
+                    children.setdefault(canonical_hash(game)[0], moves + [move])
+                game.undo_move()
+        layer = [children[key] for key in sorted(children)]
+    return positions
+
+
+def search_position(args):
+    """Search a position for `time_limit` milliseconds and return its best
+    move. The argument is a tuple (moves, width, height, time_limit, score_fn).
+    """
+    moves, width, height, time_limit, score_fn = args
+    player = BookSearcher(score_fn=placement_score(score_fn), tt_size=2**20)
+    game = replay(moves, width, height, player)
+    start = timeit.default_timer()
+
+    def time_left():
+        return time_limit - 1000 * (timeit.default_timer() - start)
+
+    return player.get_move(game, time_left)
+
+
+def build(plies=4, time_limit=1000, width=7, height=7, score_fn=custom_score,
+          workers=1, verbose=False):
+    """Search every opening position with fewer than `plies` moves played
+    for `time_limit` milliseconds and return the resulting `OpeningBook`.
+    """
+    positions = opening_positions(plies, width, height)
+    tasks = [(moves, width, height, time_limit, score_fn) for moves in positions]
+
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    try:
+        if pool is not None:
+            results = pool.imap(search_position, tasks)
+        else:
+            results = map(search_position, tasks)
+        book = OpeningBook(width, height, plies)
+        for i, (moves, move) in enumerate(zip(positions, results)):
+            if move != (-1, -1):
+                book.add(replay(moves, width, height), move)
+            if verbose and (i + 1) % 100 == 0:
+                print("{:>6d} / {} positions".format(i + 1, len(positions)))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return book
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="output file")
+    parser.add_argument("--plies", type=int, default=4,
+                        help="number of opening plies covered by the book")
+    parser.add_argument("--time", type=int, default=1000,
+                        help="milliseconds of search per position")
+    parser.add_argument("--width", type=int, default=7)
+    parser.add_argument("--height", type=int, default=7)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes searching in parallel")
+    args = parser.parse_args()
+
+    book = build(args.plies, args.time, args.width, args.height,
+                 workers=args.workers, verbose=True)
+    book.save(args.path)
+    print("Wrote {} positions to {}".format(len(book), args.path))
@@ -0,0 +1,312 @@
+"""Rate many Isolation agents against each other with a Bradley-Terry model.
+
+`tournament.py` compares a few test agents with a fixed list of opponents.
+This script instead schedules games between any set of registered AGENTS,
+keeps every result in an append-only store (one JSON object per line), and
+fits Bradley-Terry strengths, reported on the Elo scale, to all the stored
+results. Agents are identified by name, so games already in the store are
+never replayed: adding an agent to a round robin only plays its own
+pairings. (Rename an agent when changing its behavior.)
+
+Games are played in "fair" pairs as in the tournament: both agents play
+from the same random opening, once as each player.
+
+Two schedules are available: a round robin that plays every pairing until
+it has `pairs` game pairs in the store, and Swiss rounds that pair agents
+of similar rating among those that met the least, refitting the ratings
+after every round.
+
+Usage:
+
+    python ratings.py results.jsonl --agents AB_Improved AB_Custom AB_Custom_2 --pairs 10 --workers 4
+    python ratings.py results.jsonl --swiss 5
+"""
+import argparse
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+from collections import namedtuple
+
+import numpy as np
+
+from tournament import GameTask, init_worker, play_game, random_opening
+from sample_players import (RandomPlayer, GreedyPlayer, open_move_score,
+                            improved_score, center_score)
+from game_agent import (MinimaxPlayer, AlphaBetaPlayer, PVSPlayer,
+                        custom_score, custom_score_2, custom_score_3,
+                        custom_score_4, custom_score_5, custom_score_6)
+
+# Factories of the agents that can be rated, by name
+AGENTS = {
+    "Random": RandomPlayer,
+    "Greedy": lambda: GreedyPlayer(score_fn=improved_score),
+    "MM_Open": lambda: MinimaxPlayer(score_fn=open_move_score),
+    "MM_Center": lambda: MinimaxPlayer(score_fn=center_score),
+    "MM_Improved": lambda: MinimaxPlayer(score_fn=improved_score),
+    "AB_Open": lambda: AlphaBetaPlayer(score_fn=open_move_score),
+    "AB_Center": lambda: AlphaBetaPlayer(score_fn=center_score),
+    "AB_Improved": lambda: AlphaBetaPlayer(score_fn=improved_score),
+    "AB_Custom": lambda: AlphaBetaPlayer(score_fn=custom_score),
+    "AB_Custom_2": lambda: AlphaBetaPlayer(score_fn=custom_score_2),
+    "AB_Custom_3": lambda: AlphaBetaPlayer(score_fn=custom_score_3),
+    "AB_Custom_4": lambda: AlphaBetaPlayer(score_fn=custom_score_4),
+    "AB_Custom_5": lambda: AlphaBetaPlayer(score_fn=custom_score_5),
+    "AB_Custom_6": lambda: AlphaBetaPlayer(score_fn=custom_score_6),
+    "PVS_Custom": lambda: PVSPlayer(score_fn=custom_score),
+}
+
+Rating = namedtuple("Rating", ["elo", "error", "games", "score"])
+Rating.__doc__ = """Bradley-Terry rating of an agent.
+
+elo : strength on the Elo scale, relative to the geometric mean of the
+    rated agents
+error : standard error of `elo`
+games : number of games rated
+score : fraction of the games won
+"""
+
+ELO = 400. / math.log(10.)  # Elo points per unit of log strength
+
+
+class ResultsStore:
+    """Append-only store of game results, one JSON object per line with the
+    names of both players, the name of the winner, the reason the game
+    ended, the opening and the game seed.
+
+    Parameters
+    ----------
+    path : str
+        The file holding the results; created on the first write.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.results = []
+        if os.path.exists(path):
+            with open(path) as f:
+                self.results = [json.loads(line) for line in f if line.strip()]
+
+    def __len__(self):
+        return len(self.results)
+
+    def add(self, result):
+        """Append a result (a dict) to the store and to the file. """
+        with open(self.path, "a") as f:
+            f.write(json.dumps(result, sort_keys=True) + "\n")
+        self.results.append(result)
+
+    def agents(self):
+        """Return the sorted names of the agents with stored results. """
+        names = set()
+        for r in self.results:
+            names.update((r["player_1"], r["player_2"]))
+        return sorted(names)
+
+    def pairs(self, a, b):
+        """Return the number of game pairs stored between agents a and b. """
+        games = sum(1 for r in self.results
+                    if {r["player_1"], r["player_2"]} == {a, b})
+        return games // 2
+
+    def wins(self, agents):
+        """Return the matrix of wins: wins[i, j] is the number of games the
+        agent agents[i] won against agents[j].
+        """
+        index = {name: i for i, name in enumerate(agents)}
+        wins = np.zeros((len(agents), len(agents)))
+        for r in self.results:
+            players = (r["player_1"], r["player_2"])
+            if players[0] not in index or players[1] not in index:
+                continue
+            winner = r["winner"]
+            loser = players[1] if winner == players[0] else players[0]
+            wins[index[winner], index[loser]] += 1
+        return wins
+
+
+def bradley_terry(wins, initial=None, tolerance=1e-9, max_iterations=10000):
+    """Fit Bradley-Terry strengths to a matrix of wins with the MM algorithm
+    of Hunter (2004), starting from `initial` strengths (e.g. the previous
+    fit, so that adding a few results converges in a few iterations).
+
+    Every agent is also given one virtual win and one virtual loss against
+    an agent of strength 1, so that unbeaten or winless agents get finite
+    ratings.
+
+    Returns
+    -------
+    numpy.ndarray
+        The strengths, with a geometric mean of 1.
+    """
+    games = wins + wins.T
+    won = wins.sum(axis=1) + 1.
+    strength = np.ones(len(wins)) if initial is None else np.array(initial, float)
+    for _ in range(max_iterations):
+        pair_sums = strength[:, None] + strength[None, :]
+        denominator = (games / pair_sums).sum(axis=1) + 2. / (strength + 1.)
+        updated = won / denominator
+        updated /= np.exp(np.log(updated).mean())
+        change = np.abs(np.log(updated) - np.log(strength)).max()
+        strength = updated
+        if change < tolerance:
+            break
+    return strength
+
+
+def rate(store, agents=None, initial=None):
+    """Return the `Rating` of every agent (all the stored agents by default)
+    fitted to the stored results, as a dict keyed by name.
+
+    `initial` optionally maps names to the ratings of a previous fit, to
+    warm-start the solver.
+    """
+    agents = list(agents or store.agents())
+    wins = store.wins(agents)
+    start = None
+    if initial:
+        start = [10. ** (initial[a].elo / 400.) if a in initial else 1.
+                 for a in agents]
+    strength = bradley_terry(wins, start)
+
+    games = wins + wins.T
+    # standard errors of the log strengths from the Fisher information
+    p = strength[:, None] * strength[None, :]
+    info = (games * p / (strength[:, None] + strength[None, :]) ** 2).sum(axis=1)
+    info += 2. * strength / (strength + 1.) ** 2
+    ratings = {}
+    for i, name in enumerate(agents):
+        played = games[i].sum()
+        ratings[name] = Rating(
+            ELO * math.log(strength[i]), ELO / math.sqrt(info[i]),
+            int(played), wins[i].sum() / played if played else 0.)
+    return ratings
+
+
+def round_robin(store, agents, pairs):
+    """Return the pairings (a, b) missing from the store for every pair of
+    agents to have played `pairs` game pairs, one entry per missing pair.
+    """
+    pending = []
+    for a, b in itertools.combinations(sorted(agents), 2):
+        pending.extend([(a, b)] * max(pairs - store.pairs(a, b), 0))
+    return pending
+
+
+def swiss_pairings(store, agents, ratings):
+    """Pair every agent (but one if their number is odd) with an agent of
+    similar rating among those it has played the least.
+
+    Agents are taken by decreasing rating, and each one is paired with the
+    unpaired agent minimizing (game pairs played together, rating
+    difference).
+    """
+    order = sorted(agents, key=lambda a: -ratings[a].elo if a in ratings else 0.)
+    unpaired = list(order)
+    pairings = []
+    while len(unpaired) > 1:
+        a = unpaired.pop(0)
+        elo = ratings[a].elo if a in ratings else 0.
+        b = min(unpaired, key=lambda b: (
+            store.pairs(a, b),
+            abs(elo - (ratings[b].elo if b in ratings else 0.))))
+        unpaired.remove(b)
+        pairings.append((a, b))
+    return pairings
+
+
+def play_pairings(store, pairings, players, rng=random, pool=None):
+    """Play a fair game pair for every (a, b) pairing and add the results to
+    the store as they come. `players` maps names to player objects
+    registered with `tournament.init_worker()` in the same order.
+    """
+    names = list(players)
+    tasks = []
+    for a, b in pairings:
+        opening = random_opening(rng)
+        i, j = names.index(a), names.index(b)
+        tasks.append(GameTask(i, j, opening, rng.getrandbits(32)))
+        tasks.append(GameTask(j, i, opening, rng.getrandbits(32)))
+
+    results = pool.imap(play_game, tasks) if pool else map(play_game, tasks)
+    for task, (first_won, termination, _) in zip(tasks, results):
+        player_1, player_2 = names[task.player_1], names[task.player_2]
+        store.add({"player_1": player_1, "player_2": player_2,
+                   "winner": player_1 if first_won else player_2,
+                   "termination": termination,
+                   "opening": task.opening, "seed": task.seed})
+
+
+def print_ratings(ratings):
+    print("\n{:>4} {:<14}{:>8}{:>8}{:>8}{:>8}".format(
+        "Rank", "Agent", "Elo", "+/-", "Games", "Score"))
+    ranked = sorted(ratings.items(), key=lambda item: -item[1].elo)
+    for rank, (name, r) in enumerate(ranked, 1):
+        print("{:>4} {:<14}{:>+8.0f}{:>8.0f}{:>8d}{:>7.1f}%".format(
+            rank, name, r.elo, 1.96 * r.error, r.games, 100 * r.score))
+
+
+def main(path, agents=None, pairs=10, swiss=0, workers=1, seed=None,
+         clock="wall", registry=AGENTS):
+    """Complete a round robin of `pairs` game pairs between `agents` (or
+    play `swiss` Swiss rounds), store the results in `path` and return the
+    ratings of the agents.
+    """
+    store = ResultsStore(path)
+    agents = list(agents or store.agents())
+    unknown = [a for a in agents if a not in registry]
+    if unknown:
+        raise ValueError("Unknown agents: {}".format(", ".join(unknown)))
+    if seed is None:
+        seed = random.getrandbits(32)
+    # continuing with the same seed must not replay the stored openings
+    rng = random.Random(seed * 1000003 + len(store))
+
+    players = dict((name, registry[name]()) for name in agents)
+    pool = None
+    if workers > 1:
+        pool = multiprocessing.Pool(workers, initializer=init_worker,
+                                    initargs=(list(players.values()), clock))
+    else:
+        init_worker(list(players.values()), clock)
+    try:
+        if swiss:
+            ratings = rate(store, agents)
+            for _ in range(swiss):
+                play_pairings(store, swiss_pairings(store, agents, ratings),
+                              players, rng, pool)
+                ratings = rate(store, agents, ratings)
+        else:
+            pending = round_robin(store, agents, pairs)
+            print("{} game pairs to play ({} results stored)".format(
+                len(pending), len(store)))
+            play_pairings(store, pending, players, rng, pool)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return rate(store, agents)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="results store (JSON lines)")
+    parser.add_argument("--agents", nargs="+", choices=sorted(AGENTS),
+                        metavar="AGENT",
+                        help="agents to rate (default: the stored agents); "
+                             "one of " + ", ".join(sorted(AGENTS)))
+    parser.add_argument("--pairs", type=int, default=10,
+                        help="game pairs per pairing of the round robin")
+    parser.add_argument("--swiss", type=int, default=0, metavar="ROUNDS",
+                        help="play Swiss rounds instead of a round robin")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes playing games in parallel")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--clock", choices=["wall", "cpu"], default="wall")
+    args = parser.parse_args()
+
+    print_ratings(main(args.path, args.agents, args.pairs, args.swiss,
+                       args.workers, args.seed, args.clock))
@@ -0,0 +1,371 @@
+"""Exact solutions of Isolation on small boards.
+
+`solve()` computes, for every position reachable on a board of up to about
+5x5 cells (with both players placed), the distance to the end of the game
+with perfect play: the number of plies left when the winner ends the game as
+soon as it can and the loser delays its loss as long as it can. Since the
+player to move in the final position loses, the player to move wins if and
+only if the distance is odd.
+
+The positions are enumerated by an exhaustive depth-first search from every
+placement of the two players, with a memo keyed by position, so every
+reachable position is solved once from the values of its successors, as in
+a retrograde analysis restricted to the reachable positions. Two reductions
+keep the database small:
+
+- Positions related by a reflection or rotation of the board (see
+  `isolation.symmetry`) share one entry, keyed by their smallest encoding.
+- Once the players are partitioned (see endgame.py) the distance follows
+  from the longest knight paths a and b of the player to move and of its
+  opponent: the loser runs its longest path, so the game lasts 2 b + 1 plies
+  if a > b and 2 a plies otherwise. Those positions are not stored and are
+  computed on demand.
+
+A `Database` answers queries for any position of its board size, and saves
+itself as a compact binary file that NumPy maps into memory (little endian):
+a header with the magic bytes b"ISRG", the format version, the board width
+and height (one byte each, plus one byte of padding) and the number of
+entries (uint64), followed by the sorted keys (uint64) and the distances
+(uint8) of the entries. A key packs the mask of the blocked cells (cell
+index row + column * height, the player locations included) in its low
+width * height bits, followed by the 6-bit cell indices of the player to
+move and of its opponent.
+
+`OracleScore` turns a database into a heuristic that scores solved positions
+exactly, for agents to consult at the leaves of their search.
+
+Usage:
+
+    python retrograde.py 5 5 knight_5x5.bin
+"""
+import argparse
+import struct
+import sys
+import timeit
+
+import numpy as np
+
+from endgame import EndgameSolver, free_cells, region
+from game_agent import custom_score
+from isolation.bitboard import move_table
+from isolation.symmetry import symmetries
+
+MAGIC = b"ISRG"
+VERSION = 1
+_HEADER = struct.Struct("<4sBBBxQ")
+
+# positions are packed in 64-bit keys with 6 bits per player location
+MAX_CELLS = 52
+
+# score of a won position ending immediately (see `OracleScore`)
+ORACLE_WIN = 1000.
+
+
+def _best(distance, child):
+    """Return the distance of a position given the best distance found so
+    far over its successors (None before the first one) and the distance
+    of another successor.
+    """
+    d = child + 1
+    if distance is None:
+        return d
+    if d % 2:
+        # a win: take the fastest
+        return d if distance % 2 == 0 or d < distance else distance
+    # a loss: delay it unless there is a win
+    return d if distance % 2 == 0 and d > distance else distance
+
+
+class _Positions:
+    """Encoding of the positions of a board with both players placed, and
+    exact distances of the partitioned positions.
+    """
+
+    def __init__(self, width, height):
+        if width * height > MAX_CELLS:
+            raise ValueError("Boards of more than {} cells are not "
+                             "supported".format(MAX_CELLS))
+        self.width = width
+        self.height = height
+        self.cells = width * height
+        table = move_table(width, height)
+        self.masks = table.masks
+        self.full = table.full
+        self.moves = table.moves
+
+        # image of every byte of a blocked mask under every symmetry
+        self._symmetries = []
+        for perm in symmetries(width, height)[0]:
+            chunks = []
+            for start in range(0, self.cells, 8):
+                chunk = [0] * 256
+                for byte in range(256):
+                    for i in range(min(8, self.cells - start)):
+                        if byte >> i & 1:
+                            chunk[byte] |= 1 << perm[start + i]
+                chunks.append(tuple(chunk))
+            self._symmetries.append((tuple(chunks), perm))
+
+        self.endgame = EndgameSolver(max_entries=float("inf"))
+        self.endgame._prepare(width, height, None, 0.)
+
+    def key(self, blocked, own, opp):
+        """Return the smallest key of a position over its symmetric images.
+        """
+        n = self.cells
+        best = None
+        for chunks, perm in self._symmetries:
+            image = 0
+            bits = blocked
+            for chunk in chunks:
+                image |= chunk[bits & 0xFF]
+                bits >>= 8
+            key = image | perm[own] << n | perm[opp] << (n + 6)
+            if best is None or key < best:
+                best = key
+        return best
+
+    def partitioned(self, blocked, own, opp):
+        """Return the distance of a partitioned position, or None if the
+        players can still reach a common cell.
+        """
+        masks = self.masks
+        free = ~blocked & self.full
+        own_region = region(masks, own, free)
+        if masks[opp] & own_region:
+            return None
+        longest_path = self.endgame.longest_path
+        a = longest_path(own, own_region)
+        b = longest_path(opp, region(masks, opp, free))
+        return 2 * b + 1 if a > b else 2 * a
+
+
+class _Solver(_Positions):
+
+    def __init__(self, width, height):
+        _Positions.__init__(self, width, height)
+        self.memo = {}
+
+    def distance(self, blocked, own, opp):
+        key = self.key(blocked, own, opp)
+        distance = self.memo.get(key)
+        if distance is not None:
+            return distance
+        distance = self.partitioned(blocked, own, opp)
+        if distance is not None:
+            return distance
+
+        targets = self.masks[own] & ~blocked
+        while targets:
+            bit = targets & -targets
+            targets ^= bit
+            child = self.distance(blocked | bit, opp, bit.bit_length() - 1)
+            distance = _best(distance, child)
+        # contested positions always have a move
+        self.memo[key] = distance
+        return distance
+
+
+class Database:
+    """Distances to the end of the game with perfect play for the positions
+    of a board (see the module docstring).
+
+    Parameters
+    ----------
+    width, height : int
+        The board size.
+
+    keys, distances : numpy.ndarray
+        The sorted keys of the stored positions and their distances.
+    """
+
+    def __init__(self, width, height, keys, distances):
+        self.width = width
+        self.height = height
+        self.keys = keys
+        self.distances = distances
+        self._positions = _Positions(width, height)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def save(self, path):
+        """Write the database to a file. """
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, self.width, self.height,
+                                 len(self.keys)))
+            f.write(self.keys.astype("<u8").tobytes())
+            f.write(self.distances.astype("u1").tobytes())
+
+    @classmethod
+    def load(cls, path):
+        """Map a file written by `save()` into memory. """
+        with open(path, "rb") as f:
+            header = f.read(_HEADER.size)
+            f.seek(0, 2)
+            size = f.tell()
+        if len(header) < _HEADER.size:
+            raise ValueError("{} is not a retrograde database".format(path))
+        magic, version, width, height, count = _HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{} is not a retrograde database".format(path))
+        if size != _HEADER.size + 9 * count:
+            raise ValueError("{} is truncated".format(path))
+        if not count:
+            return cls(width, height, np.zeros(0, "<u8"), np.zeros(0, "u1"))
+        keys = np.memmap(path, dtype="<u8", mode="r", offset=_HEADER.size,
+                         shape=(count,))
+        distances = np.memmap(path, dtype="u1", mode="r",
+                              offset=_HEADER.size + 8 * count, shape=(count,))
+        return cls(width, height, keys, distances)
+
+    def _distance(self, blocked, own, opp):
+        """Return the distance of a position, or None if it is not
+        reachable. `own` is None if the player to move is not placed.
+        """
+        positions = self._positions
+        if own is None:
+            # placement: the player can move to any blank cell
+            distance = None
+            for idx in range(positions.cells):
+                if blocked >> idx & 1:
+                    continue
+                child = self._distance(blocked | 1 << idx, opp, idx)
+                if child is None:
+                    return None
+                distance = _best(distance, child)
+            return distance
+        if opp is None:
+            return None  # player 1 always moves first
+
+        distance = positions.partitioned(blocked, own, opp)
+        if distance is not None:
+            return distance
+        key = np.uint64(positions.key(blocked, own, opp))
+        i = int(np.searchsorted(self.keys, key))
+        if i < len(self.keys) and self.keys[i] == key:
+            return int(self.distances[i])
+        return None
+
+    def _encode(self, game):
+        h = game.height
+        locs = []
+        for player in (game.active_player, game.inactive_player):
+            loc = game.get_player_location(player)
+            locs.append(None if loc is None else loc[0] + loc[1] * h)
+        blocked = ~free_cells(game) & self._positions.full
+        return blocked, locs[0], locs[1]
+
+    def distance(self, game):
+        """Return the number of plies left in a game with perfect play, or
+        None if the position is not reachable from the empty board.
+        """
+        if (game.width, game.height) != (self.width, self.height):
+            raise ValueError("The database solves {}x{} boards".format(
+                self.width, self.height))
+        return self._distance(*self._encode(game))
+
+    def value(self, game):
+        """Return 1 if the active player wins with perfect play, -1 if it
+        loses, or None if the position is not reachable.
+        """
+        distance = self.distance(game)
+        if distance is None:
+            return None
+        return 1 if distance % 2 else -1
+
+    def best_move(self, game):
+        """Return the move of the active player with perfect play (the
+        fastest win, or the slowest loss), or (-1, -1) without legal moves.
+        """
+        best, distance = (-1, -1), None
+        for move in game.get_legal_moves():
+            child = self.distance(game.forecast_move(move))
+            if child is None:
+                continue
+            if _best(distance, child) != distance:
+                best, distance = move, _best(distance, child)
+        return best
+
+
+def solve(width, height, verbose=False):
+    """Solve every reachable position of a board and return its `Database`.
+    """
+    solver = _Solver(width, height)
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, 4 * solver.cells + 100))
+    try:
+        n = solver.cells
+        for a in range(n):
+            for b in range(n):
+                if a != b:
+                    solver.distance(1 << a | 1 << b, a, b)
+            if verbose:
+                print("{:>3d}/{} placements, {:>10d} positions".format(
+                    a + 1, n, len(solver.memo)))
+    finally:
+        sys.setrecursionlimit(limit)
+
+    memo = solver.memo
+    keys = np.fromiter(memo.keys(), dtype="<u8", count=len(memo))
+    distances = np.fromiter(memo.values(), dtype="u1", count=len(memo))
+    order = np.argsort(keys)
+    return Database(width, height, keys[order], distances[order])
+
+
+class OracleScore:
+    """Heuristic scoring positions solved by a `Database` exactly, and the
+    others with a fallback heuristic.
+
+    A won position scores ORACLE_WIN minus its distance, so that faster wins
+    (and slower losses) are preferred; a lost one scores the opposite.
+
+    Parameters
+    ----------
+    database : `Database`
+        The solutions for the board size of the games scored.
+
+    score_fn : callable (optional)
+        The heuristic for positions the database does not solve (e.g.
+        before both players are placed).
+    """
+
+    def __init__(self, database, score_fn=custom_score):
+        self.database = database
+        self.score_fn = score_fn
+        # solved positions score alike under the symmetries of the board
+        self.symmetric = getattr(score_fn, "symmetric", False)
+
+    def __call__(self, game, player):
+        ctx = game.eval_context(player)
+        if ctx.utility:
+            return ctx.utility
+        if ctx.own_loc is None or ctx.opp_loc is None:
+            return self.score_fn(game, player)
+        distance = self.database.distance(game)
+        if distance is None:
+            return self.score_fn(game, player)
+        # the active player wins if the distance is odd
+        won = (distance % 2 == 1) == (game.active_player is player)
+        return ORACLE_WIN - distance if won else distance - ORACLE_WIN
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("width", type=int)
+    parser.add_argument("height", type=int)
+    parser.add_argument("path", help="output file")
+    args = parser.parse_args()
+
+    start = timeit.default_timer()
+    database = solve(args.width, args.height, verbose=True)
+    database.save(args.path)
+    print("Solved {} positions in {:.1f} s".format(
+        len(database), timeit.default_timer() - start))
+
+    from isolation import Board
+    game = Board("Player1", "Player2", args.width, args.height)
+    distance = database.distance(game)
+    print("The {} player wins in {} plies".format(
+        "first" if distance % 2 else "second", distance))
@@ -6,9 +6,12 @@ own agent and example heuristic functions.
     ************************************************************************
 """
 
-from random import randint
+import random
 
+from isolation.symmetry import symmetric
 
+
+@symmetric
 def null_score(game, player):
     """This heuristic presumes no knowledge for non-terminal states, and
     returns the same uninformative value for all other states.
@@ -39,6 +42,7 @@ def null_score(game, player):
     return 0.
 
 
+@symmetric
 def open_move_score(game, player):
     """The basic evaluation function described in lecture that outputs a score
     equal to the number of moves open for your computer player on the board.
@@ -59,15 +63,14 @@ def open_move_score(game, player):
     float
         The heuristic value of the current game state
     """
-    if game.is_loser(player):
-        return float("-inf")
+    ctx = game.eval_context(player)
+    if ctx.utility:
+        return ctx.utility
 
-    if game.is_winner(player):
-        return float("inf")
-
-    return float(len(game.get_legal_moves(player)))
+    return float(ctx.own_moves)
 
 
+@symmetric
 def improved_score(game, player):
     """The "Improved" evaluation function discussed in lecture that outputs a
     score equal to the difference in the number of moves available to the
@@ -89,15 +92,11 @@ def improved_score(game, player):
     float
         The heuristic value of the current game state
     """
-    if game.is_loser(player):
-        return float("-inf")
+    ctx = game.eval_context(player)
+    if ctx.utility:
+        return ctx.utility
 
-    if game.is_winner(player):
-        return float("inf")
-
-    own_moves = len(game.get_legal_moves(player))
-    opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
-    return float(own_moves - opp_moves)
+    return float(ctx.own_moves - ctx.opp_moves)
 
 
 def center_score(game, player):
@@ -122,20 +121,22 @@ def center_score(game, player):
     float
         The heuristic value of the current game state
     """
-    if game.is_loser(player):
-        return float("-inf")
-
-    if game.is_winner(player):
-        return float("inf")
+    ctx = game.eval_context(player)
+    if ctx.utility:
+        return ctx.utility
 
     w, h = game.width / 2., game.height / 2.
-    y, x = game.get_player_location(player)
+    y, x = ctx.own_loc
     return float((h - y)**2 + (w - x)**2)
 
 
 class RandomPlayer():
     """Player that chooses a move randomly."""
 
+    def __init__(self):
+        # random choices of the agent (reseeded by seeded games)
+        self.rng = random.Random()
+
     def get_move(self, game, time_left):
         """Randomly select a move from the available legal moves.
 
@@ -159,7 +160,7 @@ class RandomPlayer():
         legal_moves = game.get_legal_moves()
         if not legal_moves:
             return (-1, -1)
-        return legal_moves[randint(0, len(legal_moves) - 1)]
+        return legal_moves[self.rng.randint(0, len(legal_moves) - 1)]
 
 
 class GreedyPlayer():
@@ -0,0 +1,265 @@
+"""Headless self-play for Isolation, for generating training data.
+
+`Board.play()` is built for matches: it copies the board for every turn and
+times the agents. The self-play engine instead plays on a single `BitBoard`
+per game, lets the agents search it in place without time limit, and streams
+every position to a compact binary file that NumPy maps into memory, so that
+evaluation weights can be fitted offline (see fit_eval.py) without replaying
+games.
+
+Agents are given by name: "random", "greedy" (the move with the best
+heuristic value after it) or "search<depth>" (fixed-depth alpha-beta search),
+optionally followed by ":<heuristic>" with a key of SCORES, e.g.
+"search3:improved". The first `random_plies` moves of every game (at least
+the placement of both players) are random, so that games differ even between
+deterministic agents.
+
+File format (little endian): a header with the magic bytes b"ISOP", the
+format version and the board width and height (one byte each, plus one byte
+of padding), followed by one `RECORD` per position, in game order:
+
+    blocked : uint64 bit mask of the blocked cells (cell index row +
+        column * height, the player locations included)
+    player_1, player_2 : int8 cell index of each player, -1 if not placed
+    ply : uint8 number of moves played before the position
+    move : int8 cell index of the move played from the position
+    outcome : int8 +1 if the player to move won the game, -1 if it lost
+    game : uint32 index of the game
+
+Usage:
+
+    python selfplay.py --games 100000 --agents greedy search2 --workers 8 selfplay.bin
+"""
+import argparse
+import multiprocessing
+import random
+import struct
+from collections import namedtuple
+
+import numpy as np
+
+from isolation import BitBoard
+from isolation.isolation import Board
+from sample_players import improved_score, open_move_score, center_score
+from game_agent import (AlphaBetaPlayer, custom_score, custom_score_2,
+                        custom_score_3)
+
+MAGIC = b"ISOP"
+VERSION = 1
+_HEADER = struct.Struct("<4sBBBx")
+
+RECORD = np.dtype([("blocked", "<u8"), ("player_1", "i1"), ("player_2", "i1"),
+                   ("ply", "u1"), ("move", "i1"), ("outcome", "i1"),
+                   ("game", "<u4")])
+
+GAMES_PER_TASK = 100
+
+SCORES = {"custom": custom_score, "custom_2": custom_score_2,
+          "custom_3": custom_score_3, "improved": improved_score,
+          "open": open_move_score, "center": center_score}
+
+Dataset = namedtuple("Dataset", ["width", "height", "records"])
+
+
+def _no_limit():
+    return float("inf")
+
+
+class RandomAgent:
+    """Play uniformly random legal moves. """
+
+    def select(self, game, moves, rng):
+        return rng.choice(moves)
+
+
+class GreedyAgent:
+    """Play the move with the best heuristic value after it, breaking ties
+    at random.
+    """
+
+    def __init__(self, score_fn=custom_score):
+        self.score = score_fn
+
+    def select(self, game, moves, rng):
+        best, best_moves = float("-inf"), []
+        for m in moves:
+            game.apply_move(m)
+            v = self.score(game, self)
+            game.undo_move()
+            if v > best:
+                best, best_moves = v, [m]
+            elif v == best:
+                best_moves.append(m)
+        return rng.choice(best_moves or moves)
+
+
+class SearchAgent(AlphaBetaPlayer):
+    """Play the move of an iterative deepening alpha-beta search to a fixed
+    depth, without time limit.
+    """
+
+    def __init__(self, depth=3, score_fn=custom_score):
+        AlphaBetaPlayer.__init__(self, search_depth=depth, score_fn=score_fn)
+
+    def select(self, game, moves, rng):
+        self.time_left = _no_limit
+        self.tt.new_search()
+        self.new_ordering()
+        move = moves[0]
+        for depth in range(1, self.search_depth + 1):
+            best = self.alphabeta(game, depth)
+            # (-1, -1) when every move loses: keep the shallower choice
+            if best != (-1, -1):
+                move = self.pv_move = best
+        return move
+
+
+def make_agent(spec):
+    """Return the agent described by `spec` (see the module docstring). """
+    kind, _, score = spec.partition(":")
+    if score and score not in SCORES:
+        raise ValueError("Unknown heuristic in agent {!r}".format(spec))
+    score_fn = SCORES[score or "custom"]
+    if kind == "random" and not score:
+        return RandomAgent()
+    if kind == "greedy":
+        return GreedyAgent(score_fn)
+    if kind.startswith("search") and kind[6:].isdigit():
+        return SearchAgent(int(kind[6:]), score_fn)
+    raise ValueError("Unknown agent {!r}".format(spec))
+
+
+def play_game(game_id, agents, rng, random_plies=2, width=7, height=7):
+    """Play one game between two distinct agents and return its positions as
+    a list of `RECORD` tuples.
+    """
+    game = BitBoard(agents[0], agents[1], width, height)
+    rows = []
+    blocked = 0
+    locs = [-1, -1]
+    ply = 0
+    while True:
+        moves = game.get_legal_moves(shuffle=False)
+        if not moves:
+            break
+        if ply < max(random_plies, 2):
+            move = rng.choice(moves)
+        else:
+            move = agents[ply % 2].select(game, moves, rng)
+        idx = move[0] + move[1] * height
+        rows.append([blocked, locs[0], locs[1], ply, idx, 1, game_id])
+        game.apply_move(move)
+        blocked |= 1 << idx
+        locs[ply % 2] = idx
+        ply += 1
+
+    # the player to move in the final position lost
+    loser = ply % 2
+    for row in rows:
+        if row[3] % 2 == loser:
+            row[5] = -1
+    return [tuple(row) for row in rows]
+
+
+def play_games(task):
+    """Play a batch of games and return their positions as a `RECORD` array.
+    The argument is a tuple (first_game, count, seed, agents, random_plies,
+    width, height), with the agents given by name. New agents are made for
+    every batch, so that its games do not depend on the batches played
+    before it in the same process.
+    """
+    first_game, count, seed, specs, random_plies, width, height = task
+    agents = [make_agent(spec) for spec in specs]
+    rng = random.Random((seed << 32) + first_game)
+    rows = []
+    for game_id in range(first_game, first_game + count):
+        rows.extend(play_game(game_id, agents, rng, random_plies, width,
+                              height))
+    return np.array(rows, dtype=RECORD)
+
+
+def generate(path, games, agents=("greedy", "greedy"), random_plies=2,
+             width=7, height=7, seed=0, workers=1, verbose=False):
+    """Play `games` games between `agents` (a pair of agent names) and write
+    their positions to `path`. Return the number of positions written.
+
+    The games are played in batches of GAMES_PER_TASK seeded from `seed`
+    and the batch index, so the file does not depend on `workers`.
+    """
+    if width * height > 64:
+        raise ValueError("Boards of more than 64 cells are not supported")
+    tasks = [(start, min(GAMES_PER_TASK, games - start), seed, tuple(agents),
+              random_plies, width, height)
+             for start in range(0, games, GAMES_PER_TASK)]
+
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    count = 0
+    try:
+        results = pool.imap(play_games, tasks) if pool else map(play_games,
+                                                                tasks)
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, width, height))
+            for i, records in enumerate(results):
+                f.write(records.tobytes())
+                count += len(records)
+                if verbose and (i + 1) % 100 == 0:
+                    print("{:>9d} games, {:>10d} positions".format(
+                        min((i + 1) * GAMES_PER_TASK, games), count))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return count
+
+
+def load(path):
+    """Map a file written by `generate()` into memory and return its
+    `Dataset` (the records are a read-only `RECORD` array).
+    """
+    with open(path, "rb") as f:
+        header = f.read(_HEADER.size)
+        f.seek(0, 2)
+        size = f.tell()
+    if len(header) < _HEADER.size:
+        raise ValueError("{} is not a self-play file".format(path))
+    magic, version, width, height = _HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("{} is not a self-play file".format(path))
+    if (size - _HEADER.size) % RECORD.itemsize:
+        raise ValueError("{} is truncated".format(path))
+    if size == _HEADER.size:
+        return Dataset(width, height, np.zeros(0, dtype=RECORD))
+    records = np.memmap(path, dtype=RECORD, mode="r", offset=_HEADER.size)
+    return Dataset(width, height, records)
+
+
+def position(record, width=7, height=7, players=("Player1", "Player2")):
+    """Return a `BitBoard` in the state of a record. The board has no move
+    history: moves can be applied and undone, but not the moves before it.
+    """
+    locs = [Board.NOT_MOVED if loc < 0 else int(loc)
+            for loc in (record["player_1"], record["player_2"])]
+    return BitBoard.from_state(players[0], players[1], int(record["blocked"]),
+                               locs, int(record["ply"]), width, height)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="output file")
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--agents", nargs=2, default=["greedy", "greedy"],
+                        metavar="AGENT", help="first and second player")
+    parser.add_argument("--random-plies", type=int, default=2,
+                        help="number of random opening moves per game")
+    parser.add_argument("--width", type=int, default=7)
+    parser.add_argument("--height", type=int, default=7)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes playing games in parallel")
+    args = parser.parse_args()
+
+    count = generate(args.path, args.games, args.agents, args.random_plies,
+                     args.width, args.height, args.seed, args.workers,
+                     verbose=True)
+    print("Wrote {} positions to {}".format(count, args.path))
@@ -0,0 +1,124 @@
+"""Sequential probability ratio tests for comparing Isolation agents.
+
+Games are played in pairs from the same opening with the agents swapping
+sides, and the score of a pair (0, 0.5 or 1 for the test agent) is one
+sample. `SPRT` tests the hypothesis that the expected score of the test
+agent corresponds to a rating difference of `elo0` against `elo1`, with the
+generalized SPRT of chess engine testing: the log-likelihood ratio uses the
+normal approximation of the mean pair score with the observed variance,
+
+    LLR = n (s1 - s0) (2 mean - s0 - s1) / (2 var),
+
+and the test stops when it leaves the interval (log(beta / (1 - alpha)),
+log((1 - beta) / alpha)); a hypothesis once accepted is kept, even if later
+samples move the ratio back inside the interval. `Comparison` runs the two
+one-sided tests against +margin and -margin Elo, so that it stops as soon as
+the test agent is stronger, weaker, or equivalent within the margin.
+"""
+import math
+
+
+def elo_to_score(elo):
+    """Return the expected score of a player `elo` points stronger. """
+    return 1. / (1. + 10. ** (-elo / 400.))
+
+
+def score_to_elo(score):
+    """Return the rating difference giving the expected score `score`. """
+    score = min(max(score, 1e-6), 1. - 1e-6)
+    return 400. * math.log10(score / (1. - score))
+
+
+class SPRT:
+    """Sequential test of H0: the rating difference is `elo0` against
+    H1: it is `elo1`, with error rates `alpha` (accepting H1 under H0) and
+    `beta` (accepting H0 under H1).
+
+    No decision is taken before `min_samples` samples, while the observed
+    variance is too noisy, and the variance is never taken below
+    `min_variance` (the variance of a pair score is about 0.1 between
+    agents of similar strength), so that a few identical results cannot
+    decide a test.
+    """
+
+    def __init__(self, elo0, elo1, alpha=0.05, beta=0.05, min_samples=8,
+                 min_variance=0.05):
+        self.s0 = elo_to_score(elo0)
+        self.s1 = elo_to_score(elo1)
+        self.lower = math.log(beta / (1. - alpha))
+        self.upper = math.log((1. - beta) / alpha)
+        self.min_samples = min_samples
+        self.min_variance = min_variance
+        self.count = 0
+        self.total = 0.
+        self.squares = 0.
+        self.result = None
+
+    def add(self, score):
+        """Record the score (between 0 and 1) of one sample. """
+        self.count += 1
+        self.total += score
+        self.squares += score * score
+        if self.result is None and self.count >= self.min_samples:
+            llr = self.llr()
+            if llr >= self.upper:
+                self.result = "H1"
+            elif llr <= self.lower:
+                self.result = "H0"
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.5
+
+    def llr(self):
+        """Return the log-likelihood ratio of H1 against H0. """
+        if self.count < 2:
+            return 0.
+        mean = self.mean
+        var = max(self.squares / self.count - mean * mean, self.min_variance)
+        return (self.count * (self.s1 - self.s0) *
+                (2. * mean - self.s0 - self.s1) / (2. * var))
+
+    def status(self):
+        """Return "H1" or "H0" once the test has accepted a hypothesis, or
+        None while it continues. The result is that of the first sample
+        which crossed a bound.
+        """
+        return self.result
+
+
+class Comparison:
+    """Decide whether the test agent is stronger, weaker, or equivalent to
+    its opponent within `margin` Elo, from the scores of game pairs.
+    """
+
+    def __init__(self, margin, alpha=0.05, beta=0.05, min_samples=8):
+        self.better = SPRT(0., margin, alpha, beta, min_samples)
+        self.worse = SPRT(0., -margin, alpha, beta, min_samples)
+        self.pairs = [0, 0, 0]  # pairs lost, split and won
+
+    def add(self, wins):
+        """Record a game pair in which the test agent won `wins` games. """
+        self.pairs[wins] += 1
+        for test in (self.better, self.worse):
+            test.add(wins / 2.)
+
+    @property
+    def count(self):
+        return self.better.count
+
+    def elo(self):
+        """Return the rating difference estimated from the mean score. """
+        return score_to_elo(self.better.mean)
+
+    def decision(self):
+        """Return "stronger", "weaker" or "equivalent" once decided, or None.
+        """
+        better, worse = self.better.status(), self.worse.status()
+        if better == "H1":
+            return "stronger"
+        if worse == "H1":
+            return "weaker"
+        if better == "H0" and worse == "H0":
+            return "equivalent"
+        return None
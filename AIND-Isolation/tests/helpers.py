@@ -0,0 +1,30 @@
+"""Helpers shared by the unit tests."""
+
+import random
+
+import isolation
+
+
+def random_games(count, seed, board_cls=isolation.BitBoard):
+    """Yield random games in progress with the active player able to move. """
+    rng = random.Random(seed)
+    found = 0
+    while found < count:
+        game = board_cls("Player1", "Player2")
+        for _ in range(rng.randint(2, 40)):
+            moves = sorted(game.get_legal_moves())
+            if not moves:
+                break
+            game.apply_move(rng.choice(moves))
+        if game.get_legal_moves():
+            found += 1
+            yield game
+
+
+def replay_moves(game):
+    """Return the moves leading to `game` (from its undo stack). """
+    board = game.copy()
+    moves = []
+    while board.move_count:
+        moves.append(board.undo_move())
+    return moves[::-1]
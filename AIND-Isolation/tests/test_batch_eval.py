@@ -0,0 +1,51 @@
+"""Unit tests for the vectorized evaluation of child positions."""
+
+import unittest
+from itertools import product
+
+import isolation
+import batch_eval
+from game_agent import (AlphaBetaPlayer, PVSPlayer, custom_score,
+                        custom_score_5)
+from sample_players import improved_score, open_move_score
+
+from tests.helpers import random_games, replay_moves
+
+
+class BatchEvalTest(unittest.TestCase):
+    """Compare batch scores with the scalar heuristics"""
+
+    def test_scores(self):
+        pairs = [(batch_eval.custom_score, custom_score),
+                 (batch_eval.custom_score_5, custom_score_5),
+                 (batch_eval.improved_score, improved_score),
+                 (batch_eval.open_move_score, open_move_score)]
+        for cls in (isolation.Board, isolation.BitBoard):
+            for game in random_games(30, 0, cls):
+                moves = game.get_legal_moves(shuffle=False)
+                for player in (game.active_player, game.inactive_player):
+                    for batch_fn, score_fn in pairs:
+                        scores = batch_fn(game, moves, player)
+                        for m, score in zip(moves, scores):
+                            expected = score_fn(game.forecast_move(m), player)
+                            self.assertAlmostEqual(score, expected)
+
+    def test_search(self):
+        """ Batch leaf scoring does not change the search result """
+        pairs = [(custom_score, batch_eval.custom_score),
+                 (custom_score_5, batch_eval.custom_score_5)]
+        for game in random_games(5, 2):
+            for cls, (score_fn, batch_score) in product(
+                    (AlphaBetaPlayer, PVSPlayer), pairs):
+                results = []
+                for batch_fn in (None, batch_score):
+                    player = cls(score_fn=score_fn, batch_fn=batch_fn)
+                    player.time_left = lambda: 1e9
+                    board = isolation.BitBoard(player, "Player2")
+                    if game.move_count % 2:
+                        board = isolation.BitBoard("Player2", player)
+                    for m in replay_moves(game):
+                        board.apply_move(m)
+                    results.append(player.alphabeta(board, 4))
+                self.assertEqual(results[0], results[1])
+
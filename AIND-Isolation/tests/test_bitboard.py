@@ -0,0 +1,104 @@
+"""Unit tests checking that `isolation.BitBoard` reproduces the behavior of the
+reference `isolation.Board` implementation.
+"""
+
+import random
+import unittest
+
+import isolation
+
+
+class BitBoardTest(unittest.TestCase):
+    """Compare BitBoard and Board along random game trajectories"""
+
+    def setUp(self):
+        self.player1 = "Player1"
+        self.player2 = "Player2"
+
+    def assertSameState(self, board, bitboard):
+        for player in (self.player1, self.player2):
+            self.assertEqual(sorted(board.get_legal_moves(player)),
+                             sorted(bitboard.get_legal_moves(player)))
+            self.assertEqual(board.get_player_location(player),
+                             bitboard.get_player_location(player))
+            self.assertEqual(board.utility(player), bitboard.utility(player))
+            self.assertEqual(board.is_winner(player), bitboard.is_winner(player))
+            self.assertEqual(board.is_loser(player), bitboard.is_loser(player))
+        self.assertEqual(board.get_blank_spaces(), bitboard.get_blank_spaces())
+        self.assertEqual(board.active_player, bitboard.active_player)
+        self.assertEqual(board.move_count, bitboard.move_count)
+        self.assertEqual(board.to_string(), bitboard.to_string())
+
+    def test_random_games(self):
+        rng = random.Random(0)
+        for width, height in [(7, 7), (5, 4), (3, 6)]:
+            for _ in range(20):
+                board = isolation.Board(self.player1, self.player2, width, height)
+                bitboard = isolation.BitBoard(self.player1, self.player2, width, height)
+                self.assertSameState(board, bitboard)
+                while board.get_legal_moves():
+                    move = rng.choice(sorted(board.get_legal_moves()))
+                    self.assertTrue(bitboard.move_is_legal(move))
+                    board.apply_move(move)
+                    bitboard.apply_move(move)
+                    self.assertSameState(board, bitboard)
+                    self.assertFalse(bitboard.move_is_legal(move))
+
+    def test_forecast_does_not_modify(self):
+        bitboard = isolation.BitBoard(self.player1, self.player2)
+        bitboard.apply_move((3, 3))
+        bitboard.apply_move((0, 0))
+        before = bitboard.to_string()
+        child = bitboard.forecast_move((1, 1))
+        self.assertEqual(before, bitboard.to_string())
+        self.assertIsInstance(child, isolation.BitBoard)
+        self.assertEqual(child.get_player_location(self.player1), (1, 1))
+        self.assertEqual(child.active_player, self.player2)
+
+    def test_subclass_copy(self):
+        """ Copies and forecasts keep the class of a BitBoard subclass """
+
+        class RecordingBoard(isolation.BitBoard):
+            moves = []
+
+            def apply_move(self, move):
+                self.moves.append(move)
+                isolation.BitBoard.apply_move(self, move)
+
+        board = RecordingBoard(self.player1, self.player2)
+        board.apply_move((3, 3))
+        self.assertIsInstance(board.copy(), RecordingBoard)
+        child = board.forecast_move((0, 0))
+        self.assertIsInstance(child, RecordingBoard)
+        self.assertEqual(RecordingBoard.moves, [(3, 3), (0, 0)])
+        self.assertEqual(child.get_player_location(self.player2), (0, 0))
+
+    def test_from_state(self):
+        """ A board rebuilt from its state matches the board played """
+        rng = random.Random(1)
+        for width, height in [(7, 7), (5, 4)]:
+            board = isolation.BitBoard(self.player1, self.player2, width, height)
+            while True:
+                blocked = sum(1 << (r + c * height) for r in range(height)
+                              for c in range(width)
+                              if (r, c) not in board.get_blank_spaces())
+                locs = [isolation.Board.NOT_MOVED if loc is None else
+                        loc[0] + loc[1] * height
+                        for loc in (board.get_player_location(self.player1),
+                                    board.get_player_location(self.player2))]
+                rebuilt = isolation.BitBoard.from_state(
+                    self.player1, self.player2, blocked, locs,
+                    board.move_count, width, height)
+                self.assertSameState(board, rebuilt)
+                self.assertEqual(rebuilt.hash(), board.hash())
+                moves = sorted(board.get_legal_moves())
+                if not moves:
+                    break
+                move = rng.choice(moves)
+                board.apply_move(move)
+                rebuilt.apply_move(move)
+                self.assertEqual(rebuilt.hash(), board.hash())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+"""Unit tests for the Monte Carlo Tree Search competition agent."""
+
+import timeit
+import unittest
+
+import isolation
+import competition_agent
+
+
+class MCTSPlayerTest(unittest.TestCase):
+    """Unit tests for competition_agent.CustomPlayer"""
+
+    def setUp(self):
+        self.player = competition_agent.CustomPlayer()
+        self.game = isolation.BitBoard(self.player, "Player2")
+        self.game.apply_move((3, 3))
+        self.game.apply_move((2, 4))
+
+    def time_left(self, limit=60.):
+        start = timeit.default_timer()
+        return lambda: limit - 1000 * (timeit.default_timer() - start)
+
+    def test_get_move(self):
+        before = self.game.to_string()
+        move = self.player.get_move(self.game, self.time_left())
+        self.assertIn(move, self.game.get_legal_moves())
+        self.assertEqual(before, self.game.to_string())
+        self.assertGreater(self.player.playouts, 0)
+        root_visits = sum(c.visits for c in self.player.tree.children)
+        self.assertGreater(root_visits, 0)
+
+    def test_tree_reuse(self):
+        move = self.player.get_move(self.game, self.time_left())
+        subtree = self.player.tree
+        self.game.apply_move(move)
+        reply = max(subtree.children, key=lambda c: c.visits)
+        self.game.apply_move(reply.move)
+        self.assertIs(self.player.reuse_tree(self.game), reply)
+
+    def test_guided_rollout(self):
+        player = competition_agent.CustomPlayer(rollout="guided")
+        game = isolation.Board(player, "Player2", 5, 5)
+        game.apply_move((2, 2))
+        move = player.get_move(game, self.time_left())
+        self.assertIn(move, game.get_legal_moves())
+        self.assertRaises(ValueError, competition_agent.CustomPlayer,
+                          rollout="unknown")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+"""Unit tests for the partition detection and exact endgame solver."""
+
+import random
+import unittest
+
+import isolation
+import endgame
+
+
+def wins(game):
+    """Exhaustive minimax: True if the active player wins with best play. """
+    for move in game.get_legal_moves(shuffle=False):
+        game.apply_move(move)
+        try:
+            if not wins(game):
+                return True
+        finally:
+            game.undo_move()
+    return False
+
+
+def partitioned_games(count, width, height, seed):
+    """Yield random games played until the players are partitioned. """
+    rng = random.Random(seed)
+    found = 0
+    while found < count:
+        game = isolation.BitBoard("Player1", "Player2", width, height)
+        while game.get_legal_moves():
+            game.apply_move(rng.choice(sorted(game.get_legal_moves())))
+            if endgame.partition(game) is not None:
+                found += 1
+                yield game
+                break
+
+
+class EndgameTest(unittest.TestCase):
+    """Compare the endgame solver with exhaustive search"""
+
+    def test_partition(self):
+        game = isolation.Board("Player1", "Player2", 5, 5)
+        self.assertIsNone(endgame.partition(game))
+        game.apply_move((0, 0))
+        game.apply_move((4, 4))
+        self.assertIsNone(endgame.partition(game))
+        for move in [(1, 2), (2, 1), (3, 2), (2, 3)]:
+            game._board_state[move[0] + move[1] * game.height] = 1
+        # (0, 0) and (4, 4) are now both cut off from the rest of the board
+        own, opp = endgame.partition(game)
+        self.assertEqual((own, opp), (0, 0))
+
+    def test_solver_matches_minimax(self):
+        solver = endgame.EndgameSolver()
+        for game in partitioned_games(40, 5, 5, seed=0):
+            move, active_wins = solver.solve(game)
+            self.assertEqual(active_wins, wins(game))
+            if move != (-1, -1):
+                self.assertIn(move, game.get_legal_moves())
+                game.apply_move(move)
+                # the best move never loses a won position
+                if active_wins:
+                    self.assertFalse(wins(game))
+
+    def test_longest_path(self):
+        solver = endgame.EndgameSolver()
+        game = isolation.BitBoard("Player1", "Player2", 3, 4)
+        game.apply_move((0, 0))
+        game.apply_move((3, 2))
+        move, length = solver.best_move(game)
+        self.assertIn(move, game.get_legal_moves())
+        # the 3x4 knight graph has a Hamiltonian path from a corner
+        self.assertEqual(length, 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
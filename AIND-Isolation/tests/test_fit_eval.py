@@ -0,0 +1,77 @@
+"""Unit tests for fitting linear evaluation functions."""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import fit_eval
+import selfplay
+from game_agent import AlphaBetaPlayer
+
+
+class FitEvalTest(unittest.TestCase):
+    """Test the feature extraction and the fitted heuristics"""
+
+    @classmethod
+    def setUpClass(cls):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            selfplay.generate(path, 30, ("random", "greedy"), width=6,
+                              height=5, seed=2)
+            cls.records = np.array(selfplay.load(path).records)
+        finally:
+            os.remove(path)
+
+    def test_features(self):
+        """ Vectorized features match the features of each position """
+        X, y, used = fit_eval.feature_matrix(self.records, 6, 5)
+        self.assertEqual(X.shape, (len(used), len(fit_eval.FEATURES)))
+        self.assertTrue(np.all(self.records["player_2"][used] >= 0))
+        self.assertTrue(X[:, fit_eval.FEATURES.index("partitioned")].any())
+        for row, idx in zip(X, used):
+            game = selfplay.position(self.records[idx], 6, 5)
+            self.assertEqual(fit_eval.features(game, game.active_player),
+                             list(row))
+
+    def test_fit(self):
+        rng = np.random.RandomState(0)
+        X = rng.normal(size=(500, 3))
+        w = np.array([1., -2., .5])
+        weights, bias = fit_eval.fit_least_squares(X, X.dot(w) + 3.)
+        self.assertTrue(np.allclose(weights, w))
+        self.assertAlmostEqual(bias, 3.)
+        y = np.where(X.dot(w) + rng.logistic(size=500) > 0, 1., -1.)
+        weights, _ = fit_eval.fit_logistic(X, y)
+        self.assertTrue(np.all(np.sign(weights) == np.sign(w)))
+
+    def test_score(self):
+        """ Fitted heuristics round-trip through files and drive searches """
+        score, accuracy = fit_eval.fit(self.records, 6, 5, "lstsq")
+        self.assertTrue(0. <= accuracy <= 1.)
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            score.save(path)
+            loaded = fit_eval.LinearScore.load(path)
+        finally:
+            os.remove(path)
+        self.assertEqual(loaded.weights, score.weights)
+
+        simple = fit_eval.LinearScore({"own_moves": 1., "opp_moves": -1.5,
+                                       "distance": .2, "own_center": -.1})
+        full = fit_eval.LinearScore(dict(simple.weights, region_diff=1e-9))
+        for idx in range(0, len(self.records), 7):
+            game = selfplay.position(self.records[idx], 6, 5)
+            for player in (game.active_player, game.inactive_player):
+                self.assertAlmostEqual(simple(game, player),
+                                       full(game, player), places=6)
+
+        player = AlphaBetaPlayer(score_fn=loaded)
+        player.time_left = lambda: 1e9
+        game = selfplay.position(self.records[10], 6, 5, ("Player1", player))
+        if game.active_player is player:
+            self.assertIn(player.alphabeta(game, 3), game.get_legal_moves())
+        self.assertRaises(ValueError, fit_eval.LinearScore, {"unknown": 1.})
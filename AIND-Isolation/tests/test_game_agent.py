@@ -3,6 +3,7 @@ tests to run and debug your minimax and alphabeta agents locally.  The test
 cases used by the project assistant are not public.
 """
 
+import timeit
 import unittest
 
 import isolation
@@ -25,5 +26,229 @@ class IsolationTest(unittest.TestCase):
         self.fail("Hello, World!")
 
 
+class TranspositionTableTest(unittest.TestCase):
+    """Unit tests for the transposition table used by AlphaBetaPlayer"""
+
+    def setUp(self):
+        reload(game_agent)
+
+    def test_replacement(self):
+        tt = game_agent.TranspositionTable(size=4)
+        tt.store(1, 3, tt.EXACT, 1., (0, 0))
+        tt.store(5, 1, tt.EXACT, 2., (1, 1))
+        self.assertEqual(tt.get(1)[3], 1.)
+        self.assertIsNone(tt.get(5))
+        tt.new_search()
+        tt.store(5, 1, tt.EXACT, 2., (1, 1))
+        self.assertIsNone(tt.get(1))
+        self.assertEqual(tt.get(5)[4], (1, 1))
+
+    def test_hash_transpositions(self):
+        game = isolation.Board("Player1", "Player2")
+        other = isolation.BitBoard("Player1", "Player2")
+        for move in [(0, 0), (6, 6), (1, 2), (4, 5), (3, 3)]:
+            game.apply_move(move)
+        for move in [(1, 2), (6, 6), (0, 0), (4, 5), (3, 3)]:
+            other.apply_move(move)
+        self.assertEqual(game.hash(), other.hash())
+        other.undo_move()
+        other.apply_move((2, 1))
+        self.assertNotEqual(game.hash(), other.hash())
+
+    def test_cached_search_matches_plain_search(self):
+        player = game_agent.AlphaBetaPlayer()
+        player.time_left = lambda: float("inf")
+        game = isolation.Board(player, "Player2")
+        for move in [(3, 3), (2, 4), (1, 1), (0, 3)]:
+            game.apply_move(move)
+        for depth in range(1, 5):
+            value, _ = player.max_ab(game, float("-inf"), float("inf"), 0, depth)
+            plain = game_agent.AlphaBetaPlayer(tt_size=1)
+            plain.tt.store = lambda *args: None
+            plain.time_left = player.time_left
+            plain_game = isolation.Board(plain, "Player2")
+            for move in [(3, 3), (2, 4), (1, 1), (0, 3)]:
+                plain_game.apply_move(move)
+            plain_value, _ = plain.max_ab(plain_game, float("-inf"),
+                                          float("inf"), 0, depth)
+            self.assertEqual(value, plain_value)
+
+    def test_reused_in_both_seats(self):
+        """ An agent reused in the other seat does not read the values it
+        stored from its former seat """
+        moves = [(3, 3), (2, 4), (1, 1), (0, 3), (2, 2), (4, 4)]
+        inf = float("inf")
+        for plies in (2, 4, 6):
+            for depth in range(1, 4):
+                reused = game_agent.AlphaBetaPlayer()
+                reused.time_left = lambda: inf
+                fresh = game_agent.AlphaBetaPlayer()
+                fresh.time_left = reused.time_left
+
+                # player 1 to move, then its parent with player 2 to move
+                game = isolation.Board(reused, "Player2")
+                for move in moves[:plies]:
+                    game.apply_move(move)
+                reused.max_ab(game, -inf, inf, 0, depth)
+
+                values = []
+                for player in (reused, fresh):
+                    game = isolation.Board("Player1", player)
+                    for move in moves[:plies - 1]:
+                        game.apply_move(move)
+                    values.append(player.max_ab(game, -inf, inf, 0,
+                                                depth + 1)[0])
+                self.assertEqual(values[0], values[1])
+
+
+class MoveOrderingTest(unittest.TestCase):
+    """Unit tests for the move ordering used by AlphaBetaPlayer"""
+
+    def setUp(self):
+        reload(game_agent)
+        self.player = game_agent.AlphaBetaPlayer()
+        self.game = isolation.Board(self.player, "Player2")
+        self.game.apply_move((3, 3))
+        self.game.apply_move((0, 0))
+
+    def test_order(self):
+        moves = self.game.get_legal_moves(shuffle=False)
+        self.assertEqual(moves, self.game.get_legal_moves(shuffle=False))
+        self.player.history[0][moves[-1]] = 10
+        self.player.record_cutoff(moves[-2], 2, 0, 1)
+        ordered = self.player.ordered_moves(self.game, 2, 0, moves[-3])
+        self.assertEqual(ordered[:4], [moves[-3], moves[-2], moves[-1], moves[0]])
+        self.assertEqual(sorted(ordered), sorted(moves))
+
+    def test_new_ordering(self):
+        self.player.record_cutoff((1, 5), 2, 0, 3)
+        self.player.new_ordering()
+        self.assertEqual(self.player.killers, {})
+        self.assertEqual(self.player.history[0][(1, 5)], 4)
+
+
+class PVSPlayerTest(unittest.TestCase):
+    """PVSPlayer must agree with AlphaBetaPlayer on the value of the root"""
+
+    def setUp(self):
+        reload(game_agent)
+
+    def search(self, cls, depth):
+        player = cls()
+        player.time_left = lambda: float("inf")
+        game = isolation.Board(player, "Player2")
+        for move in [(3, 3), (2, 4), (1, 1), (0, 3), (2, 3), (1, 5)]:
+            game.apply_move(move)
+        for d in range(1, depth + 1):
+            player.pv_move = player.alphabeta(game, d)
+        return player, game
+
+    def test_root_value(self):
+        for depth in range(1, 6):
+            pvs, _ = self.search(game_agent.PVSPlayer, depth)
+            ab, game = self.search(game_agent.AlphaBetaPlayer, depth)
+            value, _ = ab.max_ab(game, float("-inf"), float("inf"), 0, depth)
+            self.assertAlmostEqual(pvs.pv_score, value)
+
+    def test_get_move(self):
+        player = game_agent.PVSPlayer()
+        game = isolation.BitBoard(player, "Player2")
+        game.apply_move((3, 3))
+        game.apply_move((2, 4))
+        start = timeit.default_timer()
+        move = player.get_move(
+            game, lambda: 100. - 1000 * (timeit.default_timer() - start))
+        self.assertIn(move, game.get_legal_moves())
+
+
+class SearchStatsTest(unittest.TestCase):
+    """AlphaBetaPlayer records the statistics of every move"""
+
+    def setUp(self):
+        reload(game_agent)
+
+    def test_stats(self):
+        player = game_agent.AlphaBetaPlayer()
+        game = isolation.BitBoard(player, "Player2")
+        start = timeit.default_timer()
+        time_left = lambda: 100. - 1000 * (timeit.default_timer() - start)
+        player.get_move(game, time_left)
+        game.apply_move((3, 3))
+        game.apply_move((2, 4))
+        start = timeit.default_timer()
+        player.get_move(game, time_left)
+
+        book, search = player.stats
+        self.assertEqual((book.move_count, book.source), (0, "book"))
+        self.assertEqual(search.move_count, 2)
+        self.assertIn(search.source, ("search", "partial"))
+        self.assertEqual(len(search.iteration_ms), search.depth + 1)
+        self.assertGreaterEqual(search.nodes, search.leaves)
+        self.assertGreater(search.leaves, 0)
+        self.assertGreater(search.cutoffs, 0)
+        self.assertLess(search.time_left, 100.)
+
+
+class TimeManagerTest(unittest.TestCase):
+    """Iterations are started only when they are expected to finish"""
+
+    def setUp(self):
+        reload(game_agent)
+
+    def test_predict(self):
+        timer = game_agent.TimeManager()
+        game = isolation.Board("Player1", "Player2")
+        game.apply_move((3, 3))
+        game.apply_move((0, 0))
+        timer.new_turn(game, 100., 10.)
+        self.assertEqual(timer.deadline, 10.)
+        self.assertEqual(timer.predict(), 0.)
+        timer.record(0.1)
+        # too short to time: the root branching factor is used
+        self.assertAlmostEqual(timer.predict(), 0.8)
+        timer.record(2.)
+        timer.record(6.)
+        self.assertAlmostEqual(timer.predict(), 18.)
+        self.assertTrue(timer.should_deepen(28.))
+        # iterations predicted to overrun the budget are skipped
+        self.assertFalse(timer.should_deepen(27.))
+
+    def test_phase(self):
+        """ The opening share of the turn only applies in the opening """
+        game = isolation.Board("Player1", "Player2", 3, 3)
+        game.apply_move((0, 0))
+        game.apply_move((2, 2))
+
+        class Timer(game_agent.TimeManager):
+            OPENING = 0.7
+            OPENING_SHARE = 0.5
+
+        timer = Timer()
+        timer.new_turn(game, 110., 10.)
+        self.assertEqual(timer.deadline, 60.)
+        game.apply_move((1, 2))
+        timer.new_turn(game, 110., 10.)
+        self.assertEqual(timer.deadline, 10.)
+
+    def test_partial_iteration(self):
+        """ The best move of an unfinished iteration is returned """
+
+        class Interrupted(game_agent.AlphaBetaPlayer):
+            def alphabeta(self, game, depth):
+                if depth < 2:
+                    return (0, 1)
+                self.root_move = (1, 0)
+                raise game_agent.SearchTimeout()
+
+        player = Interrupted()
+        game = isolation.Board(player, "Player2", 3, 3)
+        game.apply_move((2, 2))
+        game.apply_move((0, 0))
+        self.assertEqual(sorted(game.get_legal_moves()), [(0, 1), (1, 0)])
+        self.assertEqual(player.get_move(game, lambda: 100.), (1, 0))
+        self.assertEqual(player.stats[-1].source, "partial")
+        self.assertEqual(player.stats[-1].depth, 1)
+
+
 if __name__ == '__main__':
     unittest.main()
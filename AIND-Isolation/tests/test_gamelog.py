@@ -0,0 +1,130 @@
+"""Unit tests for the binary game logs."""
+
+import json
+import math
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import isolation
+import tournament
+from isolation.gamelog import GameLog, GameLogReader
+from game_agent import MinimaxPlayer
+from sample_players import RandomPlayer, improved_score
+
+
+class GameLogTest(unittest.TestCase):
+    """Games written to a log are read back move for move"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "games.log")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def play(self, log, seed, opening=2):
+        random.seed(seed)
+        player_1, player_2 = RandomPlayer(), RandomPlayer()
+        game = isolation.BitBoard(player_1, player_2)
+        moves = []
+        for _ in range(opening):
+            move = random.choice(game.get_legal_moves())
+            game.apply_move(move)
+            moves.append(move)
+        recorder = log.recorder(seed, ("Random_1", "Random_2"))
+        winner, history, termination = game.play(recorder=recorder)
+        moves.extend(tuple(m) for m in history)
+        return game, moves, 1 if winner is player_1 else 2, termination
+
+    def test_round_trip(self):
+        log = GameLog(self.path)
+        games = [self.play(log, seed) for seed in range(3)]
+        games.append(self.play(GameLog(self.path), 3, opening=0))
+
+        reader = GameLogReader(self.path)
+        self.assertEqual(len(reader), 4)
+        for i, (game, moves, winner, termination) in enumerate(games):
+            header = reader.header(i)
+            self.assertEqual((header.width, header.height), (7, 7))
+            self.assertEqual(header.winner, winner)
+            self.assertEqual(header.termination, termination)
+            self.assertEqual(header.seed, i)
+            self.assertEqual((header.player_1, header.player_2),
+                             ("Random_1", "Random_2"))
+            self.assertEqual(header.opening, 2 if i < 3 else 0)
+            self.assertEqual(reader.moves(i), moves)
+
+            times = [t for _, t in reader.plies(i)]
+            self.assertTrue(all(math.isnan(t) for t in times[:header.opening]))
+            self.assertTrue(all(0 <= t < header.time_limit
+                                for t in times[header.opening:]))
+
+            # the final board matches the game played
+            board = reader.board(i)
+            self.assertEqual(board.hash(), game.hash())
+            self.assertEqual(board.move_count, game.move_count)
+            board = reader.board(i, 5, isolation.BitBoard)
+            self.assertEqual(board.move_count, 5)
+
+            exported = json.loads(reader.isoviz(i))
+            self.assertEqual(exported["player1"], "Random_1")
+            self.assertEqual(exported["moves"], [list(m) for m in moves])
+        reader.close()
+
+    def test_invalid(self):
+        log = GameLog(self.path)
+        self.play(log, 0)
+        with open(self.path, "ab") as f:
+            f.write(b"GAME")
+        with self.assertRaises(ValueError):
+            GameLogReader(self.path)
+
+        other = os.path.join(self.dir, "other.log")
+        with open(other, "wb") as f:
+            f.write(b"not a log")
+        with self.assertRaises(ValueError):
+            GameLogReader(other)
+
+    def test_tournament(self):
+        """ Tournament games are logged with the agent names """
+        players = [RandomPlayer(), RandomPlayer()]
+        tournament.init_worker(players, log=self.path, names=["R1", "R2"])
+        try:
+            task = tournament.GameTask(1, 0, [(0, 0), (3, 3)], 42)
+            first_won, _, _ = tournament.play_game(task)
+        finally:
+            tournament.init_worker([])
+
+        reader = GameLogReader(self.path)
+        header = reader.header(0)
+        self.assertEqual((header.player_1, header.player_2), ("R2", "R1"))
+        self.assertEqual(header.seed, 42)
+        self.assertEqual(header.winner, 1 if first_won else 2)
+        self.assertEqual(reader.moves(0)[:2], [(0, 0), (3, 3)])
+        reader.close()
+
+    def test_replay(self):
+        """ A tournament game is replayed move for move """
+        # a fixed-depth search does not depend on the timing of the turns
+        players = [RandomPlayer(), MinimaxPlayer(search_depth=2,
+                                                 score_fn=improved_score)]
+        tasks = [tournament.GameTask(0, 1, [(1, 1), (5, 2)], 3),
+                 tournament.GameTask(1, 0, [(2, 2), (4, 6)], 4)]
+        tournament.init_worker(players, log=self.path)
+        try:
+            for task in tasks + tasks[:1]:
+                tournament.play_game(task)
+        finally:
+            tournament.init_worker([])
+
+        reader = GameLogReader(self.path)
+        self.assertEqual(reader.moves(0), reader.moves(2))
+        self.assertNotEqual(reader.moves(0), reader.moves(1))
+        reader.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
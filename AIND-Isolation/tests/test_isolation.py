@@ -0,0 +1,176 @@
+"""Unit tests for the in-place move support of the isolation boards."""
+
+import random
+import timeit
+import unittest
+
+import isolation
+import game_agent
+from sample_players import center_score
+
+
+class UndoMoveTest(unittest.TestCase):
+    """apply_move() followed by undo_move() restores the previous state"""
+
+    def setUp(self):
+        self.player1 = "Player1"
+        self.player2 = "Player2"
+
+    def snapshot(self, board):
+        return (board.to_string(), board.move_count, board.active_player,
+                sorted(board.get_legal_moves()),
+                board.get_player_location(board.active_player),
+                board.get_player_location(board.inactive_player))
+
+    def test_undo_restores_state(self):
+        rng = random.Random(0)
+        for cls in (isolation.Board, isolation.BitBoard):
+            board = cls(self.player1, self.player2)
+            history = [self.snapshot(board)]
+            moves = []
+            while board.get_legal_moves():
+                move = rng.choice(sorted(board.get_legal_moves()))
+                board.apply_move(move)
+                moves.append(move)
+                history.append(self.snapshot(board))
+            history.pop()
+            while history:
+                self.assertEqual(board.undo_move(), moves.pop())
+                self.assertEqual(self.snapshot(board), history.pop())
+            self.assertRaises(RuntimeError, board.undo_move)
+
+    def test_undo_on_copy(self):
+        for cls in (isolation.Board, isolation.BitBoard):
+            board = cls(self.player1, self.player2)
+            board.apply_move((3, 3))
+            board.apply_move((0, 0))
+            child = board.copy()
+            child.undo_move()
+            self.assertEqual(child.get_player_location(self.player2), None)
+            self.assertEqual(board.get_player_location(self.player2), (0, 0))
+
+    def test_search_leaves_board_unchanged(self):
+        for cls in (isolation.Board, isolation.BitBoard):
+            agent = game_agent.AlphaBetaPlayer()
+            board = cls(agent, self.player2)
+            board.apply_move((3, 3))
+            board.apply_move((2, 4))
+            before = self.snapshot(board)
+            start = timeit.default_timer()
+            agent.get_move(board, lambda: 100. - 1000 * (timeit.default_timer() - start))
+            self.assertEqual(self.snapshot(board), before)
+
+
+class ClockTest(unittest.TestCase):
+    """Turns can be timed with the wall clock or with thread CPU time"""
+
+    def test_calibrate(self):
+        for name in isolation.CLOCKS:
+            stats = isolation.calibrate(name, samples=20)
+            self.assertEqual(stats.name, name)
+            self.assertGreaterEqual(stats.worst, 0)
+        self.assertRaises(ValueError, isolation.get_clock, "sundial")
+
+    def test_play_with_cpu_clock(self):
+        from sample_players import GreedyPlayer
+        player1, player2 = GreedyPlayer(), GreedyPlayer()
+        board = isolation.BitBoard(player1, player2, 5, 5)
+        winner, history, termination = board.play(
+            clock=isolation.get_clock("cpu"))
+        self.assertIn(winner, (player1, player2))
+        self.assertEqual(termination, "illegal move")
+
+
+class EvalContextTest(unittest.TestCase):
+    """eval_context() agrees with the individual board queries"""
+
+    def test_random_games(self):
+        rng = random.Random(1)
+        for cls in (isolation.Board, isolation.BitBoard):
+            for _ in range(20):
+                board = cls("Player1", "Player2", 5, 6)
+                while True:
+                    for player in ("Player1", "Player2"):
+                        opp = board.get_opponent(player)
+                        ctx = board.eval_context(player)
+                        self.assertEqual(ctx, isolation.EvalContext(
+                            len(board.get_legal_moves(player)),
+                            len(board.get_legal_moves(opp)),
+                            board.get_player_location(player),
+                            board.get_player_location(opp),
+                            board.utility(player)))
+                    moves = sorted(board.get_legal_moves())
+                    if not moves:
+                        break
+                    board.apply_move(rng.choice(moves))
+
+    def test_center_score(self):
+        """ center_score gives the values of its original board queries """
+        def original(game, player):
+            if game.is_loser(player):
+                return float("-inf")
+            if game.is_winner(player):
+                return float("inf")
+            w, h = game.width / 2., game.height / 2.
+            y, x = game.get_player_location(player)
+            return float((h - y)**2 + (w - x)**2)
+
+        rng = random.Random(2)
+        for cls in (isolation.Board, isolation.BitBoard):
+            for _ in range(10):
+                board = cls("Player1", "Player2", 7, 6)
+                for move in rng.sample(board.get_blank_spaces(), 2):
+                    board.apply_move(move)
+                while True:
+                    for player in ("Player1", "Player2"):
+                        self.assertEqual(center_score(board, player),
+                                         original(board, player))
+                    moves = sorted(board.get_legal_moves())
+                    if not moves:
+                        break
+                    board.apply_move(rng.choice(moves))
+
+
+class SeedTest(unittest.TestCase):
+    """Seeded boards shuffle moves and reseed agents reproducibly"""
+
+    def test_shuffle(self):
+        for cls in (isolation.Board, isolation.BitBoard):
+            orders = []
+            for _ in range(2):
+                board = cls("Player1", "Player2", seed=7)
+                board.apply_move((3, 3))
+                board.apply_move((0, 0))
+                copy = board.copy()
+                self.assertEqual(copy.seed, 7)
+                orders.append([board.get_legal_moves(), copy.get_legal_moves()])
+            self.assertEqual(orders[0], orders[1])
+
+    def test_turns(self):
+        """ The choices of a turn only depend on the seed and the ply """
+
+        class Recorder:
+            def __init__(self):
+                self.rng = random.Random()
+                self.draws = []
+
+            def get_move(self, game, time_left):
+                self.draws.append((game.move_count, self.rng.random(),
+                                   game.get_legal_moves()))
+                moves = game.get_legal_moves(shuffle=False)
+                return moves[0] if moves else (-1, -1)
+
+        draws = []
+        for noise in (0, 5):
+            player_1, player_2 = Recorder(), Recorder()
+            for _ in range(noise):
+                player_1.rng.random()
+            game = isolation.BitBoard(player_1, player_2, seed=11)
+            game.play(time_limit=1000)
+            draws.append(player_1.draws + player_2.draws)
+        self.assertEqual(draws[0], draws[1])
+        self.assertNotEqual(draws[0][0][1], draws[0][1][1])
+
+
+if __name__ == '__main__':
+    unittest.main()
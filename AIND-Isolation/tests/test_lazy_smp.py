@@ -0,0 +1,162 @@
+"""Unit tests for the Lazy SMP parallel search."""
+
+import random
+import timeit
+import unittest
+
+import isolation
+import lazy_smp
+from game_agent import AlphaBetaPlayer, TranspositionTable, custom_score
+from sample_players import RandomPlayer
+
+from tests.helpers import random_games
+
+
+class SharedTableTest(unittest.TestCase):
+    """Compare the shared transposition table with the in-process table"""
+
+    def test_entries(self):
+        shared = lazy_smp.SharedTranspositionTable(8)
+        local = TranspositionTable(8)
+        ops = [(0, 3, TranspositionTable.EXACT, 1.5, (2, 3)),
+               (8, 1, TranspositionTable.LOWER, float("inf"), (-1, -1)),
+               (8, 4, TranspositionTable.UPPER, -2.25, (6, 0)),
+               (8, 2, TranspositionTable.EXACT, 0., None),
+               (5, 0, TranspositionTable.EXACT, float("-inf"), (0, 6))]
+        for table in (shared, local):
+            self.assertIsNone(table.get(0))
+            for op in ops:
+                table.store(*op)
+            table.new_search()
+            table.store(13, 0, TranspositionTable.EXACT, 3., (1, 1))
+        for key in (0, 5, 8, 13, 16):
+            self.assertEqual(shared.get(key), local.get(key))
+        shared.clear()
+        self.assertIsNone(shared.get(13))
+
+    def test_torn_entry(self):
+        """ Entries with inconsistent words are ignored """
+        table = lazy_smp.SharedTranspositionTable(4)
+        table.store(6, 2, TranspositionTable.EXACT, 1., (1, 2))
+        self.assertIsNotNone(table.get(6))
+        table._words[3 * 2 + 2] ^= 1
+        self.assertIsNone(table.get(6))
+
+
+class LazySMPTest(unittest.TestCase):
+    """Test the Lazy SMP player"""
+
+    def test_search(self):
+        """ Without helpers the search is the alpha-beta search """
+        for game in random_games(3, 3):
+            results = []
+            for cls in (AlphaBetaPlayer, lazy_smp.LazySMPPlayer):
+                kwargs = {"helpers": 0} if cls is lazy_smp.LazySMPPlayer else {}
+                player = cls(score_fn=custom_score, **kwargs)
+                player.time_left = lambda: 1e9
+                board = isolation.BitBoard(player, "Player2")
+                if game.move_count % 2:
+                    board = isolation.BitBoard("Player2", player)
+                for m in lazy_smp.replay_moves(game):
+                    board.apply_move(m)
+                results.append(player.alphabeta(board, 4))
+            self.assertEqual(results[0], results[1])
+
+    def test_helpers(self):
+        player = lazy_smp.LazySMPPlayer(helpers=2)
+        try:
+            for game in random_games(3, 4):
+                board = isolation.BitBoard(player, "Player2")
+                if game.move_count % 2:
+                    board = isolation.BitBoard("Player2", player)
+                for m in lazy_smp.replay_moves(game):
+                    board.apply_move(m)
+                start = timeit.default_timer()
+
+                def time_left():
+                    return 150 - 1000 * (timeit.default_timer() - start)
+
+                move = player.get_move(board, time_left)
+                self.assertIn(move, board.get_legal_moves())
+                self.assertGreater(time_left(), 0)
+                self.assertIn(player.stats[-1].source,
+                              ("search", "partial", "helper", "endgame"))
+            self.assertEqual(len(player._processes), 2)
+        finally:
+            player.close()
+        self.assertFalse(player._processes)
+
+    def test_cpu_clock(self):
+        """ Under the CPU clock the helpers' CPU time is charged to the turn
+        """
+        player = lazy_smp.LazySMPPlayer(helpers=2, clock="cpu")
+        clock = isolation.get_clock("cpu")
+        try:
+            for game in random_games(2, 5):
+                board = isolation.BitBoard(player, "Player2")
+                if game.move_count % 2:
+                    board = isolation.BitBoard("Player2", player)
+                for m in lazy_smp.replay_moves(game):
+                    board.apply_move(m)
+                start = clock()
+
+                def time_left():
+                    return 150 - 1000 * (clock() - start)
+
+                move = player.get_move(board, time_left)
+                self.assertIn(move, board.get_legal_moves())
+                used = 1000 * (clock() - start + sum(player._spent[:2]))
+                self.assertLess(used, 150)
+        finally:
+            player.close()
+
+    def test_ponder(self):
+        """ The helpers search the opponent replies between the turns """
+        player = lazy_smp.LazySMPPlayer(helpers=1, pondering=True)
+        try:
+            # few blank squares, so that the helper completes its search
+            board = isolation.BitBoard("Player2", player, 5, 5)
+            rng = random.Random(6)
+            while (board.move_count < 14 or board.active_player is player or
+                   not board.get_legal_moves()):
+                moves = sorted(board.get_legal_moves())
+                if not moves:
+                    board = isolation.BitBoard("Player2", player, 5, 5)
+                    continue
+                board.apply_move(rng.choice(moves))
+            player.ponder(board.copy())
+            player.close(wait=True)
+
+            # the positions after the replies are in the shared table
+            replies = board.get_legal_moves()
+            for reply in replies:
+                board.apply_move(reply)
+                self.assertIsNotNone(
+                    player.tt.get(player.position_key(board)[0]))
+                board.undo_move()
+
+            board.apply_move(replies[0])
+            start = timeit.default_timer()
+
+            def time_left():
+                return 150 - 1000 * (timeit.default_timer() - start)
+
+            move = player.get_move(board, time_left)
+            self.assertIn(move, board.get_legal_moves())
+            self.assertGreater(time_left(), 0)
+            player.ponder(None)
+            self.assertEqual(player._active.value, 0)
+        finally:
+            player.close()
+
+    def test_play(self):
+        """ Pondering players are asked to ponder between the turns """
+        # more helpers than replies near the end of the game
+        player = lazy_smp.LazySMPPlayer(helpers=2, pondering=True)
+        try:
+            winner, history, _ = isolation.BitBoard(
+                player, RandomPlayer(), 5, 5).play(time_limit=150)
+            self.assertTrue(history)
+            self.assertEqual(player._active.value, 0)
+        finally:
+            player.close()
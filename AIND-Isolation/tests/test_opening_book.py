@@ -0,0 +1,223 @@
+"""Unit tests for board symmetries and opening books."""
+
+import os
+import random
+import tempfile
+import unittest
+
+import isolation
+from isolation.symmetry import (canonical_hash, image_hashes, is_symmetric,
+                                symmetries, transform_move, inverse_move)
+
+import batch_eval
+import fit_eval
+import opening_book
+from game_agent import (AlphaBetaPlayer, MinimaxPlayer, custom_score,
+                        custom_score_2, custom_score_3, custom_score_4,
+                        custom_score_5, custom_score_6)
+from sample_players import (center_score, improved_score, null_score,
+                            open_move_score)
+
+
+class RecordingBoard(isolation.Board):
+    """Board that remembers the moves applied to it. """
+
+    def __init__(self, *args, **kwargs):
+        isolation.Board.__init__(self, *args, **kwargs)
+        self.moves = []
+
+    def apply_move(self, move):
+        self.moves.append(move)
+        isolation.Board.apply_move(self, move)
+
+
+def transformed(game, sym):
+    """Replay the moves of `game` mapped by symmetry `sym` on a new board. """
+    image = RecordingBoard("Player1", "Player2", game.width, game.height)
+    for move in game.moves:
+        image.apply_move(transform_move(move, sym, game.width, game.height))
+    return image
+
+
+class SymmetryTest(unittest.TestCase):
+    """Test the board symmetries and canonical hashes"""
+
+    def test_permutations(self):
+        for width, height, count in ((7, 7, 8), (5, 6, 4)):
+            forward, inverse = symmetries(width, height)
+            self.assertEqual(len(forward), count)
+            self.assertEqual(forward[0], tuple(range(width * height)))
+            for perm, inv in zip(forward, inverse):
+                self.assertEqual(sorted(perm), list(range(width * height)))
+                for idx in range(width * height):
+                    self.assertEqual(inv[perm[idx]], idx)
+            move = (1, 3)
+            for sym in range(count):
+                image = transform_move(move, sym, width, height)
+                self.assertEqual(inverse_move(image, sym, width, height), move)
+
+    def test_canonical_hash(self):
+        """ Symmetric positions share the canonical hash """
+        rng = random.Random(0)
+        for width, height in ((7, 7), (5, 6)):
+            game = RecordingBoard("Player1", "Player2", width, height)
+            for _ in range(6):
+                game.apply_move(rng.choice(sorted(game.get_legal_moves())))
+                self.assertEqual(image_hashes(game)[0], game.hash())
+                key, sym = canonical_hash(game)
+                for k in range(len(symmetries(width, height)[0])):
+                    image = transformed(game, k)
+                    self.assertEqual(canonical_hash(image)[0], key)
+                    self.assertEqual(len(image.get_legal_moves()),
+                                     len(game.get_legal_moves()))
+
+    def test_transposition_table(self):
+        """ Symmetric positions share search results, with mapped moves """
+        player = AlphaBetaPlayer()
+        player.time_left = lambda: 1e9
+        moves = [(3, 3), (0, 1)]
+        game = opening_book.replay(moves, player=player)
+        player.alphabeta(game, 4)
+        hit, key, move = player.probe(game, float("-inf"), float("inf"), 4)
+        self.assertIsNotNone(hit)
+        for sym in range(8):
+            image = opening_book.replay(
+                [transform_move(m, sym, 7, 7) for m in moves], player=player)
+            image_hit, image_key, image_move = player.probe(
+                image, float("-inf"), float("inf"), 4)
+            self.assertEqual(image_key[0], key[0])
+            self.assertEqual(image_hit[0], hit[0])
+            self.assertEqual(image_move, transform_move(move, sym, 7, 7))
+
+    def test_symmetric_scores(self):
+        """ Heuristics declared symmetric score all the images alike """
+        linear = fit_eval.LinearScore(dict((name, 1.) for name in
+                                           fit_eval.FEATURES))
+        scores = [null_score, open_move_score, improved_score, custom_score,
+                  custom_score_2, custom_score_4, custom_score_5,
+                  custom_score_6, linear]
+        batch_scores = [batch_eval.improved_score, batch_eval.open_move_score,
+                        batch_eval.custom_score, batch_eval.custom_score_5]
+        for score_fn in scores + batch_scores:
+            self.assertTrue(is_symmetric(score_fn))
+
+        rng = random.Random(1)
+        for width, height in ((7, 7), (5, 6)):
+            # the lookahead heuristic applies and undoes moves, so the moves
+            # played are not taken from a RecordingBoard
+            game = isolation.Board("Player1", "Player2", width, height)
+            played = []
+            for _ in range(8):
+                moves = sorted(game.get_legal_moves())
+                if not moves:
+                    break
+                played.append(rng.choice(moves))
+                game.apply_move(played[-1])
+                if game.move_count < 2:
+                    continue
+                moves = game.get_legal_moves(shuffle=False)
+                for k in range(len(symmetries(width, height)[0])):
+                    image = isolation.Board("Player1", "Player2", width,
+                                            height)
+                    for move in played:
+                        image.apply_move(transform_move(move, k, width,
+                                                        height))
+                    for player in ("Player1", "Player2"):
+                        for score_fn in scores:
+                            self.assertAlmostEqual(score_fn(image, player),
+                                                   score_fn(game, player))
+                        if not moves:
+                            continue
+                        image_moves = [transform_move(m, k, width, height)
+                                       for m in moves]
+                        for batch_fn in batch_scores:
+                            self.assertEqual(
+                                batch_fn(image, image_moves, player),
+                                batch_fn(game, moves, player))
+
+    def test_asymmetric_scores(self):
+        """ Heuristics measuring distances to the point (w/2, h/2) are not
+        symmetric, so their positions are keyed by their own hash """
+        game = RecordingBoard("Player1", "Player2")
+        for move in [(0, 1), (3, 3), (2, 2)]:
+            game.apply_move(move)
+        image = transformed(game, 1)
+        for score_fn in (center_score, custom_score_3):
+            self.assertFalse(is_symmetric(score_fn))
+            self.assertNotEqual(score_fn(image, "Player1"),
+                                score_fn(game, "Player1"))
+            player = AlphaBetaPlayer(score_fn=score_fn)
+            self.assertEqual(player.position_key(game)[1], 0)
+            self.assertNotEqual(player.position_key(image)[0],
+                                player.position_key(game)[0])
+        player = AlphaBetaPlayer(score_fn=custom_score)
+        self.assertEqual(player.position_key(image)[0],
+                         player.position_key(game)[0])
+        self.assertEqual(AlphaBetaPlayer(score_fn=custom_score,
+                                         batch_fn=lambda *args: []
+                                         ).canonical_plies, 0)
+
+
+class OpeningBookTest(unittest.TestCase):
+    """Test building, saving and consulting opening books"""
+
+    def test_positions(self):
+        """ The empty board and one board per class of first moves """
+        positions = opening_book.opening_positions(2, 5, 5)
+        self.assertEqual(positions[0], [])
+        self.assertEqual(len(positions), 1 + 6)
+        classes = set(frozenset(transform_move(moves[0], k, 5, 5)
+                                for k in range(8)) for moves in positions[1:])
+        self.assertEqual(len(classes), 6)
+        self.assertEqual(len(set().union(*classes)), 25)
+
+    def test_lookup(self):
+        """ Book moves are mapped back through the symmetries """
+        book = opening_book.OpeningBook(7, 7, 3)
+        game = opening_book.replay([(0, 1), (3, 3)])
+        book.add(game, (2, 2))
+        for sym in range(8):
+            moves = [transform_move(m, sym, 7, 7) for m in ((0, 1), (3, 3))]
+            image = opening_book.replay(moves)
+            self.assertEqual(book.lookup(image),
+                             transform_move((2, 2), sym, 7, 7))
+        # positions beyond the book are not looked up
+        game.apply_move((2, 2))
+        self.assertIsNone(book.lookup(game))
+
+    def test_unreachable_move(self):
+        """ A blank cell the active player cannot reach is not returned """
+        book = opening_book.OpeningBook(7, 7, 3)
+        game = opening_book.replay([(0, 1), (3, 3)])
+        book.add(game, (6, 6))
+        self.assertTrue(game.move_is_legal((6, 6)))
+        self.assertIsNone(book.lookup(game))
+
+    def test_save_load(self):
+        book = opening_book.build(plies=2, time_limit=20, width=5, height=5)
+        self.assertEqual(len(book), 1 + 6)
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            book.save(path)
+            self.assertEqual(os.path.getsize(path), 12 + 9 * len(book))
+            loaded = opening_book.OpeningBook.load(path)
+        finally:
+            os.remove(path)
+        self.assertEqual((loaded.width, loaded.height, loaded.plies), (5, 5, 2))
+        self.assertEqual(loaded.entries, book.entries)
+
+    def test_empty_board(self):
+        """ The first move is searched although no player is placed """
+        book = opening_book.build(plies=1, time_limit=100)
+        self.assertEqual(len(book), 1)
+        game = opening_book.replay([])
+        self.assertIn(book.lookup(game), game.get_legal_moves())
+
+    def test_players(self):
+        """ Players return book moves without searching """
+        book = opening_book.OpeningBook(7, 7, 3)
+        book.add(opening_book.replay([]), (0, 0))
+        for player in (MinimaxPlayer(book=book), AlphaBetaPlayer(book=book)):
+            game = isolation.Board(player, "Player2")
+            self.assertEqual(player.get_move(game, lambda: 0.), (0, 0))
@@ -0,0 +1,107 @@
+"""Unit tests for the Bradley-Terry ratings engine."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import ratings
+from sample_players import RandomPlayer
+
+
+class RatingsTest(unittest.TestCase):
+    """Test the results store, the solver and the schedules"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "results.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def add_games(self, store, a, b, wins_a, wins_b):
+        for i in range(wins_a + wins_b):
+            winner = a if i < wins_a else b
+            players = (a, b) if i % 2 else (b, a)
+            store.add({"player_1": players[0], "player_2": players[1],
+                       "winner": winner, "termination": "no moves",
+                       "opening": [], "seed": i})
+
+    def test_bradley_terry(self):
+        """ The solver recovers the strengths of simulated agents """
+        rng = np.random.RandomState(0)
+        strength = np.array([4., 2., 1., .5])
+        strength /= np.exp(np.log(strength).mean())
+        wins = np.zeros((4, 4))
+        for i in range(4):
+            for j in range(i + 1, 4):
+                won = rng.binomial(2000, strength[i] / (strength[i] + strength[j]))
+                wins[i, j], wins[j, i] = won, 2000 - won
+        fitted = ratings.bradley_terry(wins)
+        self.assertTrue(np.allclose(np.log(fitted), np.log(strength), atol=.1))
+        self.assertAlmostEqual(np.log(fitted).mean(), 0.)
+
+        warm = ratings.bradley_terry(wins, initial=fitted, max_iterations=2)
+        self.assertTrue(np.allclose(warm, fitted))
+
+    def test_rate(self):
+        store = ratings.ResultsStore(self.path)
+        self.add_games(store, "A", "B", 30, 10)
+        self.add_games(store, "B", "C", 20, 20)
+        self.add_games(store, "A", "C", 40, 0)
+        rated = ratings.rate(store)
+        self.assertEqual(sorted(rated), ["A", "B", "C"])
+        self.assertGreater(rated["A"].elo, rated["B"].elo)
+        self.assertAlmostEqual(sum(r.elo for r in rated.values()), 0.)
+        self.assertEqual(rated["A"].games, 80)
+        self.assertAlmostEqual(rated["A"].score, 70. / 80)
+        self.assertTrue(all(0 < r.error < 200 for r in rated.values()))
+
+        # the store is read back from the file
+        self.assertEqual(len(ratings.ResultsStore(self.path)), 120)
+
+    def test_round_robin(self):
+        """ Only the pairings missing from the store are scheduled """
+        store = ratings.ResultsStore(self.path)
+        self.add_games(store, "A", "B", 3, 3)
+        pending = ratings.round_robin(store, ["A", "B"], 3)
+        self.assertEqual(pending, [])
+        pending = ratings.round_robin(store, ["A", "B", "C"], 3)
+        self.assertEqual(sorted(pending), [("A", "C")] * 3 + [("B", "C")] * 3)
+
+    def test_swiss(self):
+        store = ratings.ResultsStore(self.path)
+        self.add_games(store, "A", "B", 10, 0)
+        self.add_games(store, "C", "D", 10, 0)
+        self.add_games(store, "A", "C", 5, 5)
+        rated = ratings.rate(store)
+        pairings = ratings.swiss_pairings(store, list("ABCD"), rated)
+        # A and C are the closest in rating but met already
+        self.assertEqual(len(pairings), 2)
+        self.assertNotIn(("A", "C"), pairings)
+        self.assertEqual(sorted(sum(pairings, ())), list("ABCD"))
+
+    def test_main(self):
+        """ Results are stored, and adding an agent plays only its games """
+        registry = {"R1": RandomPlayer, "R2": RandomPlayer, "R3": RandomPlayer}
+        ratings.main(self.path, ["R1", "R2"], pairs=2, seed=1,
+                     registry=registry)
+        self.assertEqual(len(ratings.ResultsStore(self.path)), 4)
+        rated = ratings.main(self.path, ["R1", "R2", "R3"], pairs=2, seed=1,
+                             registry=registry)
+        store = ratings.ResultsStore(self.path)
+        self.assertEqual(len(store), 12)
+        self.assertEqual(store.pairs("R1", "R2"), 2)
+        self.assertEqual(sum(r.games for r in rated.values()), 24)
+
+        rated = ratings.main(self.path, swiss=1, seed=2, registry=registry)
+        self.assertEqual(len(ratings.ResultsStore(self.path)), 14)
+
+        with self.assertRaises(ValueError):
+            ratings.main(self.path, ["R4"], registry=registry)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+"""Unit tests for the retrograde database of small boards."""
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import retrograde
+from isolation import Board
+from game_agent import AlphaBetaPlayer
+from sample_players import RandomPlayer
+
+
+def negamax_distance(game):
+    """Distance to the end of a game with perfect play, by plain search. """
+    distance = None
+    for move in game.get_legal_moves():
+        distance = retrograde._best(distance,
+                                    negamax_distance(game.forecast_move(move)))
+    return distance or 0
+
+
+class RetrogradeTest(unittest.TestCase):
+    """Test the solutions of small boards"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.db = retrograde.solve(4, 3)
+
+    def random_positions(self, count, rng):
+        for _ in range(count):
+            game = Board("Player1", "Player2", 4, 3)
+            moves = game.get_legal_moves()
+            while moves:
+                game.apply_move(rng.choice(moves))
+                yield game
+                moves = game.get_legal_moves()
+
+    def test_distance(self):
+        """ The database agrees with a full search """
+        rng = random.Random(0)
+        for game in self.random_positions(20, rng):
+            if game.move_count >= 4:
+                self.assertEqual(self.db.distance(game),
+                                 negamax_distance(game))
+
+        game = Board("Player1", "Player2", 3, 3)
+        db = retrograde.solve(3, 3)
+        self.assertEqual(db.distance(game), negamax_distance(game))
+        self.assertEqual(db.value(game), -1)
+
+    def test_save_load(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, "db.bin")
+            self.db.save(path)
+            loaded = retrograde.Database.load(path)
+            self.assertEqual((loaded.width, loaded.height), (4, 3))
+            self.assertEqual(list(loaded.keys), list(self.db.keys))
+            self.assertEqual(list(loaded.distances), list(self.db.distances))
+            with open(path, "ab") as f:
+                f.write(b"\0")
+            with self.assertRaises(ValueError):
+                retrograde.Database.load(path)
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_best_move(self):
+        """ The oracle wins every position it is given as won """
+        rng = random.Random(1)
+        for start in self.random_positions(10, rng):
+            if start.move_count < 2 or self.db.value(start) != 1:
+                continue
+            game = start.copy()
+            winner = game.active_player
+            while game.get_legal_moves():
+                if game.active_player is winner:
+                    move = self.db.best_move(game)
+                else:
+                    move = rng.choice(game.get_legal_moves())
+                game.apply_move(move)
+            self.assertIsNot(game.active_player, winner)
+
+    def test_oracle_score(self):
+        """ An agent consulting the database at the leaves plays perfectly """
+        score = retrograde.OracleScore(self.db)
+        rng = random.Random(2)
+        for _ in range(10):
+            oracle = AlphaBetaPlayer(search_depth=1, score_fn=score)
+            game = Board(RandomPlayer(), oracle, 4, 3)
+            game.apply_move(rng.choice(game.get_legal_moves()))
+            game.apply_move(rng.choice(game.get_legal_moves()))
+            if self.db.value(game) == 1:
+                continue
+            winner, _, _ = game.play(time_limit=1000)
+            self.assertIs(winner, oracle)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+"""Unit tests for the self-play data generator."""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import selfplay
+from isolation.symmetry import canonical_hash
+
+
+class SelfPlayTest(unittest.TestCase):
+    """Test generating and reading self-play files"""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_records(self):
+        """ Records replay as legal games with consistent outcomes """
+        count = selfplay.generate(self.path, 12, ("random", "greedy"),
+                                  width=5, height=5, seed=1)
+        data = selfplay.load(self.path)
+        self.assertEqual((data.width, data.height), (5, 5))
+        self.assertEqual(len(data.records), count)
+        self.assertEqual(os.path.getsize(self.path),
+                         8 + count * selfplay.RECORD.itemsize)
+        self.assertEqual(sorted(set(data.records["game"])), list(range(12)))
+
+        for game_id in range(12):
+            records = data.records[data.records["game"] == game_id]
+            self.assertEqual(list(records["ply"]), list(range(len(records))))
+            game = selfplay.position(records[0], 5, 5)
+            for record in records:
+                expected = selfplay.position(record, 5, 5)
+                self.assertEqual(game.hash(), expected.hash())
+                self.assertEqual(canonical_hash(game), canonical_hash(expected))
+                self.assertEqual(sorted(game.get_legal_moves()),
+                                 sorted(expected.get_legal_moves()))
+                move = (int(record["move"]) % 5, int(record["move"]) // 5)
+                self.assertTrue(game.move_is_legal(move))
+                game.apply_move(move)
+            self.assertFalse(game.get_legal_moves())
+            # the player to move last lost; outcomes alternate
+            self.assertEqual(records["outcome"][-1], 1)
+            self.assertTrue(np.all(records["outcome"][1:] ==
+                                   -records["outcome"][:-1]))
+
+    def test_workers(self):
+        """ Files do not depend on the number of processes """
+        selfplay.GAMES_PER_TASK, saved = 3, selfplay.GAMES_PER_TASK
+        try:
+            selfplay.generate(self.path, 7, ("search2", "search2"),
+                              width=5, height=5)
+            single = selfplay.load(self.path).records.copy()
+            selfplay.generate(self.path, 7, ("search2", "search2"),
+                              width=5, height=5, workers=2)
+            parallel = selfplay.load(self.path).records
+        finally:
+            selfplay.GAMES_PER_TASK = saved
+        self.assertTrue(np.array_equal(single, parallel))
+
+    def test_agents(self):
+        self.assertIsInstance(selfplay.make_agent("search3:improved"),
+                              selfplay.SearchAgent)
+        for spec in ("minimax", "search", "greedy:unknown", "random:custom"):
+            self.assertRaises(ValueError, selfplay.make_agent, spec)
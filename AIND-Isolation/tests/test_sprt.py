@@ -0,0 +1,74 @@
+"""Unit tests for the sequential tests of tournament matchups."""
+
+import random
+import unittest
+
+import sprt
+
+
+def run(comparison, win_rate, rng, max_pairs=10000):
+    """Add simulated game pairs until the comparison is decided. """
+    while comparison.decision() is None and comparison.count < max_pairs:
+        comparison.add((rng.random() < win_rate) + (rng.random() < win_rate))
+    return comparison.decision()
+
+
+class SPRTTest(unittest.TestCase):
+    """Test the sequential probability ratio tests"""
+
+    def test_elo(self):
+        self.assertAlmostEqual(sprt.elo_to_score(0.), 0.5)
+        for elo in (-300., -20., 35., 400.):
+            self.assertAlmostEqual(sprt.score_to_elo(sprt.elo_to_score(elo)),
+                                   elo)
+
+    def test_llr(self):
+        test = sprt.SPRT(0., 50., min_samples=1)
+        for score in (1., .5, .5, 0., 1.):
+            test.add(score)
+        mean, var = .6, .14
+        s0, s1 = .5, sprt.elo_to_score(50.)
+        self.assertAlmostEqual(test.llr(),
+                               5 * (s1 - s0) * (2 * mean - s0 - s1) / (2 * var))
+        self.assertIsNone(test.status())
+
+    def test_min_samples(self):
+        """ A few identical results do not decide a test """
+        comparison = sprt.Comparison(30.)
+        for _ in range(7):
+            comparison.add(2)
+        self.assertIsNone(comparison.decision())
+        comparison.add(2)
+        self.assertEqual(comparison.decision(), "stronger")
+        self.assertEqual(comparison.pairs, [0, 0, 8])
+
+    def test_sticky(self):
+        """ A decision is kept when later pairs move the ratio back """
+        comparison = sprt.Comparison(30.)
+        for _ in range(8):
+            comparison.add(2)
+        self.assertEqual(comparison.decision(), "stronger")
+        self.assertEqual(comparison.worse.status(), "H0")
+        for _ in range(8):
+            comparison.add(0)
+        better, worse = comparison.better, comparison.worse
+        self.assertLess(better.llr(), better.upper)
+        self.assertGreater(worse.llr(), worse.lower)
+        self.assertEqual(better.status(), "H1")
+        self.assertEqual(worse.status(), "H0")
+        self.assertEqual(comparison.decision(), "stronger")
+
+    def test_decisions(self):
+        rng = random.Random(0)
+        # each one-sided test errs with probability alpha = 0.05
+        for win_rate, expected, least in ((.75, "stronger", 19),
+                                          (.25, "weaker", 19),
+                                          (.5, "equivalent", 15)):
+            decisions = [run(sprt.Comparison(100.), win_rate, rng)
+                         for _ in range(20)]
+            self.assertGreaterEqual(decisions.count(expected), least)
+        # clear differences are decided quickly
+        comparison = sprt.Comparison(50.)
+        run(comparison, .8, rng)
+        self.assertLess(comparison.count, 40)
+        self.assertGreater(comparison.elo(), 100)
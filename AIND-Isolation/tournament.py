@@ -11,24 +11,34 @@ players, and the players play each match twice -- once as the first player and
 once as the second player.  Randomizing the openings and switching the player
 order corrects for imbalances due to both starting position and initiative.
 """
+import argparse
+import csv
+import gc
 import itertools
+import json
+import multiprocessing
 import random
 import warnings
 import numpy as np
 
 from collections import namedtuple, defaultdict
 
-from isolation import Board
+from isolation import BitBoard, calibrate, get_clock
+from isolation.gamelog import GameLog
 from sample_players import (RandomPlayer, open_move_score,
                             improved_score, center_score)
-from game_agent import (MinimaxPlayer, AlphaBetaPlayer, custom_score,
-                        custom_score_2, custom_score_3, custom_score_4,
-                        custom_score_5, custom_score_6)
+from opening_book import OpeningBook
+from sprt import Comparison
+from game_agent import (MinimaxPlayer, AlphaBetaPlayer, PVSPlayer, MoveStats,
+                        custom_score, custom_score_2, custom_score_3,
+                        custom_score_4, custom_score_5, custom_score_6)
 from scipy.stats import ttest_ind
 
 NUM_REPEATS = 20
 NUM_MATCHES = 10  # number of matches against each opponent
 TIME_LIMIT = 150  # number of milliseconds before timeout
+SPRT_ALPHA = 0.05  # error rates of the sequential tests (see sprt.py)
+SPRT_BETA = 0.05
 
 DESCRIPTION = """
 This script evaluates the performance of the custom_score evaluation
@@ -40,48 +50,262 @@ game_agent.py.
 
 Agent = namedtuple("Agent", ["player", "name"])
 
+# A single game to play: the indices of both players in the registered player
+# list, the opening moves to apply before play starts, and the random seed
+GameTask = namedtuple("GameTask", ["player_1", "player_2", "opening", "seed"])
 
-def play_round(cpu_agent, test_agents, win_counts, num_matches):
+# Players that GameTask indices refer to, the name of the clock timing their
+# turns, and the game log with the names of the players; registered once per
+# process
+_players = []
+_clock = "wall"
+_log = None
+_names = None
+
+
+def init_worker(players, clock="wall", log=None, names=None):
+    """Register the list of players referenced by GameTask indices and the
+    clock used to time their turns. This is the initializer of every worker
+    process in parallel tournaments.
+
+    If `log` is the path of a game log (see `isolation.gamelog`), every game
+    played is appended to it, with the player names listed in `names`.
+
+    Players with a `clock` attribute (e.g. `lazy_smp.LazySMPPlayer`, which
+    times its helper processes) get the name of the clock.
+    """
+    global _players, _clock, _log, _names
+    _players = players
+    _clock = clock
+    for player in players:
+        if hasattr(player, "clock"):
+            player.clock = clock
+    _log = GameLog(log) if log else None
+    _names = names
+
+    # exclude everything allocated so far (e.g., the numpy and scipy modules)
+    # from garbage collection, so full collections during a turn stay short
+    if hasattr(gc, "freeze"):
+        gc.freeze()
+
+
+def play_game(task):
+    """Play the game described by a GameTask in the current process.
+
+    The board is seeded with the seed of the task (see `Board.play()`) and
+    the agents forget their previous games (see
+    `AlphaBetaPlayer.new_game()`), so the random choices of a game only
+    depend on its task: a game can be replayed on its own, e.g. under a
+    profiler, by registering the same players and playing its task again.
+
+    Returns
+    -------
+    (bool, str, list<list<MoveStats>>)
+        True if player 1 won the game (False otherwise), the reason the
+        game ended as returned by `Board.play()`, and the search statistics
+        of the moves of each player (empty for players without `stats`).
+    """
+    random.seed(task.seed)
+    player_1 = _players[task.player_1]
+    player_2 = _players[task.player_2]
+    for player in (player_1, player_2):
+        if hasattr(player, "stats"):
+            player.stats = []
+        if hasattr(player, "new_game"):
+            player.new_game()
+    game = BitBoard(player_1, player_2, seed=task.seed)
+    for move in task.opening:
+        game.apply_move(move)
+    recorder = None
+    if _log is not None:
+        names = None
+        if _names:
+            names = _names[task.player_1], _names[task.player_2]
+        recorder = _log.recorder(task.seed, names)
+    winner, _, termination = game.play(time_limit=TIME_LIMIT,
+                                       clock=get_clock(_clock),
+                                       recorder=recorder)
+    stats = [getattr(player, "stats", []) for player in (player_1, player_2)]
+    return winner is player_1, termination, stats
+
+
+def report_clock(clock, pool=None, workers=1):
+    """Calibrate the clock used to time turns and print its overhead and
+    jitter. The calibration runs concurrently in the `workers` processes of
+    `pool` (if given) so that it reflects the load of a parallel tournament.
+    """
+    if pool:
+        stats = pool.map(calibrate, [clock] * workers)
+    else:
+        stats = [calibrate(clock)]
+    print("{:^74}".format("{} clock: overhead {:.4f} ms, resolution {:.4f} ms".format(
+        clock, max(s.overhead for s in stats), max(s.resolution for s in stats))))
+    print("{:^74}".format("jitter {:.3f} ms, worst delay {:.3f} ms".format(
+        max(s.jitter for s in stats), max(s.worst for s in stats))))
+
+
+def random_opening(rng=random):
+    """Return a random move and response to initialize a game with. """
+    opening = []
+    game = BitBoard("Player1", "Player2")
+    for _ in range(2):
+        move = rng.choice(game.get_blank_spaces())
+        game.apply_move(move)
+        opening.append(move)
+    return opening
+
+
+def play_round(cpu_agent, test_agents, win_counts, num_matches, players,
+               rng=random, pool=None, stats=None):
     """Compare the test agents to the cpu agent in "fair" matches.
 
     "Fair" matches use random starting locations and force the agents to
     play as both first and second player to control for advantages resulting
     from choosing better opening moves or having first initiative to move.
+
+    The openings and the seed of every game are drawn from `rng`, and the
+    games are played in the worker processes of `pool` if one is given (or
+    sequentially otherwise). `players` is the registered player list.
+
+    If `stats` is a list, one row (see `stats_rows()`) per move searched by
+    an agent that records search statistics is appended to it.
     """
     timeout_count = 0
     forfeit_count = 0
+    cpu = players.index(cpu_agent.player)
+
+    tasks = []
     for _ in range(num_matches):
 
-        games = sum([[Board(cpu_agent.player, agent.player),
-                      Board(agent.player, cpu_agent.player)]
-                    for agent in test_agents], [])
+        opening = random_opening(rng)
+        for agent in test_agents:
+            idx = players.index(agent.player)
+            tasks.append(GameTask(cpu, idx, opening, rng.getrandbits(32)))
+            tasks.append(GameTask(idx, cpu, opening, rng.getrandbits(32)))
 
-        # initialize all games with a random move and response
-        for _ in range(2):
-            move = random.choice(games[0].get_legal_moves())
-            for game in games:
-                game.apply_move(move)
+    # play all games and tally the results
+    names = {players.index(a.player): a.name for a in test_agents}
+    names[cpu] = cpu_agent.name
 
-        # play all games and tally the results
-        for game in games:
-            winner, _, termination = game.play(time_limit=TIME_LIMIT)
-            win_counts[winner] += 1
+    results = pool.map(play_game, tasks) if pool else map(play_game, tasks)
+    for task, (first_won, termination, moves) in zip(tasks, results):
+        winner = task.player_1 if first_won else task.player_2
+        win_counts[players[winner]] += 1
+        if stats is not None:
+            stats.extend(stats_rows(task, moves, names))
 
-            if termination == "timeout":
-                timeout_count += 1
-            elif termination == "forfeit":
-                forfeit_count += 1
+        if termination == "timeout":
+            timeout_count += 1
+        elif termination == "forfeit":
+            forfeit_count += 1
 
     return timeout_count, forfeit_count
 
 
+def play_sequential(cpu_agents, test_agents, players, margin, max_pairs,
+                    rng=random, pool=None, workers=1, stats=None):
+    """Compare every test agent with every cpu agent in "fair" game pairs
+    (see `play_round()`), updating a sequential test (see sprt.py) after
+    every pair and moving on to the next matchup as soon as the test agent
+    is found stronger, weaker, or equivalent within `margin` Elo, or after
+    `max_pairs` pairs.
+
+    Pairs are played `workers` at a time in the processes of `pool`, or one
+    game at a time otherwise.
+
+    Returns
+    -------
+    dict
+        Maps (test agent name, cpu agent name) to the `sprt.Comparison` of
+        the matchup.
+    """
+    results = {}
+    timeout_count = forfeit_count = 0
+    print("\n{:>13}{:^13}{:^12}{:^8}{:^16}{:>8}".format(
+        "Agent", "Opponent", "Decision", "Pairs", "Won/Split/Lost", "Elo"))
+    for cpu_agent in cpu_agents:
+        cpu = players.index(cpu_agent.player)
+        for agent in test_agents:
+            idx = players.index(agent.player)
+            names = {idx: agent.name, cpu: cpu_agent.name}
+            test = Comparison(margin, SPRT_ALPHA, SPRT_BETA)
+            while test.decision() is None and test.count < max_pairs:
+                tasks = []
+                for _ in range(min(max(workers, 1), max_pairs - test.count)):
+                    opening = random_opening(rng)
+                    tasks.append(GameTask(cpu, idx, opening, rng.getrandbits(32)))
+                    tasks.append(GameTask(idx, cpu, opening, rng.getrandbits(32)))
+
+                # the games of a pair are consecutive; without a pool they
+                # are only played while the test is undecided
+                outcomes = iter(pool.map(play_game, tasks) if pool
+                                else map(play_game, tasks))
+                for first, second in zip(outcomes, outcomes):
+                    for task, (_, termination, moves) in zip(tasks, (first, second)):
+                        if stats is not None:
+                            stats.extend(stats_rows(task, moves, names))
+                        if termination == "timeout":
+                            timeout_count += 1
+                        elif termination == "forfeit":
+                            forfeit_count += 1
+                    tasks = tasks[2:]
+                    test.add(int(not first[0]) + int(second[0]))
+                    if test.decision() is not None:
+                        break
+            results[(agent.name, cpu_agent.name)] = test
+            lost, split, won = test.pairs
+            print("{:>13}{:^13}{:^12}{:^8}{:^16}{:>+8.0f}".format(
+                agent.name, cpu_agent.name, test.decision() or "undecided",
+                test.count, "{}/{}/{}".format(won, split, lost), test.elo()))
+
+    if timeout_count or forfeit_count:
+        print("\nThere were {} timeouts and {} forfeits.".format(
+            timeout_count, forfeit_count))
+    return results
+
+
+def stats_rows(task, moves, names):
+    """Return one dict per `MoveStats` recorded in a game, labelled with
+    the game seed and the names of the agent and its opponent.
+    """
+    players = (task.player_1, task.player_2)
+    rows = []
+    for side, records in enumerate(moves):
+        for record in records:
+            row = {"game": task.seed,
+                   "agent": names[players[side]],
+                   "opponent": names[players[1 - side]]}
+            row.update(record._asdict())
+            rows.append(row)
+    return rows
+
+
+def write_stats(rows, path):
+    """Write per-move search statistics as JSON if `path` ends in .json,
+    or as CSV (with the iteration times joined by semicolons) otherwise.
+    """
+    with open(path, "w") as f:
+        if path.endswith(".json"):
+            json.dump(rows, f, indent=1)
+            return
+        fields = ["game", "agent", "opponent"] + list(MoveStats._fields)
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for row in rows:
+            row = dict(row)
+            row["iteration_ms"] = ";".join(
+                "{:.3f}".format(t) for t in row["iteration_ms"])
+            writer.writerow(row)
+
+
 def update(total_wins, wins):
     for player in total_wins:
         total_wins[player] += wins[player]
     return total_wins
 
 
-def play_matches(cpu_agents, test_agents, num_matches):
+def play_matches(cpu_agents, test_agents, num_matches, players, rng=random,
+                 pool=None, stats=None):
     """Play matches between the test agent and each cpu_agent individually. """
     total_wins = {agent.player: 0 for agent in test_agents}
     total_timeouts = 0.
@@ -97,7 +321,8 @@ def play_matches(cpu_agents, test_agents, num_matches):
 
         print("{!s:^9}{:^13}".format(idx + 1, agent.name), end="", flush=True)
 
-        counts = play_round(agent, test_agents, wins, num_matches)
+        counts = play_round(agent, test_agents, wins, num_matches, players,
+                            rng, pool, stats)
         total_timeouts += counts[0]
         total_forfeits += counts[1]
         total_wins = update(total_wins, wins)
@@ -130,7 +355,51 @@ def play_matches(cpu_agents, test_agents, num_matches):
     return total_wins
 
 
-def main():
+def main(workers=1, seed=None, clock="wall", book=None, stats=None,
+         sprt=None, log_games=None):
+    """Run NUM_REPEATS tournaments between the test agents and cpu agents,
+    or sequential tests of every matchup if `sprt` is given.
+
+    Parameters
+    ----------
+    workers : int (optional)
+        The number of processes playing games in parallel; games are played
+        sequentially in the current process if workers is 1.
+
+    seed : int (optional)
+        Seed for the random openings and per-game seeds; a tournament
+        repeated with the same seed plays the same openings. A random seed
+        is chosen (and printed) if None.
+
+    clock : str (optional)
+        The clock timing each turn: "wall" for elapsed time, or "cpu" to
+        charge agents only for the CPU time of the thread playing the game,
+        which is not inflated by other processes competing for the CPU.
+
+    book : str (optional)
+        Path of an opening book (see opening_book.py) for the test agents
+        that accept one; the cpu agents always search their openings.
+
+    stats : str (optional)
+        Path of a file receiving the search statistics of every move of the
+        agents that record them (see `write_stats()`).
+
+    sprt : float (optional)
+        Elo margin of the sequential tests (see `play_sequential()`), which
+        stop each matchup once decided, within the game budget of the
+        tournament (NUM_REPEATS * NUM_MATCHES game pairs).
+
+    log_games : str (optional)
+        Path of a game log (see `isolation.gamelog`) receiving every game
+        played, with its moves, seed and the time taken by each move.
+
+    Returns
+    -------
+    (dict, dict)
+        The wins of each test agent in the last tournament and the win
+        rates of every tournament keyed by agent name, or None and the
+        results of `play_sequential()` with `sprt`.
+    """
 
     # Define two agents to compare -- these agents will play from the same
     # starting position against the same adversaries in the tournament
@@ -144,6 +413,7 @@ def main():
         Agent(AlphaBetaPlayer(score_fn=custom_score_4), "AB_Custom_4"),
         Agent(AlphaBetaPlayer(score_fn=custom_score_5), "AB_Custom_5"),
         # Agent(AlphaBetaPlayer(score_fn=custom_score_6), "AB_Custom_6"),
+        # Agent(PVSPlayer(score_fn=custom_score), "PVS_Custom"),
         # Agent(AlphaBetaPlayer(score_fn=open_move_score), "AB_Open"),
         # Agent(AlphaBetaPlayer(score_fn=center_score), "AB_Center"),
         Agent(AlphaBetaPlayer(score_fn=improved_score), "AB_Improved"),
@@ -161,19 +431,58 @@ def main():
         Agent(AlphaBetaPlayer(score_fn=improved_score), "AB_Improved")
     ]
 
+    if book is not None:
+        opening_book = OpeningBook.load(book)
+        for a in test_agents:
+            if hasattr(a.player, "book"):
+                a.player.book = opening_book
+
+    if seed is None:
+        seed = random.getrandbits(32)
+    rng = random.Random(seed)
+    players = [a.player for a in test_agents + cpu_agents]
+    names = [a.name for a in test_agents + cpu_agents]
+
     print(DESCRIPTION)
     print("{:^74}".format("*************************"))
     print("{:^74}".format("Playing Matches"))
     print("{:^74}".format("*************************"))
+    print("{:^74}".format("seed: {}, workers: {}".format(seed, workers)))
+
+    if log_games:
+        GameLog(log_games)  # writes the file header before the workers start
+
+    pool = None
+    if workers > 1:
+        pool = multiprocessing.Pool(workers, initializer=init_worker,
+                                    initargs=(players, clock, log_games,
+                                              names))
+    else:
+        init_worker(players, clock, log_games, names)
+    report_clock(clock, pool, workers)
 
     test_scores = defaultdict(list)
-    for i in range(NUM_REPEATS):
-        print(" " * 74)
-        print("{:>37}{:d}".format("Sample ", i+1))
-        print("-" * 74)
-        wins = play_matches(cpu_agents, test_agents, NUM_MATCHES)
-        for a in test_agents:
-            test_scores[a.name].append(wins[a.player]/NUM_MATCHES)
+    rows = [] if stats else None
+    try:
+        if sprt is not None:
+            results = play_sequential(cpu_agents, test_agents, players, sprt,
+                                      NUM_REPEATS * NUM_MATCHES, rng, pool,
+                                      workers, rows)
+            return None, results
+        for i in range(NUM_REPEATS):
+            print(" " * 74)
+            print("{:>37}{:d}".format("Sample ", i+1))
+            print("-" * 74)
+            wins = play_matches(cpu_agents, test_agents, NUM_MATCHES, players,
+                                rng, pool, rows)
+            for a in test_agents:
+                test_scores[a.name].append(wins[a.player]/NUM_MATCHES)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        if stats:
+            write_stats(rows, stats)
     return wins, test_scores
 
 
@@ -195,6 +504,28 @@ def compare_populations(scores):
 
 
 if __name__ == "__main__":
-    wins, ts = main()
-    if NUM_REPEATS > 1:
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes playing games in parallel")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed for reproducible openings and games")
+    parser.add_argument("--clock", choices=["wall", "cpu"], default="wall",
+                        help="time turns by elapsed time or by thread CPU time")
+    parser.add_argument("--book", default=None,
+                        help="opening book file for the test agents")
+    parser.add_argument("--stats", default=None, metavar="PATH",
+                        help="write per-move search statistics to PATH "
+                             "(JSON if it ends in .json, CSV otherwise)")
+    parser.add_argument("--sprt", type=float, default=None, metavar="ELO",
+                        help="stop each matchup as soon as a sequential test "
+                             "finds the test agent stronger, weaker, or "
+                             "within ELO of the opponent")
+    parser.add_argument("--log-games", default=None, metavar="PATH",
+                        help="append every game played to the game log PATH")
+    args = parser.parse_args()
+
+    wins, ts = main(workers=args.workers, seed=args.seed, clock=args.clock,
+                   book=args.book, stats=args.stats, sprt=args.sprt,
+                   log_games=args.log_games)
+    if args.sprt is None and NUM_REPEATS > 1:
         compare_populations(ts)
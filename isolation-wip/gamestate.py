@@ -1,25 +1,115 @@
-from copy import deepcopy
+from functools import lru_cache
+
+
+# ray tables shared by every board with the same dimensions
+_TABLES = {}
+
+RAYS = [(1, 0), (-1, 0), (0, 1), (0, -1),
+        (-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+
+def ray_table(w, h):
+    """ Return the (coords, rays) tables of a w x h board. Cell
+    (x, y) has index x * h + y; coords[idx] is its (x, y) pair and
+    rays[idx] lists, for every direction, the indices of the cells
+    along that direction from the cell, nearest first (empty rays
+    are left out).
+    """
+    table = _TABLES.get((w, h))
+    if table is None:
+        coords = tuple((x, y) for x in range(w) for y in range(h))
+        rays = []
+        for x_pos, y_pos in coords:
+            cell_rays = []
+            for dx, dy in RAYS:
+                x, y = x_pos + dx, y_pos + dy
+                ray = []
+                while 0 <= x < w and 0 <= y < h:
+                    ray.append(x * h + y)
+                    x, y = x + dx, y + dy
+                if ray:
+                    cell_rays.append(tuple(ray))
+            rays.append(tuple(cell_rays))
+        table = _TABLES[(w, h)] = (coords, tuple(rays))
+    return table
 
 
 class GameState:
+    """ Game state packed in a few ints: `blocked` is a bit mask of
+    the blocked cells (bit x * h + y for cell (x, y)), `positions`
+    holds the cell index of each player (None before its first move)
+    and `turn` is the player to move (1 for the bot). States are
+    immutable and hashable, so search results can be memoized on
+    them.
+
+    The state dict of the original implementation is still accepted
+    by the constructor and returned by the `state` property, as a new
+    dict: changing it does not change the state.
+    """
+    __slots__ = ('w', 'h', 'blocked', 'positions', 'turn',
+                 '_coords', '_rays')
 
-    def __init__(self, state=False):
-        self.w = 3
-        self.h = 2
-        board = [[0 for x in range(self.h)] for y in range(self.w)]
+    def __init__(self, state=False, w=3, h=2):
+        if state:
+            board = state['board']
+            w, h = len(board), len(board[0])
+        self.w = w
+        self.h = h
+        self._coords, self._rays = ray_table(w, h)
 
         # init state if nothing is passed in
         # turn is 1 if bot turn and 0 otherwise
         if not state:
             # mark lowest corner
-            board[self.w-1][self.h-1] = 1
-            self.state = {
-                'board': board,
-                'positions': [None, None],
-                'turn': 1
-            }
+            self.blocked = 1 << (w * h - 1)
+            self.positions = (None, None)
+            self.turn = 1
         else:
-            self.state = state
+            self.blocked = sum(1 << (x * h + y) for x in range(w)
+                               for y in range(h) if board[x][y])
+            self.positions = tuple(None if p is None else p[0] * h + p[1]
+                                   for p in state['positions'])
+            self.turn = state['turn']
+
+    @property
+    def state(self):
+        """ The state as a dict with the board (w lists of h cells, 1
+        if blocked), the (x, y) position of each player and the turn.
+        """
+        h = self.h
+        board = [[self.blocked >> (x * h + y) & 1 for y in range(h)]
+                 for x in range(self.w)]
+        positions = [None if p is None else self._coords[p]
+                     for p in self.positions]
+        return {'board': board, 'positions': positions, 'turn': self.turn}
+
+    def key(self):
+        """ Return the encoded state: (blocked, positions, turn). """
+        return self.blocked, self.positions, self.turn
+
+    def __eq__(self, other):
+        return (isinstance(other, GameState) and
+                (self.w, self.h) == (other.w, other.h) and
+                self.key() == other.key())
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def _child(self, idx):
+        """ Return the state after the active player moves to cell
+        index idx, without checking that the move is legal.
+        """
+        child = object.__new__(self.__class__)
+        child.w = self.w
+        child.h = self.h
+        child._coords = self._coords
+        child._rays = self._rays
+        child.blocked = self.blocked | 1 << idx
+        positions = list(self.positions)
+        positions[self.turn] = idx
+        child.positions = tuple(positions)
+        child.turn = 1 - self.turn
+        return child
 
     def forecast_move(self, move):
         """ Return a new board object with the specified move
@@ -30,17 +120,30 @@ class GameState:
         move: tuple
             The target position for the active player's next move
         """
-        state = deepcopy(self.state)
-
         if move not in self.get_legal_moves():
             print("Illegal move {}".format(move))
-            return self.__class__(state)
+            return self  # states are immutable
+        return self._child(move[0] * self.h + move[1])
 
-        state['board'][move[0]][move[1]] = 1
-        state['positions'][state['turn']] = move
-        state['turn'] = 1 - state['turn']
+    def legal_cells(self):
+        """ Return the cell indices of the legal moves of the active
+        player (see `get_legal_moves`).
+        """
+        blocked = self.blocked
+        pos = self.positions[self.turn]
 
-        return self.__class__(state)
+        # every open cell if first turn and position is None
+        if pos is None:
+            return [idx for idx in range(self.w * self.h)
+                    if not blocked >> idx & 1]
+
+        moves = []
+        for ray in self._rays[pos]:
+            for idx in ray:
+                if blocked >> idx & 1:
+                    break
+                moves.append(idx)
+        return moves
 
     def get_legal_moves(self):
         """ Return a list of all legal moves available to the
@@ -53,85 +156,69 @@ class GameState:
         be a pair of integers in (column, row) order specifying
         the zero-indexed coordinates on the board.
         """
-        state = self.state
-        board = state['board']
-
-        # return all board if first turn and position is None
-        if not state['positions'][state['turn']]:
-            return [(x, y) for x in range(self.w) for y in range(self.h) if not board[x][y]]
-
-        x_pos = state['positions'][state['turn']][0]
-        y_pos = state['positions'][state['turn']][1]
-
-        rays = [(1, 0), (-1, 0), (0, 1), (0, -1),
-                (-1, -1), (-1, 1), (1, -1), (1, 1)]
-        moves = []
-
-        for dx, dy in rays:
-            x = x_pos
-            y = y_pos
-            while 0 <= x + dx < self.w and 0 <= y + dy < self.h:
-                x = x + dx
-                y = y + dy
-                if board[x][y]:
-                    break
-                else:
-                    moves.append((x, y))
-
-        return moves
+        coords = self._coords
+        return [coords[idx] for idx in self.legal_cells()]
 
     def display_board(self):
         """ Displaying board and positions """
-        state = self.state
-        board = state['board']
-        pos = state['positions']
+        h = self.h
+        pos = self.positions
 
-        for y in range(self.h):
+        for y in range(h):
             line = []
             for x in range(self.w):
-                if pos[0] == (x, y):
+                idx = x * h + y
+                if pos[0] == idx:
                     line.append("O")
-                elif pos[1] == (x, y):
+                elif pos[1] == idx:
                     line.append("B")
+                elif self.blocked >> idx & 1:
+                    line.append("x")
                 else:
-                    line.append(str(board[x][y]))
-
-            line = "|".join(line)
-            line = line.replace("1", "x")
-            line = line.replace("0", ".")
-            print(line)
+                    line.append(".")
+            print("|".join(line))
 
 
 def terminal_test(gameState):
     """ Return True if the game is over for the active player
     and False otherwise.
     """
-    return not bool(gameState.get_legal_moves())  # by Assumption 1
+    return not bool(gameState.legal_cells())  # by Assumption 1
 
 
+@lru_cache(maxsize=None)
 def min_value(gameState):
     """ Return the value for a win (+1) if the game is over,
     otherwise return the minimum value over all legal child
-    nodes.
+    nodes. Values are memoized on the encoded state (see
+    `min_value.cache_clear()`).
     """
-    if terminal_test(gameState):
+    moves = gameState.legal_cells()
+    if not moves:
         return 1  # by Assumption 2
     v = float("inf")
-    for m in gameState.get_legal_moves():
-        v = min(v, max_value(gameState.forecast_move(m)))
+    for idx in moves:
+        v = min(v, max_value(gameState._child(idx)))
+        if v == -1:
+            break  # no lower value
     return v
 
 
+@lru_cache(maxsize=None)
 def max_value(gameState):
     """ Return the value for a loss (-1) if the game is over,
     otherwise return the maximum value over all legal child
-    nodes.
+    nodes. Values are memoized on the encoded state (see
+    `max_value.cache_clear()`).
     """
-    if terminal_test(gameState):
+    moves = gameState.legal_cells()
+    if not moves:
         return -1  # by assumption 2
     v = float("-inf")
-    for m in gameState.get_legal_moves():
-        v = max(v, min_value(gameState.forecast_move(m)))
+    for idx in moves:
+        v = max(v, min_value(gameState._child(idx)))
+        if v == 1:
+            break  # no higher value
     return v
 
 
@@ -0,0 +1,121 @@
+"""Unit tests comparing the packed GameState with the original dict version."""
+
+import unittest
+from copy import deepcopy
+
+import gamestate
+from gamestate import GameState
+
+
+class DictState:
+    """ The original GameState, storing a dict of nested lists, with the
+    board size taken from the board.
+    """
+
+    def __init__(self, state):
+        self.state = state
+        self.w = len(state['board'])
+        self.h = len(state['board'][0])
+
+    def forecast_move(self, move):
+        state = deepcopy(self.state)
+        state['board'][move[0]][move[1]] = 1
+        state['positions'][state['turn']] = move
+        state['turn'] = 1 - state['turn']
+        return DictState(state)
+
+    def get_legal_moves(self):
+        state = self.state
+        board = state['board']
+        if not state['positions'][state['turn']]:
+            return [(x, y) for x in range(self.w) for y in range(self.h)
+                    if not board[x][y]]
+
+        x_pos, y_pos = state['positions'][state['turn']]
+        moves = []
+        for dx, dy in gamestate.RAYS:
+            x, y = x_pos, y_pos
+            while 0 <= x + dx < self.w and 0 <= y + dy < self.h:
+                x, y = x + dx, y + dy
+                if board[x][y]:
+                    break
+                moves.append((x, y))
+        return moves
+
+
+def dict_min_value(state, memo):
+    key = ('min', repr(state.state))
+    if key not in memo:
+        moves = state.get_legal_moves()
+        memo[key] = min((dict_max_value(state.forecast_move(m), memo)
+                         for m in moves), default=1)
+    return memo[key]
+
+
+def dict_max_value(state, memo):
+    key = ('max', repr(state.state))
+    if key not in memo:
+        moves = state.get_legal_moves()
+        memo[key] = max((dict_min_value(state.forecast_move(m), memo)
+                         for m in moves), default=-1)
+    return memo[key]
+
+
+def initial_state(w, h):
+    board = [[0] * h for _ in range(w)]
+    board[w - 1][h - 1] = 1
+    return {'board': board, 'positions': [None, None], 'turn': 1}
+
+
+class GameStateTest(unittest.TestCase):
+    """The packed GameState agrees with the dict implementation"""
+
+    def setUp(self):
+        gamestate.min_value.cache_clear()
+        gamestate.max_value.cache_clear()
+
+    def walk(self, w, h, plies):
+        """Yield the pairs of (packed, dict) states reachable from the
+        initial w x h state in at most `plies` moves, once per state.
+        """
+        pairs = {GameState(w=w, h=h): DictState(initial_state(w, h))}
+        for _ in range(plies + 1):
+            children = {}
+            for packed, reference in pairs.items():
+                yield packed, reference
+                for move in reference.get_legal_moves():
+                    children[packed.forecast_move(move)] = (
+                        reference.forecast_move(move))
+            pairs = children
+
+    def test_legal_moves(self):
+        for w, h in ((3, 2), (3, 3)):
+            for packed, reference in self.walk(w, h, w * h):
+                self.assertEqual(packed.get_legal_moves(),
+                                 reference.get_legal_moves())
+                self.assertEqual(packed.state, reference.state)
+
+    def test_values(self):
+        # the dict values are memoized on the full state to keep the test
+        # fast
+        memo = {}
+        for w, h in ((3, 2), (3, 3)):
+            for packed, reference in self.walk(w, h, w * h):
+                self.assertEqual(gamestate.min_value(packed),
+                                 dict_min_value(reference, memo))
+                self.assertEqual(gamestate.max_value(packed),
+                                 dict_max_value(reference, memo))
+
+    def test_state_round_trip(self):
+        state = {'board': [[1, 0, 0], [0, 1, 0], [0, 0, 1]],
+                 'positions': [(1, 1), (0, 0)], 'turn': 0}
+        game = GameState(state)
+        self.assertEqual((game.w, game.h), (3, 3))
+        self.assertEqual(game.state, state)
+        self.assertEqual(GameState(game.state), game)
+        self.assertEqual(GameState(initial_state(3, 2)), GameState())
+
+        # the dict is a copy, and an illegal move leaves the state as it was
+        game.state['turn'] = 1
+        self.assertEqual(game.turn, 0)
+        self.assertEqual(game.forecast_move((0, 0)).state, state)